@@ -0,0 +1,231 @@
+import argparse
+import hashlib
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from artifacts import cache_path, file_signature, load_artifact, save_artifact
+from data_store import CLEAN_RATINGS_FILE, PRODUCTS_FILE, RATINGS_FILE
+
+STARS = (1, 2, 3, 4, 5)
+STAR_COLUMNS = [f'stars_{stars}' for stars in STARS]
+# Số Positive/Negative đếm theo cột sentiment của data_clean_2.csv (nối theo id), như bảng
+# thống kê và wordcloud của trang sản phẩm; đánh giá chưa được làm sạch không được tính
+SENTIMENTS = ('Positive', 'Negative')
+SENTIMENT_COLUMNS = ['positive', 'negative']
+# 1-3 sao Negative, 4-5 sao Positive: dùng khi chỉ có số sao của một đánh giá
+POSITIVE_STARS = 4
+DATE_FORMAT = '%d/%m/%Y'
+MISSING_DAY = pd.Timestamp(0)
+_TAIL_BYTES = 4096
+
+# Tăng khi đổi cấu trúc bảng tổng hợp
+AGGREGATES_FORMAT = 2
+
+
+def load_sentiments(path=CLEAN_RATINGS_FILE):
+    labels = pd.read_csv(path, usecols=['id', 'sentiment'])
+    return labels.drop_duplicates('id').set_index('id')['sentiment']
+
+
+# Gom nhóm một lô đánh giá theo (ma_san_pham, ngày): số đánh giá theo từng mức sao và
+# theo nhãn sentiment (sentiments: Series id -> nhãn). Mọi chỉ số khác (số review, tỉ lệ
+# tiêu cực, điểm trung bình) suy ra bằng phép cộng nên bảng cộng dồn được khi có đánh giá
+# mới và gộp tiếp theo khoảng thời gian hoặc phân loại.
+def aggregate_ratings(ratings, sentiments):
+    # Ngày không đọc được gom vào MISSING_DAY: vẫn tính trong tổng, nằm ngoài mọi khoảng thời gian
+    days = pd.to_datetime(ratings['ngay_binh_luan'], format=DATE_FORMAT, errors='coerce').fillna(MISSING_DAY)
+    keys = [ratings['ma_san_pham'], days.rename('ngay')]
+    valid = ratings['so_sao'].isin(STARS)
+    counts = ratings[valid].groupby([key[valid] for key in keys] + [ratings['so_sao'][valid].astype(int)]).size()
+    counts = counts.unstack('so_sao', fill_value=0).reindex(columns=list(STARS), fill_value=0)
+    counts.columns = STAR_COLUMNS
+    labels = ratings['id'].map(sentiments).rename('sentiment')
+    labelled = ratings.groupby(keys + [labels]).size()
+    labelled = labelled.unstack('sentiment', fill_value=0).reindex(columns=list(SENTIMENTS), fill_value=0)
+    labelled.columns = SENTIMENT_COLUMNS
+    return pd.concat([counts, labelled], axis=1).fillna(0).astype(np.int64)
+
+
+def merge_counts(table, counts):
+    if table is None or table.empty:
+        return counts
+    return table.add(counts, fill_value=0).astype(np.int64)
+
+
+# Chỉ số suy ra từ các cột đếm, sau khi đã gộp theo nhóm cần xem
+def summarize(counts):
+    stars = counts[STAR_COLUMNS]
+    reviews = stars.sum(axis=1)
+    summary = counts[STAR_COLUMNS + SENTIMENT_COLUMNS].copy()
+    summary['reviews'] = reviews
+    # Tỉ lệ trên số đánh giá có nhãn sentiment
+    labelled = summary['positive'] + summary['negative']
+    summary['negative_share'] = (summary['negative'] / labelled.where(labelled > 0)).fillna(0.0)
+    summary['average_score'] = (stars.to_numpy() @ np.array(STARS)) / reviews.where(reviews > 0)
+    return summary
+
+
+def _tail_hash(path, offset):
+    with open(path, 'rb') as file:
+        file.seek(max(0, offset - _TAIL_BYTES))
+        return hashlib.sha1(file.read(offset - max(0, offset - _TAIL_BYTES))).hexdigest()
+
+
+# Bảng tổng hợp vật thể hóa theo (sản phẩm, ngày), lưu trong .cache/aggregates.pkl
+# cùng vị trí (byte, số dòng) đã đọc tới trong Danh_gia_full.csv. Khi file chỉ được
+# ghi thêm vào cuối, chỉ các dòng mới được đọc và cộng vào bảng; nếu phần đã đọc
+# bị sửa (kích thước giảm hoặc đoạn cuối đã đọc khác đi) hoặc data_clean_2.csv đổi
+# (nhãn sentiment) thì tính lại toàn bộ.
+class RatingAggregates:
+    STATE = ('daily', 'offset', 'rows', 'tail_hash', 'columns', 'sentiment_signature')
+    USECOLS = ['id', 'ma_san_pham', 'ngay_binh_luan', 'so_sao']
+
+    def __init__(self, daily, offset, rows, tail_hash, columns, sentiment_signature):
+        self.daily = daily
+        self.offset = offset
+        self.rows = rows
+        self.tail_hash = tail_hash
+        self.columns = columns
+        self.sentiment_signature = sentiment_signature
+        self._products = None
+        self._products_signature = None
+
+    @classmethod
+    def build(cls, path=RATINGS_FILE, sentiments_path=CLEAN_RATINGS_FILE):
+        with open(path, 'rb') as file:
+            ratings = pd.read_csv(file, usecols=cls.USECOLS)
+            offset = file.tell()
+        columns = pd.read_csv(path, nrows=0).columns.tolist()
+        daily = aggregate_ratings(ratings, load_sentiments(sentiments_path))
+        return cls(daily, offset, len(ratings), _tail_hash(path, offset), columns, file_signature([sentiments_path]))
+
+    def is_current(self, path=RATINGS_FILE, sentiments_path=CLEAN_RATINGS_FILE):
+        return (os.path.getsize(path) == self.offset and _tail_hash(path, self.offset) == self.tail_hash
+                and file_signature([sentiments_path]) == self.sentiment_signature)
+
+    # Trả về số dòng mới đã cộng vào bảng, hoặc None nếu phải tính lại toàn bộ
+    def refresh(self, path=RATINGS_FILE, sentiments_path=CLEAN_RATINGS_FILE):
+        size = os.path.getsize(path)
+        if size < self.offset or _tail_hash(path, self.offset) != self.tail_hash:
+            return None
+        if file_signature([sentiments_path]) != self.sentiment_signature:
+            return None
+        if size == self.offset:
+            return 0
+        with open(path, 'rb') as file:
+            file.seek(self.offset)
+            ratings = pd.read_csv(file, header=None, names=self.columns, usecols=self.USECOLS)
+            offset = file.tell()
+        self.append(ratings, load_sentiments(sentiments_path))
+        self.offset = offset
+        self.tail_hash = _tail_hash(path, offset)
+        return len(ratings)
+
+    def append(self, ratings, sentiments):
+        self.daily = merge_counts(self.daily, aggregate_ratings(ratings, sentiments))
+        self.rows += len(ratings)
+
+    def latest_day(self):
+        days = self.daily.index.get_level_values('ngay')
+        days = days[days != MISSING_DAY]
+        return days.max() if len(days) else None
+
+    # Gộp các ngày trong khoảng [latest - days + 1, latest] (None: toàn bộ thời gian)
+    def product_counts(self, days=None):
+        daily = self.daily
+        if days is not None:
+            latest = self.latest_day()
+            if latest is None:
+                daily = daily.iloc[:0]
+            else:
+                day_index = daily.index.get_level_values('ngay')
+                daily = daily[day_index > latest - pd.Timedelta(days=days)]
+        return daily.groupby(level='ma_san_pham').sum()
+
+    def products(self):
+        signature = os.stat(PRODUCTS_FILE).st_mtime_ns
+        if self._products is None or self._products_signature != signature:
+            self._products = pd.read_csv(PRODUCTS_FILE, usecols=['ma_san_pham', 'ten_san_pham', 'phan_loai'])
+            self._products_signature = signature
+        return self._products
+
+    def by_product(self, days=None):
+        summary = summarize(self.product_counts(days))
+        return self.products().merge(summary, left_on='ma_san_pham', right_index=True, how='inner')
+
+    def by_category(self, days=None):
+        counts = self.product_counts(days)
+        categories = self.products().set_index('ma_san_pham')['phan_loai']
+        counts = counts.groupby(categories.reindex(counts.index).fillna('Khác').to_numpy()).sum()
+        counts.index.name = 'phan_loai'
+        return summarize(counts).reset_index()
+
+    def product(self, ma_sp):
+        if ma_sp in self.daily.index.get_level_values('ma_san_pham'):
+            counts = self.daily.xs(ma_sp, level='ma_san_pham').sum().to_frame(ma_sp).T.astype(np.int64)
+        else:
+            columns = STAR_COLUMNS + SENTIMENT_COLUMNS
+            counts = pd.DataFrame([[0] * len(columns)], index=[ma_sp], columns=columns)
+        return summarize(counts).iloc[0]
+
+    # Bảng xếp hạng: by là 'product' hoặc 'category'; bỏ các nhóm ít hơn min_reviews đánh giá
+    def leaderboard(self, by='product', sort='negative_share', days=None, min_reviews=1, top=20, ascending=False):
+        table = self.by_product(days) if by == 'product' else self.by_category(days)
+        table = table[table['reviews'] >= min_reviews]
+        return table.sort_values([sort, 'reviews'], ascending=[ascending, False], kind='stable').head(top)
+
+
+def _state_path():
+    return cache_path('aggregates.pkl')
+
+
+_aggregates = None
+_aggregates_lock = threading.Lock()
+
+
+# Dùng chung cho mọi phiên; kiểm tra file đánh giá ở mỗi lần gọi và chỉ đọc phần ghi thêm
+def load_aggregates(path=RATINGS_FILE, sentiments_path=CLEAN_RATINGS_FILE):
+    global _aggregates
+    signature = (AGGREGATES_FORMAT, os.path.abspath(path), os.path.abspath(sentiments_path))
+    with _aggregates_lock, metrics.timer('aggregates.load'):
+        if _aggregates is None:
+            # Lưu dưới dạng dict để đọc được dù module chạy dưới dạng script hay được import
+            state = load_artifact(_state_path(), signature)
+            _aggregates = RatingAggregates(**state) if state is not None else None
+        if _aggregates is not None and _aggregates.is_current(path, sentiments_path):
+            return _aggregates
+        added = _aggregates.refresh(path, sentiments_path) if _aggregates is not None else None
+        if added is None:
+            _aggregates = RatingAggregates.build(path, sentiments_path)
+        save_artifact(_state_path(), signature, {name: getattr(_aggregates, name) for name in RatingAggregates.STATE})
+        return _aggregates
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or refresh the per-product rating aggregates and print a leaderboard')
+    parser.add_argument('--rebuild', action='store_true', help='recompute from scratch instead of reading only new rows')
+    parser.add_argument('--by', choices=['product', 'category'], default='product')
+    parser.add_argument('--sort', default='negative_share', choices=['negative_share', 'reviews', 'average_score', 'negative'])
+    parser.add_argument('--days', type=int, default=None, help='only ratings of the last N days (up to the latest rating)')
+    parser.add_argument('--min-reviews', type=int, default=5)
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.exists(_state_path()):
+        os.remove(_state_path())
+    start = time.perf_counter()
+    aggregates = load_aggregates()
+    print(f'{aggregates.rows:,} ratings aggregated into {len(aggregates.daily):,} (product, day) rows '
+          f'in {time.perf_counter() - start:.2f}s', file=sys.stderr)
+    with pd.option_context('display.width', 200, 'display.max_columns', 20):
+        print(aggregates.leaderboard(args.by, args.sort, args.days, args.min_reviews, args.top).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
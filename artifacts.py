@@ -0,0 +1,53 @@
+import hashlib
+import os
+import pickle
+
+# Thư mục chứa các file dựng sẵn (lexicon, index, ...), có thể đổi bằng biến môi trường
+CACHE_DIR = os.environ.get('HASAKI_CACHE_DIR', '.cache')
+
+
+def cache_path(name):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, name)
+
+
+# Dấu vân tay theo nội dung các file nguồn: chỉ đổi khi một file thay đổi
+def fingerprint(paths):
+    digest = hashlib.sha1()
+    for path in paths:
+        digest.update(os.path.basename(path).encode('utf8') + b'\0')
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+# File artifact gồm header (signature) và dữ liệu; trả về None nếu chưa có
+# hoặc signature không khớp để nơi gọi dựng lại
+def load_artifact(path, signature):
+    try:
+        with open(path, 'rb') as file:
+            if pickle.load(file) != signature:
+                return None
+            return pickle.load(file)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def save_artifact(path, signature, obj):
+    # Ghi ra file tạm rồi đổi tên để các process khác không đọc phải file ghi dở
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as file:
+        pickle.dump(signature, file, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(obj, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+# Chữ ký nhanh theo kích thước và thời điểm sửa file, dùng cho các file dữ liệu lớn
+# cần kiểm tra ở mỗi lần chạy lại trang
+def file_signature(paths):
+    signature = []
+    for path in paths:
+        stat = os.stat(path)
+        signature.append((os.path.basename(path), stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
@@ -0,0 +1,265 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+import preprocessing
+from artifacts import cache_path
+from lexicon import load_lexicon
+from model_registry import get_registry
+
+RAW_CORPUS = 'comments.txt'
+CLEAN_CORPUS = 'data_clean_2.csv'
+TEXT_COLUMN = 'noi_dung_binh_luan'
+LENGTHS = (50, 200, 1000, 5000)
+BATCH_SIZES = (1, 16, 256, 2048)
+APP_FILE = 'comment_classification.py'
+PAGES = ('Business Objective', 'Build Model', 'New Prediction', 'Product Analysis')
+_IMPORT_MARKER = '--- app run ---'
+
+# Chạy trong một process Python mới (cold start): lần chạy đầu của trang (import +
+# nạp tài nguyên + vẽ) và một lần chạy lại. Thời gian import lấy từ -X importtime,
+# chỉ tính các import xảy ra sau marker (không gồm streamlit/AppTest).
+_STARTUP_SCRIPT = '''
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=600)
+app.query_params['page'] = sys.argv[2]
+modules = set(sys.modules)
+print(sys.argv[3], file=sys.stderr, flush=True)
+start = time.perf_counter()
+app.run()
+first_paint = time.perf_counter() - start
+print(sys.argv[3], file=sys.stderr, flush=True)
+imported = len(set(sys.modules) - modules)
+start = time.perf_counter()
+app.run()
+rerun = time.perf_counter() - start
+print(json.dumps({'first_paint': first_paint, 'rerun': rerun, 'modules': imported,
+                  'exception': [element.message for element in app.exception]}))
+'''
+
+
+def load_corpora(limit=None):
+    with open(RAW_CORPUS, encoding='utf8') as file:
+        raw = [line for line in file.read().split('\n') if line.strip()]
+    clean = pd.read_csv(CLEAN_CORPUS, usecols=[TEXT_COLUMN], dtype={TEXT_COLUMN: str}, keep_default_na=False)
+    clean = clean[TEXT_COLUMN].tolist()
+    if limit:
+        raw, clean = raw[:limit], clean[:limit]
+    return raw, clean
+
+
+# Ghép các review thô cho đến khi đạt độ dài (ký tự) mong muốn
+def texts_of_length(raw, length, count):
+    texts = []
+    start = 0
+    for _ in range(count):
+        parts = []
+        size = 0
+        while size < length:
+            part = raw[start % len(raw)]
+            parts.append(part)
+            size += len(part) + 1
+            start += 1
+        texts.append(' '.join(parts)[:length])
+    return texts
+
+
+# Thời gian (giây) của func(items) qua nhiều lần lặp; lần chạy đầu để làm nóng
+def measure(func, items, repeat):
+    func(items)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(items)
+        timings.append(time.perf_counter() - start)
+    return {
+        'items': len(items),
+        'median': statistics.median(timings),
+        'min': min(timings),
+        'per_item': statistics.median(timings) / max(1, len(items)),
+    }
+
+
+# Các bước của preprocess() theo đúng thứ tự; mỗi bước đo trên đầu ra của bước trước
+def stage_functions(lexicon):
+    return [
+        ('to_lower', preprocessing.to_lower),
+        ('normalize_repeated_characters', preprocessing.normalize_repeated_characters),
+        ('remove_punctuation', preprocessing.remove_punctuation),
+        ('process_text', lambda text: preprocessing.process_text(text, lexicon.emoji_dict, lexicon.teen_dict, lexicon.wrong_set)),
+        ('convert_unicode', preprocessing.convert_unicode),
+        ('process_special_word', preprocessing.process_special_word),
+        ('process_postag_thesea', preprocessing.process_postag_thesea),
+        ('remove_stopword', lambda text: preprocessing.remove_stopword(text, lexicon.stopword_set)),
+    ]
+
+
+# Bảng của chế độ fast được dựng từ data_clean_2.csv; thiếu file thì bỏ qua phép đo
+def fast_mode_available(log=sys.stderr):
+    from fast_pos import load_fast_tagger
+
+    try:
+        load_fast_tagger(log)
+    except FileNotFoundError as error:
+        print(f'Skipping preprocess/fast: {error.filename} not found (needed to build or check the fast POS tables)',
+              file=log, flush=True)
+        return False
+    return True
+
+
+def run_benchmarks(repeat=5, limit=None, log=sys.stderr):
+    lexicon = load_lexicon()
+    resources = (lexicon.emoji_dict, lexicon.teen_dict, lexicon.wrong_set, lexicon.stopword_set)
+    model = get_registry().load(compiled=False)
+    compiled_model = get_registry().load(model.version, compiled=True)
+    raw, clean = load_corpora(limit)
+    results = {}
+
+    def record(name, func, items):
+        results[name] = measure(func, items, repeat)
+        print(f'{name:<45} {results[name]["per_item"] * 1e6:>12,.1f} µs/item', file=log, flush=True)
+
+    texts = raw
+    for name, func in stage_functions(lexicon):
+        record(f'stage/{name}', lambda items, func=func: [func(text) for text in items], texts)
+        texts = [func(text) for text in texts]
+    record('preprocess', lambda items: [preprocessing.preprocess(text, *resources, mode='full') for text in items], raw)
+    if fast_mode_available(log):
+        record('preprocess/fast', lambda items: [preprocessing.preprocess(text, *resources, mode='fast') for text in items], raw)
+    record('model.predict', model.predict, clean)
+    record('model.predict/compiled', compiled_model.predict, clean)
+    # Nhãn + điểm + token đóng góp nhiều nhất của cả lô (thay cho predict khi bật giải thích)
+    record('model.explain', model.explain, clean)
+
+    for length in LENGTHS:
+        texts = texts_of_length(raw, length, max(1, 20_000 // length))
+        record(f'length/{length}/preprocess', lambda items: [preprocessing.preprocess(text, *resources, mode='full') for text in items], texts)
+
+    for batch_size in BATCH_SIZES:
+        batch = (clean * (batch_size // len(clean) + 1))[:batch_size]
+        record(f'batch/{batch_size}/model.predict', model.predict, batch)
+        record(f'batch/{batch_size}/model.predict/compiled', compiled_model.predict, batch)
+        record(f'batch/{batch_size}/model.explain', model.explain, batch)
+        raw_batch = (raw * (batch_size // len(raw) + 1))[:batch_size]
+        record(f'batch/{batch_size}/preprocess_batch', lambda items: preprocessing.preprocess_batch(items, *resources, mode='full'), raw_batch)
+    preprocessing.shutdown_batch_pool()
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'preprocess_version': preprocessing.PREPROCESS_VERSION,
+            'model_version': model.version,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def _startup_run(page):
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _STARTUP_SCRIPT, APP_FILE, page, _IMPORT_MARKER],
+        capture_output=True, text=True, check=True,
+    )
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    if result['exception']:
+        raise RuntimeError(f'{page}: {result["exception"]}')
+    # Dòng importtime: "import time: self | cumulative | tên"; chỉ cộng các import cấp cao nhất
+    lines = process.stderr.split(_IMPORT_MARKER)[1].splitlines()
+    result['import'] = sum(
+        int(line.split('|')[1]) for line in lines
+        if line.startswith('import time:') and not line.split('|')[2].startswith('  ')
+        and line.split('|')[1].strip().isdigit()
+    ) / 1e6
+    return result
+
+
+def _summary(timings):
+    return {
+        'items': 1,
+        'median': statistics.median(timings),
+        'min': min(timings),
+        'per_item': statistics.median(timings),
+    }
+
+
+# Thời gian khởi động từng trang của app trong process mới: import, lần vẽ đầu, lần chạy lại
+def run_startup_benchmarks(repeat=3, log=sys.stderr):
+    results = {}
+    for page in PAGES:
+        runs = [_startup_run(page) for _ in range(repeat)]
+        for name in ('import', 'first_paint', 'rerun'):
+            results[f'startup/{page}/{name}'] = _summary([run[name] for run in runs])
+        results[f'startup/{page}/first_paint']['modules'] = runs[-1]['modules']
+        print(f'{page:<20} import {results[f"startup/{page}/import"]["median"]:6.2f}s  '
+              f'first paint {results[f"startup/{page}/first_paint"]["median"]:6.2f}s  '
+              f'rerun {results[f"startup/{page}/rerun"]["median"]:6.2f}s  '
+              f'({runs[-1]["modules"]} modules)', file=log, flush=True)
+    return results
+
+
+# So sánh thời gian median của từng phép đo với baseline; chậm hơn threshold (tỉ lệ) là regression
+def compare(current, baseline, threshold=0.1):
+    rows = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None or base['items'] != result['items'] or not base['median']:
+            continue
+        ratio = result['median'] / base['median']
+        rows.append({'name': name, 'baseline': base['median'], 'current': result['median'], 'ratio': ratio,
+                     'regression': ratio > 1 + threshold})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark each preprocessing stage and model prediction')
+    parser.add_argument('--output', default=None, help='where to write the results (JSON, default: benchmark.json in the cache directory)')
+    parser.add_argument('--baseline', default=None, help='results JSON of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed slowdown vs the baseline (0.1 = 10%%)')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per measurement')
+    parser.add_argument('--limit', type=int, default=None, help='use only the first N texts of each corpus')
+    parser.add_argument('--startup', action='store_true',
+                        help='also measure cold-start import time and time to first paint of each app page')
+    parser.add_argument('--startup-only', action='store_true', help='only run the app startup measurements')
+    args = parser.parse_args()
+
+    if args.startup_only:
+        current = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'environment': {'python': platform.python_version(), 'platform': platform.platform(), 'repeat': args.repeat},
+            'results': {},
+        }
+    else:
+        current = run_benchmarks(args.repeat, args.limit)
+    if args.startup or args.startup_only:
+        current['results'].update(run_startup_benchmarks(args.repeat))
+    args.output = args.output or cache_path('benchmark.json')
+    with open(args.output, 'w', encoding='utf8') as file:
+        json.dump(current, file, indent=2, ensure_ascii=False)
+    print(f'Results written to {args.output}', file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf8') as file:
+            baseline = json.load(file)
+        rows = compare(current, baseline, args.threshold)
+        for row in rows:
+            flag = 'REGRESSION' if row['regression'] else ''
+            print(f'{row["name"]:<45} {row["baseline"]:>10.4f}s {row["current"]:>10.4f}s {row["ratio"]:>6.2f}x {flag}')
+        regressions = [row['name'] for row in rows if row['regression']]
+        if regressions:
+            print(f'{len(regressions)} regression(s) above {args.threshold:.0%}: {", ".join(regressions)}', file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
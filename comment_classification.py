@@ -1,34 +1,8 @@
-import joblib
 import streamlit as st
-import pandas as pd
-import re
-from preprocessing import preprocess
-import matplotlib.pyplot as plt
-from wordcloud import WordCloud
-# Load the necessary files (emoji, teen, translation, wrong words, stopwords)
-# Example of loading emoji and other dictionaries
-
-# Emoji Dictionary
-with open('emojicon.txt', 'r', encoding="utf8") as file:
-    emoji_lst = file.read().split('\n')
-    emoji_dict = {key: str(value) for key, value in (line.split('\t') for line in emoji_lst)}
-
-# Teen code Dictionary
-with open('teencode.txt', 'r', encoding="utf8") as file:
-    teen_lst = file.read().split('\n')
-    teen_dict = {key: str(value) for key, value in (line.split('\t') for line in teen_lst)}
-
-# Wrong words list
-with open('wrong-word.txt', 'r', encoding="utf8") as file:
-    wrong_lst = file.read().split('\n')
-
-# Stopwords list
-with open('vietnamese-stopwords.txt', 'r', encoding="utf8") as file:
-    stopwords_lst = file.read().split('\n')
-
-# Load the classification model
-# Load the pipeline or classifier that was trained earlier
-model = joblib.load('model_pipeline.pkl')
+import metrics
+# Module nặng (pandas, underthesea, scikit-learn...) và tài nguyên (lexicon, mô hình) chỉ được
+# import/nạp trong trang cần dùng, lần đầu cần đến; các lần chạy lại dùng lại kết quả đã nạp
+
 # Set page configuration with icon
 st.set_page_config(
     page_title="Hasaki Sentiment Analysis",
@@ -40,7 +14,9 @@ st.title("Sentiment Analysis with Hasaki.vn")
 
 # Sidebar menu
 menu = ["Business Objective", "Build Model", "New Prediction", "Product Analysis"]
-menu_choice = st.sidebar.selectbox('Menu', menu)
+# ?page=<menu item> opens a page directly
+requested_page = st.query_params.get("page")
+menu_choice = st.sidebar.selectbox('Menu', menu, index=menu.index(requested_page) if requested_page in menu else 0)
 
 # Information in Sidebar
 st.sidebar.write("""#### Thành viên thực hiện:
@@ -49,6 +25,30 @@ st.sidebar.write("""#### Giảng viên hướng dẫn:
                  Khuất Thùy Phương""")
 st.sidebar.write("""#### Thời gian thực hiện: 15/12/2024""")
 
+
+# Top-k similar reviews (from similar_reviews) as a table, shared by the prediction and product pages
+def show_similar_reviews(results):
+    if not results:
+        st.caption("Không tìm thấy bình luận tương tự")
+        return
+    column_order = ["score", "noi_dung_binh_luan", "sentiment", "so_sao", "ten_san_pham", "matching_reviews"]
+    # Index built without the ratings/products CSVs: no stars or product names to show
+    if not any(result["ten_san_pham"] for result in results):
+        column_order = [column for column in column_order if column not in ("so_sao", "ten_san_pham")]
+    st.dataframe(
+        results,
+        column_order=column_order,
+        column_config={
+            "score": st.column_config.ProgressColumn("Độ tương tự", format="%.2f", min_value=0, max_value=1),
+            "noi_dung_binh_luan": st.column_config.Column("Bình luận", width="large"),
+            "sentiment": st.column_config.Column("Cảm xúc", width="small"),
+            "so_sao": st.column_config.NumberColumn("Số sao", format="%d ⭐"),
+            "ten_san_pham": st.column_config.Column("Sản phẩm", width="medium"),
+            "matching_reviews": st.column_config.NumberColumn("Số bình luận cùng nội dung", format="%d"),
+        },
+        hide_index=True
+    )
+
 # Tabs synchronized with Sidebar Menu
 
 ## Use the menu selection to highlight the corresponding tab
@@ -61,7 +61,35 @@ if menu_choice == "Business Objective":
     st.write("=> Xây dựng mô hình dự đoán giúp Hasaki.vn và các công ty đối tác có thể biết được những phản hồi nhanh chóng của khách hàng về sản phẩm hay dịch vụ (tích cực, tiêu cực hay trung tính), điều này giúp họ cải thiện sản phẩm/ dịch vụ và làm hài lòng khách hàng.")
     
 elif menu_choice == "New Prediction":
+    import os
+    import pandas as pd
+    import jobs
+
     st.subheader("Sentiment Analysis Predictor")
+    # The styled results table is capped: Streamlit's Styler refuses tables above
+    # styler.render.max_elements cells, the full results are offered as a CSV download
+    RESULT_PREVIEW_ROWS = 1000
+
+    def show_job_progress(job_id, initial_status):
+        job = jobs.get_queue().get(job_id)
+        if job["status"] in jobs.FINISHED and initial_status not in jobs.FINISHED:
+            st.rerun()
+        if job["status"] == "queued":
+            st.progress(0.0, text="Waiting for a worker...")
+        elif job["status"] == "running":
+            st.progress(job["progress"], text=f"{job['rows']:,} reviews scored")
+            # The last 1000 scored rows, read from the worker's partial result file
+            partial = jobs.read_partial(job)
+            if partial is not None:
+                st.dataframe(partial, use_container_width=True)
+        elif job["status"] == "done":
+            st.success(f"{job['rows']:,} reviews scored with model {job['model_version']}")
+        elif job["status"] == "cancelled":
+            st.info(f"Job cancelled after {job['rows']:,} reviews")
+        else:
+            st.error(f"Job failed:\n\n```\n{job['error']}\n```")
+        if job["status"] not in jobs.FINISHED and st.button("✖ Cancel job"):
+            jobs.get_queue().cancel(job_id)
     
     # Add a informative description
     st.markdown("""
@@ -80,7 +108,13 @@ elif menu_choice == "New Prediction":
         """)
     
     input_type = st.radio("Choose Input Method", ["Input Text", "Upload File"], help="Select how you want to input your reviews")
+    explain = st.toggle("🧩 Explain predictions", value=True,
+                        help="Show the terms that pushed each review towards Positive or Negative")
     user_content = None
+    explanations = None
+    # Set for finished jobs, where only a preview of the rows is loaded
+    total_reviews = None
+    label_totals = None
     
     if input_type == "Input Text":
         user_content = st.text_area(
@@ -104,23 +138,102 @@ elif menu_choice == "New Prediction":
     
     elif input_type == "Upload File":
         uploaded_file = st.file_uploader(
-            "Upload a CSV or TXT file", 
-            type=["csv", "txt"],
-            help="Upload a file with multiple reviews. Each line should be a separate review."
+            "Upload a CSV, TXT or Parquet file", 
+            type=["csv", "txt", "parquet"],
+            help="Upload a file with multiple reviews. TXT: one review per line; CSV/Parquet: pick the review column."
         )
+        job_queue = jobs.get_queue()
         if uploaded_file:
-            # Read file as raw text
-            raw_text = uploaded_file.read().decode("utf-8")
-            user_content = raw_text.splitlines()
+            # The file is copied to a job directory and scored by background worker
+            # processes (read in chunks, encoding detected from its first bytes), so the
+            # run survives navigation or a dropped connection and analysts can queue
+            # several files without blocking interactive predictions; results appear
+            # while the rest of a large upload is still being scored
+            from ingestion import open_upload
+            upload = open_upload(uploaded_file, uploaded_file.name)
+            column = None
+            if upload.columns:
+                column = st.selectbox(
+                    "Review column",
+                    upload.columns,
+                    index=upload.columns.index(upload.default_column)
+                )
+            if st.button("🚀 Submit scoring job"):
+                jobs.ensure_workers()
+                st.query_params["job"] = job_queue.submit(uploaded_file, uploaded_file.name, column, explain=explain)
+
+        # The job being followed is kept in the URL (?job=<id>) so a reload reattaches to it
+        recent_jobs = job_queue.recent()
+        if recent_jobs:
+            with st.expander("📋 Recent jobs"):
+                st.dataframe(pd.DataFrame(recent_jobs, columns=["id", "name", "status", "rows", "progress", "model_version"]),
+                             hide_index=True, use_container_width=True)
+                job_names = {job["id"]: job["name"] for job in recent_jobs}
+                open_job = st.selectbox("Open job", list(job_names), index=None,
+                                        format_func=lambda job_id: f"{job_id} ({job_names[job_id]})")
+                if open_job and open_job != st.query_params.get("job"):
+                    st.query_params["job"] = open_job
+                    st.rerun()
+
+        job_id = st.query_params.get("job")
+        job = job_queue.get(job_id) if job_id else None
+        if job_id and job is None:
+            st.warning(f"Job {job_id} not found (finished jobs are kept for {jobs.RETENTION_DAYS} days)")
+        elif job is not None:
+            if job["status"] not in jobs.FINISHED:
+                # Workers are restarted here if the app process was restarted while jobs waited
+                jobs.ensure_workers()
+            st.write(f"🔮 Job `{job_id}`: {job['name']}")
+            # Polls the queue every second while the job runs, then reruns the whole page once
+            st.fragment(run_every=None if job["status"] in jobs.FINISHED else 1.0)(show_job_progress)(job_id, job["status"])
+            if job["status"] == "done":
+                # The full results are only served as a download, read from the job's file;
+                # the page loads the first rows for the table and the label counts saved by the job
+                with open(jobs.result_path(job_id), "rb") as result_file:
+                    st.download_button("⬇️ Download results (CSV)", result_file,
+                                       file_name=f"{os.path.splitext(job['name'])[0]}_predictions.csv", mime="text/csv")
+                results = jobs.read_result(job_id, RESULT_PREVIEW_ROWS)
+                total_reviews = job["rows"]
+                label_totals = jobs.label_counts(job)
+                user_content = results["Original Text"].tolist()
+                predictions = results["Prediction"].tolist()
+                if set(jobs.EXPLANATION_COLUMNS) <= set(results.columns):
+                    explanations = results[jobs.EXPLANATION_COLUMNS]
     
     # Perform preprocessing and prediction if content exists
     if user_content:
-        st.write("🔮 Processing your input...")
-        processed_content = [
-            preprocess(text, emoji_dict, teen_dict, wrong_lst, stopwords_lst)
-            for text in user_content
-        ]
-        predictions = model.predict(processed_content)
+        if input_type == "Input Text":
+            st.write("🔮 Processing your input...")
+            # Dictionaries are loaded as dicts/sets from a precompiled cache in .cache/,
+            # rebuilt automatically when one of the .txt files changes. Duplicate texts
+            # and previously seen texts are served from the preprocess cache
+            from lexicon import load_lexicon
+            from model_registry import get_model
+            from preprocess_cache import cached_preprocess_batch
+            lexicon = load_lexicon()
+            processed_content = cached_preprocess_batch(user_content, lexicon)
+            model = get_model()
+            explained = model.explain(processed_content) if explain else None
+            if explained is not None:
+                # Scores and per-term contributions come from one pass over the batch
+                from compiled_model import format_terms
+                predictions, scores, positive_terms, negative_terms = explained
+                explanations = pd.DataFrame({
+                    "Positive terms": [format_terms(terms) for terms in positive_terms],
+                    "Negative terms": [format_terms(terms) for terms in negative_terms],
+                })
+            else:
+                if explain:
+                    st.caption("Explanations are not available for the active model (only linear and RBF SVM pipelines)")
+                predictions, scores = model.predict_with_scores(processed_content)
+            # Each prediction is recorded once in the history store; reruns of the page
+            # for the same text and model (any widget change) are not recorded again
+            from history import get_history
+            prediction_history = get_history()
+            recorded_key = (tuple(user_content), model.version)
+            if prediction_history is not None and st.session_state.get("history_recorded") != recorded_key:
+                prediction_history.record(user_content, processed_content, predictions, scores, model.version, source="text")
+                st.session_state["history_recorded"] = recorded_key
         
         # Create DataFrame with icons for predictions
         def get_sentiment_icon(prediction):
@@ -130,9 +243,11 @@ elif menu_choice == "New Prediction":
                 return '❌ Negative'
         
         results_df = pd.DataFrame({
-            "Original Text": user_content,
-            "Prediction": [get_sentiment_icon(pred) for pred in predictions]
+            "Original Text": user_content[:RESULT_PREVIEW_ROWS],
+            "Prediction": [get_sentiment_icon(pred) for pred in predictions[:RESULT_PREVIEW_ROWS]]
         })
+        if explanations is not None:
+            results_df[["Positive terms", "Negative terms"]] = explanations.iloc[:RESULT_PREVIEW_ROWS].to_numpy()
         
         # Color mapping for predictions
         def color_prediction(val):
@@ -142,20 +257,29 @@ elif menu_choice == "New Prediction":
                 return 'background-color: #f8d7da; color: #721c24; font-weight: bold;'
             return ''
         
-        styled_df = results_df.style.applymap(
-            color_prediction,
-            subset=['Prediction']
-        )
-        
         st.write("### 📊 Prediction Results")
-        st.dataframe(styled_df, use_container_width=True)
+        with metrics.timer('results.render'):
+            styled_df = results_df.style.applymap(
+                color_prediction,
+                subset=['Prediction']
+            )
+            if explanations is not None:
+                # Terms pushing towards Positive in green, towards Negative in red
+                styled_df = styled_df.applymap(lambda val: 'color: #155724;', subset=['Positive terms'])
+                styled_df = styled_df.applymap(lambda val: 'color: #721c24;', subset=['Negative terms'])
+            st.dataframe(styled_df, use_container_width=True)
+        total_reviews = total_reviews or len(user_content)
+        if total_reviews > len(results_df):
+            st.caption(f"Showing the first {len(results_df):,} of {total_reviews:,} reviews, "
+                       "download the CSV for all results")
         
         # Only show sentiment distribution for multiple lines (file upload)
-        if input_type == "Upload File" and len(user_content) > 1:
+        if input_type == "Upload File" and total_reviews > 1:
             st.write("### 📈 Sentiment Distribution")
-            # Clean predictions for counting (remove icons)
-            clean_predictions = [pred.split()[1] for pred in results_df['Prediction']]
-            sentiment_counts = pd.Series(clean_predictions).value_counts()
+            # Fixed label order so colors always match the sentiment
+            sentiment_counts = pd.Series(label_totals) if label_totals is not None else pd.Series(predictions).value_counts()
+            sentiment_counts = sentiment_counts.reindex(['Positive', 'Negative'], fill_value=0)
+            import matplotlib.pyplot as plt
             
             fig, ax = plt.subplots()
             sentiment_counts.plot(
@@ -167,15 +291,52 @@ elif menu_choice == "New Prediction":
             )
             ax.set_title('Overall Sentiment Distribution')
             st.pyplot(fig)
+
+        # Reviews from the whole corpus that say the same thing as the typed review,
+        # looked up in the prebuilt TF-IDF index (memory-mapped, shared by all sessions)
+        # The section is hidden when the review corpus (data_clean_2.csv) is not available
+        if input_type == "Input Text":
+            from similar_reviews import load_index as load_similar_index
+            try:
+                similar_index = load_similar_index()
+            except FileNotFoundError:
+                similar_index = None
+            if similar_index is not None:
+                st.write("### 🔎 Similar Reviews")
+                show_similar_reviews(similar_index.similar_to_text(processed_content[0], k=10))
+
+    # Sentiment trend and model comparison over everything scored on this page and by
+    # upload jobs, read from the daily rollup of the history store (not the raw rows)
+    from history import get_history
+    prediction_history = get_history()
+    if prediction_history is not None:
+        with st.expander("📜 Prediction history"):
+            history_days = st.selectbox("Period", [7, 30, 90, 365], index=1, format_func=lambda days: f"Last {days} days")
+            trend = pd.DataFrame(prediction_history.trend(history_days), columns=["day", "label", "predictions", "average_score"])
+            if trend.empty:
+                st.caption("No predictions recorded in this period")
+            else:
+                st.bar_chart(trend.pivot(index="day", columns="label", values="predictions").fillna(0),
+                             color=["#e74c3c", "#2ecc71"] if set(trend["label"]) == {"Negative", "Positive"} else None)
+                st.dataframe(pd.DataFrame(prediction_history.compare_models(history_days)),
+                             hide_index=True, use_container_width=True)
             
 elif menu_choice == 'Product Analysis':
-    def load_data():
-        df_products = pd.read_csv('San_pham_full.csv')
-        df_ratings = pd.read_csv('Danh_gia_full.csv')
-        df_ratings_da_xu_ly = pd.read_csv('data_clean_2.csv')
-        return df_products, df_ratings, df_ratings_da_xu_ly
-
-    df_products, df_ratings, df_ratings_da_xu_ly = load_data()
+    import pandas as pd
+    import matplotlib.pyplot as plt
+    from aggregates import POSITIVE_STARS, STARS, load_aggregates
+    from data_store import load_product_data
+    from product_search import get_search_index
+    from similar_reviews import load_index as load_similar_index
+    from wordcloud_store import SENTIMENT_COLORS, load_store as load_wordcloud_store, wordcloud_png
+
+    # CSVs are converted once into memory-mapped columnar files indexed by product,
+    # shared by all sessions and rebuilt automatically when a CSV changes
+    product_data = load_product_data()
+    df_products = product_data.products
+    # Star histogram / sentiment counts per product, refreshed incrementally when
+    # ratings are appended to Danh_gia_full.csv
+    rating_aggregates = load_aggregates()
 
     # Function to Display Product Information
     def hien_thi_san_pham(ma_sp):
@@ -226,11 +387,8 @@ elif menu_choice == 'Product Analysis':
     # Function to Analyze Ratings
     def analyze_ratings(ma_sp):
         try:
-            # Join hai bảng
-            df_merged = pd.merge(df_products, df_ratings, on='ma_san_pham', how='left')
-            
-            # Lọc dữ liệu cho sản phẩm được chọn
-            product_ratings = df_merged[df_merged['ma_san_pham'] == ma_sp]
+            # Lấy dữ liệu đánh giá của sản phẩm được chọn (đã join với bảng sản phẩm)
+            product_ratings = product_data.product_ratings(ma_sp)
             if len(product_ratings) == 0:
                 st.error("❌ Không tìm thấy sản phẩm với mã này")
                 return
@@ -238,9 +396,11 @@ elif menu_choice == 'Product Analysis':
             # Lấy thông tin sản phẩm
             ten_sp = product_ratings['ten_san_pham'].iloc[0]
 
-            # Tính toán thống kê
-            rating_counts = product_ratings['so_sao'].value_counts().sort_index(ascending=False)
-            total_ratings = len(product_ratings)
+            # Tính toán thống kê (đọc từ bảng tổng hợp theo sản phẩm)
+            rating_summary = rating_aggregates.product(ma_sp)
+            rating_counts = pd.Series({stars: rating_summary[f'stars_{stars}'] for stars in STARS})
+            rating_counts = rating_counts[rating_counts > 0].sort_index(ascending=False)
+            total_ratings = rating_summary['reviews']
             rating_percentages = (rating_counts / total_ratings * 100).round(1)
 
             # Plot biểu đồ
@@ -289,7 +449,7 @@ elif menu_choice == 'Product Analysis':
             )
              # Thêm phần hiển thị bình luận mẫu ở đây
             st.write("\n### 📝 Một số bình luận của khách hàng:")
-            reviews_sample = product_ratings[['noi_dung_binh_luan', 'so_sao']].dropna().head(5)
+            reviews_sample = product_ratings[['id', 'noi_dung_binh_luan', 'so_sao']].dropna().head(5)
             
             for _, review in reviews_sample.iterrows():
                 with st.container():
@@ -299,6 +459,14 @@ elif menu_choice == 'Product Analysis':
                             <div style="margin-top: 5px; color: #000000;">{review.noi_dung_binh_luan}</div>
                         </div>
                     """, unsafe_allow_html=True)
+                    # Bình luận tiêu cực: các bình luận cùng nội dung trên mọi sản phẩm
+                    if review.so_sao < POSITIVE_STARS:
+                        with st.expander("🔎 Bình luận tương tự"):
+                            similar = load_similar_index().similar_to_review(int(review.id), k=10)
+                            if similar is None:
+                                st.caption("Bình luận chưa có trong chỉ mục (chưa được làm sạch)")
+                            else:
+                                show_similar_reviews(similar)
 
 
         except Exception as e:
@@ -307,57 +475,29 @@ elif menu_choice == 'Product Analysis':
     # Function to Create Sentiment Word Clouds
     def create_sentiment_wordclouds(ma_sp):
         try:
-            # Merge data
-            df_merged = pd.merge(df_products, df_ratings, on='ma_san_pham', how='left')
-            df_merged_2 = pd.merge(df_merged.drop(columns=['noi_dung_binh_luan']), df_ratings_da_xu_ly, on='id', how='left')
-            # Lọc dữ liệu cho sản phẩm được chọn
-            product_data = df_merged_2[df_merged_2['ma_san_pham'] == ma_sp]
-            if len(product_data) == 0:
+            san_pham = product_data.product(ma_sp)
+            if san_pham is None:
                 st.error("❌ Không tìm thấy sản phẩm với mã này")
                 return
 
-            ten_sp = product_data['ten_san_pham'].iloc[0]
+            ten_sp = san_pham['ten_san_pham']
 
-            # Wordclouds for sentiment analysis
-            sentiment_colors = {'Positive': '#2ecc71', 'Negative': '#e74c3c'}
-            fig, axes = plt.subplots(2, 1, figsize=(20, 10))
-
-            for idx, sentiment in enumerate(sentiment_colors.keys()):
-                sentiment_comments = product_data[product_data['sentiment'] == sentiment]
-                
-# Wordclouds for sentiment analysis
-            sentiment_colors = {'Positive': '#2ecc71', 'Negative': '#e74c3c'}
-            fig, axes = plt.subplots(2, 1, figsize=(20, 10))
+            # Wordclouds for sentiment analysis, rendered from precomputed term
+            # frequencies; the PNGs are cached per (product, sentiment, data version)
+            sentiment_colors = SENTIMENT_COLORS
+            wordcloud_terms = load_wordcloud_store()
 
-            for idx, sentiment in enumerate(sentiment_colors.keys()):
-                sentiment_comments = product_data[product_data['sentiment'] == sentiment]
-                
-                if len(sentiment_comments) > 0:
-                    # Kết hợp tất cả comment - đã sửa cách gọi hàm preprocess
-                    text = ' '.join(sentiment_comments['noi_dung_binh_luan'].apply(
-                        lambda x: preprocess(x, emoji_dict, teen_dict, wrong_lst, stopwords_lst)
-                    ))
-                    
-                    # Tạo wordcloud
-                    wordcloud = WordCloud(
-                        width=800, 
-                        height=400, 
-                        background_color='white', 
-                        max_words=100, 
-                        color_func=lambda *args, **kwargs: sentiment_colors[sentiment]
-                    ).generate(text)
-                    
-                    axes[idx].imshow(wordcloud, interpolation='bilinear')
-                    axes[idx].axis('off')
-                    axes[idx].set_title(f'Wordcloud cho đánh giá {sentiment.upper()}\n({len(sentiment_comments)} bình luận)', pad=20, size=15)
-
-            plt.tight_layout()
-            st.pyplot(fig)
-            plt.close()  # Giải phóng bộ nhớ
+            for sentiment in sentiment_colors.keys():
+                image = wordcloud_png(ma_sp, sentiment, wordcloud_terms)
+                if image is not None:
+                    st.markdown(f"<div style='text-align:center;font-size:18px'>Wordcloud cho đánh giá {sentiment.upper()}<br>"
+                                f"({wordcloud_terms.comments(ma_sp, sentiment)} bình luận)</div>", unsafe_allow_html=True)
+                    st.image(image, use_container_width=True)
 
             # Hiển thị thống kê sentiment dưới dạng bảng
-            sentiment_counts = product_data['sentiment'].value_counts()
-            total_comments = len(product_data)
+            rating_summary = rating_aggregates.product(ma_sp)
+            sentiment_counts = {'Positive': int(rating_summary['positive']), 'Negative': int(rating_summary['negative'])}
+            total_comments = int(rating_summary['reviews'])
             
             stats_data = {
                 'Loại cảm xúc': list(sentiment_colors.keys()),
@@ -411,79 +551,123 @@ elif menu_choice == 'Product Analysis':
     # Streamlit UI
     st.title("Ứng Dụng Phân Tích Sản Phẩm")
 
-    # Thêm search box
-    search_keyword = st.text_input("🔍 Tìm kiếm sản phẩm", placeholder="Nhập tên sản phẩm (ví dụ: kem)")
+    # Bảng xếp hạng sản phẩm / phân loại, đọc từ bảng tổng hợp
+    def show_leaderboard():
+        col1, col2, col3 = st.columns(3)
+        group = col1.radio("Xếp hạng theo", ["Sản phẩm", "Phân loại"], horizontal=True)
+        sort_options = {
+            "Tỉ lệ đánh giá tiêu cực": ('negative_share', False),
+            "Số đánh giá tiêu cực": ('negative', False),
+            "Số lượng đánh giá": ('reviews', False),
+            "Điểm trung bình cao nhất": ('average_score', False),
+            "Điểm trung bình thấp nhất": ('average_score', True),
+        }
+        sort_choice = col2.selectbox("Tiêu chí", list(sort_options))
+        periods = {"7 ngày gần nhất": 7, "30 ngày gần nhất": 30, "90 ngày gần nhất": 90, "Toàn bộ": None}
+        period = col3.selectbox("Thời gian", list(periods))
+        min_reviews = st.slider("Số đánh giá tối thiểu", min_value=1, max_value=100, value=5)
+
+        sort, ascending = sort_options[sort_choice]
+        by = 'product' if group == "Sản phẩm" else 'category'
+        table = rating_aggregates.leaderboard(by, sort, periods[period], min_reviews, top=20, ascending=ascending)
+        latest_day = rating_aggregates.latest_day()
+        if periods[period] is not None and latest_day is not None:
+            st.caption(f"Tính đến ngày đánh giá gần nhất: {latest_day:%d/%m/%Y}")
+        if table.empty:
+            st.info("Không có dữ liệu đánh giá trong khoảng thời gian này")
+            return
+        columns = ['ma_san_pham', 'ten_san_pham', 'phan_loai'] if by == 'product' else ['phan_loai']
+        st.dataframe(
+            table[columns + ['reviews', 'positive', 'negative', 'negative_share', 'average_score']],
+            column_config={
+                "ma_san_pham": st.column_config.Column("Mã SP", width="small"),
+                "ten_san_pham": st.column_config.Column("Tên sản phẩm", width="large"),
+                "phan_loai": st.column_config.Column("Phân loại", width="medium"),
+                "reviews": st.column_config.NumberColumn("Số đánh giá", format="%d"),
+                "positive": st.column_config.NumberColumn("Positive", format="%d"),
+                "negative": st.column_config.NumberColumn("Negative", format="%d"),
+                "negative_share": st.column_config.ProgressColumn("Tỉ lệ tiêu cực", format="%.2f", min_value=0, max_value=1),
+                "average_score": st.column_config.NumberColumn("Điểm TB ⭐", format="%.2f"),
+            },
+            hide_index=True
+        )
+
+    view = st.radio("Chế độ xem", ["🔍 Phân tích sản phẩm", "🏆 Bảng xếp hạng"], horizontal=True)
+    if view == "🏆 Bảng xếp hạng":
+        show_leaderboard()
+    else:
+        # Thêm search box
+        search_keyword = st.text_input("🔍 Tìm kiếm sản phẩm", placeholder="Nhập tên sản phẩm (ví dụ: kem)")
 
-    if search_keyword:
-        # Tìm kiếm trong tên sản phẩm, không phân biệt hoa thường
-        mask = df_products['ten_san_pham'].str.contains(search_keyword, case=False, na=False)
-        search_results = df_products[mask].copy()
+        if search_keyword:
+            # Tìm kiếm trong tên sản phẩm qua chỉ mục, không phân biệt hoa thường và dấu
+            search_results = df_products.iloc[get_search_index(product_data).search(search_keyword)].copy()
         
-        if len(search_results) > 0:
-            # Tạo cột hiển thị giá đã format
-            search_results['gia_hien_thi'] = search_results['gia_ban'].apply(lambda x: f"{x:,.0f} VNĐ")
+            if len(search_results) > 0:
+                # Tạo cột hiển thị giá đã format
+                search_results['gia_hien_thi'] = search_results['gia_ban'].apply(lambda x: f"{x:,.0f} VNĐ")
             
-            # Hiển thị kết quả tìm kiếm
-            st.write(f"Tìm thấy {len(search_results)} sản phẩm:")
+                # Hiển thị kết quả tìm kiếm
+                st.write(f"Tìm thấy {len(search_results)} sản phẩm:")
             
-            # Tạo DataFrame để hiển thị kết quả tìm kiếm
-            display_df = search_results[['ma_san_pham', 'ten_san_pham', 'gia_hien_thi', 'diem_trung_binh']].copy()
+                # Tạo DataFrame để hiển thị kết quả tìm kiếm
+                display_df = search_results[['ma_san_pham', 'ten_san_pham', 'gia_hien_thi', 'diem_trung_binh']].copy()
             
-            # Hiển thị kết quả với format
-            st.dataframe(
-                display_df,
-                column_config={
-                    "ma_san_pham": st.column_config.NumberColumn(
-                        "Mã SP",
-                        width="small"
-                    ),
-                    "ten_san_pham": st.column_config.Column(
-                        "Tên sản phẩm",
-                        width="large"
-                    ),
-                    "gia_hien_thi": st.column_config.Column(
-                        "Giá bán",
-                        width="medium"
-                    ),
-                    "diem_trung_binh": st.column_config.NumberColumn(
-                        "Đánh giá ⭐",
-                        width="small",
-                        format="%.1f"
-                    )
-                },
-                hide_index=True
-            )
+                # Hiển thị kết quả với format
+                st.dataframe(
+                    display_df,
+                    column_config={
+                        "ma_san_pham": st.column_config.NumberColumn(
+                            "Mã SP",
+                            width="small"
+                        ),
+                        "ten_san_pham": st.column_config.Column(
+                            "Tên sản phẩm",
+                            width="large"
+                        ),
+                        "gia_hien_thi": st.column_config.Column(
+                            "Giá bán",
+                            width="medium"
+                        ),
+                        "diem_trung_binh": st.column_config.NumberColumn(
+                            "Đánh giá ⭐",
+                            width="small",
+                            format="%.1f"
+                        )
+                    },
+                    hide_index=True
+                )
             
-            # Cho phép chọn sản phẩm từ kết quả tìm kiếm
-            ma_san_pham_list = search_results['ma_san_pham'].tolist()
-            ten_san_pham_list = search_results['ten_san_pham'].tolist()
+                # Cho phép chọn sản phẩm từ kết quả tìm kiếm
+                ma_san_pham_list = search_results['ma_san_pham'].tolist()
+                ten_san_pham_list = search_results['ten_san_pham'].tolist()
             
-            # Tạo danh sách options với format "Mã SP - Tên SP"
-            options = [f"{ma} - {ten}" for ma, ten in zip(ma_san_pham_list, ten_san_pham_list)]
+                # Tạo danh sách options với format "Mã SP - Tên SP"
+                options = [f"{ma} - {ten}" for ma, ten in zip(ma_san_pham_list, ten_san_pham_list)]
             
-            selected_product = st.selectbox(
-                "Chọn sản phẩm để phân tích:",
-                options=options,
-                format_func=lambda x: x.split(" - ")[1]  # Chỉ hiển thị tên SP trong dropdown
-            )
+                selected_product = st.selectbox(
+                    "Chọn sản phẩm để phân tích:",
+                    options=options,
+                    format_func=lambda x: x.split(" - ")[1]  # Chỉ hiển thị tên SP trong dropdown
+                )
             
-            if selected_product:
-                # Lấy mã sản phẩm từ option đã chọn
-                ma_san_pham_input = int(selected_product.split(" - ")[0])
+                if selected_product:
+                    # Lấy mã sản phẩm từ option đã chọn
+                    ma_san_pham_input = int(selected_product.split(" - ")[0])
                 
-                # Hiển thị các phân tích
-                st.subheader("📦 THÔNG TIN SẢN PHẨM 📦")
-                hien_thi_san_pham(ma_san_pham_input)
+                    # Hiển thị các phân tích
+                    st.subheader("📦 THÔNG TIN SẢN PHẨM 📦")
+                    hien_thi_san_pham(ma_san_pham_input)
                 
-                st.subheader("📊 PHÂN TÍCH ĐÁNH GIÁ SẢN PHẨM 📊")
-                analyze_ratings(ma_san_pham_input)
+                    st.subheader("📊 PHÂN TÍCH ĐÁNH GIÁ SẢN PHẨM 📊")
+                    analyze_ratings(ma_san_pham_input)
 
-                st.subheader("📊 PHÂN TÍCH CẢM XÚC BÌNH LUẬN SẢN PHẨM 📊")
-                create_sentiment_wordclouds(ma_san_pham_input)
+                    st.subheader("📊 PHÂN TÍCH CẢM XÚC BÌNH LUẬN SẢN PHẨM 📊")
+                    create_sentiment_wordclouds(ma_san_pham_input)
+            else:
+                st.warning(f"Không tìm thấy sản phẩm nào với từ khóa: {search_keyword}")
         else:
-            st.warning(f"Không tìm thấy sản phẩm nào với từ khóa: {search_keyword}")
-    else:
-        st.info("👆 Nhập từ khóa để tìm kiếm sản phẩm")
+            st.info("👆 Nhập từ khóa để tìm kiếm sản phẩm")
 
 elif menu_choice == "Build Model":
     st.subheader("Xây dựng mô hình đánh giá")
@@ -516,12 +700,73 @@ elif menu_choice == "Build Model":
 
     st.markdown('''#### 4. Ðánh giá mô hình''')
     st.markdown('''- Dùng kỹ thuật cross-validation để đánh giá so sánh hiệu suất của các mô hình cho dữ liệu trên. Kết quả:''')
-    st.image('bm_model_sel.jpg')
-    st.markdown('''###### &nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;=> Mô hình SVM cho kết quả dự đoán tốt nhất => chọn SVM làm mô hình phân tích cho ứng dụng ''')    
-    st.markdown('''- Chi tiết kết quả khi áp dụng mô hình SVM:''')
-    # st.image('bm_svm_rs.jpg')
-    # st.image('bm_svm_confusion_matrix.png')
-    col1, col2 = st.columns([1, 1])
-    col1.image('bm_svm_rs.jpg')
-    col2.image('bm_svm_confusion_matrix.png')
-
+    # Results of the latest `python training.py` run when there is one, otherwise
+    # the images from the original notebook
+    from training_report import load_report
+    report = load_report()
+    if report is None:
+        st.image('bm_model_sel.jpg')
+        st.markdown('''###### &nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;=> Mô hình SVM cho kết quả dự đoán tốt nhất => chọn SVM làm mô hình phân tích cho ứng dụng ''')    
+        st.markdown('''- Chi tiết kết quả khi áp dụng mô hình SVM:''')
+        # st.image('bm_svm_rs.jpg')
+        # st.image('bm_svm_confusion_matrix.png')
+        col1, col2 = st.columns([1, 1])
+        col1.image('bm_svm_rs.jpg')
+        col2.image('bm_svm_confusion_matrix.png')
+    else:
+        # Markdown tables keep this page free of pandas
+        def markdown_table(headers, rows):
+            lines = ['| ' + ' | '.join(headers) + ' |', '|' + ' --- |' * len(headers)]
+            lines += ['| ' + ' | '.join(str(cell) for cell in row) + ' |' for row in rows]
+            return '\n'.join(lines)
+
+        selected = report['models'][report['selected']]
+        st.caption(f"Huấn luyện lúc {report['created']}: {report['reviews']:,} đánh giá, "
+                   f"train {report['train_reviews']:,} / test {report['test_reviews']:,}, {report['folds']}-fold cross-validation")
+        st.markdown(markdown_table(
+            ['Model', 'CV Accuracy', 'CV Std', 'CV F1 (macro)', 'Train Accuracy', 'Test Accuracy'],
+            [[result['name']] + [f"{result[key]:.4f}" for key in ('cv_accuracy', 'cv_accuracy_std', 'cv_f1_macro', 'train_accuracy', 'test_accuracy')]
+             for result in report['models'].values()]
+        ))
+        st.markdown(f'''###### &nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;=> Chọn {selected['name']} làm mô hình phân tích cho ứng dụng ''')
+        st.markdown(f'''- Chi tiết kết quả khi áp dụng mô hình {selected['name']}:''')
+        col1, col2 = st.columns([1, 1])
+        col1.markdown(markdown_table(
+            ['', 'precision', 'recall', 'f1', 'support'],
+            [[label, f"{scores['precision']:.2f}", f"{scores['recall']:.2f}", f"{scores['f1']:.2f}", scores['support']]
+             for label, scores in selected['classes'].items()]
+        ))
+        col2.markdown(markdown_table(
+            [''] + [f'Dự đoán: {label}' for label in selected['classes']],
+            [[f'Thực tế: {label}'] + row for label, row in zip(selected['classes'], selected['confusion_matrix'])]
+        ))
+        st.markdown('''- Thời gian từng bước (giây):''')
+        st.markdown(markdown_table(['Bước', 'Giây'], [[name, f'{seconds:.2f}'] for name, seconds in report['timings'].items()]))
+
+# Hidden admin panel (open the app with ?admin=1): per-stage timings, cache hit
+# rates and memory of this process. Collection is off unless HASAKI_METRICS=1
+# or it is switched on here.
+if st.query_params.get("admin") == "1":
+    st.divider()
+    st.subheader("🛠️ Runtime Metrics")
+    import pandas as pd
+    metrics.enable(st.toggle("Collect metrics", value=metrics.enabled))
+    if st.button("Reset metrics"):
+        metrics.reset()
+    metrics_data = metrics.snapshot()
+    if metrics_data['timings']:
+        timings_df = pd.DataFrame.from_dict(metrics_data['timings'], orient='index').sort_values('total_seconds', ascending=False)
+        for column in ['p50', 'p95', 'p99']:
+            timings_df[column] = timings_df[column] * 1000
+        st.dataframe(
+            timings_df.rename(columns={'p50': 'p50 (ms)', 'p95': 'p95 (ms)', 'p99': 'p99 (ms)', 'total_seconds': 'Total (s)', 'count': 'Calls'}),
+            use_container_width=True
+        )
+    else:
+        st.info("No timings recorded yet.")
+    col1, col2 = st.columns(2)
+    col1.metric("Preprocess cache hit rate", f"{metrics_data['gauges'].get('preprocess_cache_hit_rate', 0.0):.1%}")
+    resident = metrics_data['gauges'].get('process_resident_memory_bytes')
+    col2.metric("Resident memory", f"{resident / 2**20:,.0f} MB" if resident else "n/a")
+    with st.expander("Prometheus text"):
+        st.code(metrics.render_prometheus(metrics_data), language='text')
@@ -0,0 +1,288 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+import metrics
+
+# Tăng khi đổi cấu trúc thư mục mô hình đã biên dịch
+COMPILED_FORMAT = 1
+ROWS_PER_BLOCK = 2048
+# Khối nhỏ hơn khi giải thích: mỗi khối tạo ma trận dày (hàng x token có mặt trong khối)
+EXPLAIN_ROWS_PER_BLOCK = 256
+
+
+# Biên dịch pipeline TfidfVectorizer -> (SMOTE) -> SVC/linear thành các mảng numpy:
+# từ điển (danh sách token theo chỉ số cột), idf, rồi hệ số tuyến tính hoặc các
+# support vector (CSR) + dual_coef cho kernel RBF. SMOTE chỉ dùng khi huấn luyện nên bỏ qua.
+def compile_pipeline(pipeline, directory):
+    vectorizer = pipeline.steps[0][1]
+    classifier = pipeline.steps[-1][1]
+    # Chỉ TfidfVectorizer unigram theo từ; các tham số vectorize() không mô phỏng thì từ chối
+    if (not hasattr(vectorizer, 'idf_') or getattr(vectorizer, 'analyzer', None) != 'word'
+            or vectorizer.ngram_range != (1, 1) or vectorizer.tokenizer or vectorizer.preprocessor):
+        raise ValueError('Only unigram word TfidfVectorizer pipelines can be compiled')
+    if vectorizer.binary or vectorizer.strip_accents or vectorizer.norm not in ('l2', None):
+        raise ValueError('TfidfVectorizer with binary, strip_accents or l1 norm cannot be compiled')
+    # Các bước giữa chỉ được là bộ lấy mẫu (SMOTE: chỉ chạy khi huấn luyện)
+    for name, step in pipeline.steps[1:-1]:
+        if step not in (None, 'passthrough') and not hasattr(step, 'fit_resample'):
+            raise ValueError(f'Pipeline step {name!r} cannot be compiled')
+    if len(getattr(classifier, 'classes_', ())) != 2:
+        raise ValueError('Only binary classifiers can be compiled')
+    # Tuyến tính (coef_) hoặc SVC kernel RBF (support_vectors_ + dual_coef_); còn lại
+    # (RandomForest, MultinomialNB, kernel khác) không biên dịch được
+    kernel = getattr(classifier, 'kernel', None)
+    if kernel == 'rbf' and hasattr(classifier, 'support_vectors_') and hasattr(classifier, 'dual_coef_'):
+        kernel = 'rbf'
+    elif kernel in (None, 'linear') and hasattr(classifier, 'coef_') and hasattr(classifier, 'intercept_'):
+        kernel = 'linear'
+    else:
+        raise ValueError(f'Unsupported classifier: {type(classifier).__name__}')
+
+    os.makedirs(directory, exist_ok=True)
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    arrays = {
+        'idf': np.asarray(vectorizer.idf_, dtype=np.float64) if vectorizer.use_idf else np.ones(len(terms)),
+    }
+    meta = {
+        'format': COMPILED_FORMAT,
+        'token_pattern': vectorizer.token_pattern,
+        'lowercase': vectorizer.lowercase,
+        'norm': vectorizer.norm,
+        'sublinear_tf': vectorizer.sublinear_tf,
+        'classes': [str(label) for label in classifier.classes_],
+        'intercept': float(np.ravel(classifier.intercept_)[0]),
+    }
+    if kernel == 'linear':
+        coef = classifier.coef_
+        meta['kernel'] = 'linear'
+        arrays['coef'] = np.ravel(coef.toarray() if sp.issparse(coef) else coef).astype(np.float64)
+    else:
+        support_vectors = sp.csr_matrix(classifier.support_vectors_, dtype=np.float64)
+        # Lưu dạng chuyển vị (token x support vector) để nhân thẳng với ma trận văn bản
+        support_vectors_t = support_vectors.T.tocsr()
+        support_vectors_t.sort_indices()
+        meta['kernel'] = 'rbf'
+        meta['gamma'] = float(classifier._gamma)
+        arrays['sv_data'] = support_vectors_t.data
+        arrays['sv_indices'] = support_vectors_t.indices.astype(np.int32)
+        arrays['sv_indptr'] = support_vectors_t.indptr.astype(np.int64)
+        arrays['sv_norms'] = np.asarray(support_vectors.multiply(support_vectors).sum(axis=1)).ravel()
+        dual_coef = classifier.dual_coef_
+        arrays['dual_coef'] = np.ravel(dual_coef.toarray() if sp.issparse(dual_coef) else dual_coef).astype(np.float64)
+
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f'{name}.npy'), array)
+    # Token chỉ gồm ký tự \w nên lưu mỗi dòng một token, theo thứ tự chỉ số cột
+    with open(os.path.join(directory, 'terms.txt'), 'w', encoding='utf8') as file:
+        file.write('\n'.join(terms))
+    with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf8') as file:
+        json.dump(meta, file)
+    return directory
+
+
+# Mô hình đã biên dịch: vector hóa cả lô thành một ma trận CSR trong một lượt,
+# rồi tính điểm quyết định bằng phép nhân ma trận thưa (theo từng khối hàng cho kernel RBF)
+class CompiledModel:
+    def __init__(self, directory):
+        with open(os.path.join(directory, 'meta.json'), encoding='utf8') as file:
+            meta = json.load(file)
+        if meta.get('format') != COMPILED_FORMAT:
+            raise ValueError(f'Compiled model format {meta.get("format")} is not supported')
+        self.meta = meta
+
+        def load(name):
+            return np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r')
+
+        with open(os.path.join(directory, 'terms.txt'), encoding='utf8') as file:
+            self.terms = file.read().split('\n')
+        self.vocabulary = {term: index for index, term in enumerate(self.terms)}
+        self.idf = load('idf')
+        self.classes = np.array(meta['classes'], dtype=object)
+        self.intercept = meta['intercept']
+        self.kernel = meta['kernel']
+        self._token_pattern = re.compile(meta['token_pattern'])
+        if self.kernel == 'linear':
+            self.coef = load('coef')
+        else:
+            self.gamma = meta['gamma']
+            self.sv_norms = load('sv_norms')
+            self.support_vectors_t = sp.csr_matrix(
+                (load('sv_data'), load('sv_indices'), load('sv_indptr')),
+                shape=(len(self.vocabulary), len(self.sv_norms)),
+            )
+            self.dual_coef = load('dual_coef')
+
+    # Tương đương TfidfVectorizer.transform: đếm token, nhân idf, chuẩn hóa l2 theo hàng
+    def vectorize(self, texts):
+        vocabulary = self.vocabulary
+        findall = self._token_pattern.findall
+        lowercase = self.meta['lowercase']
+        indices = []
+        indptr = [0]
+        for text in texts:
+            indices.extend(index for index in map(vocabulary.get, findall(text.lower() if lowercase else text))
+                           if index is not None)
+            indptr.append(len(indices))
+        matrix = sp.csr_matrix(
+            (np.ones(len(indices)), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+            shape=(len(indptr) - 1, len(vocabulary)),
+        )
+        matrix.sum_duplicates()
+        if self.meta['sublinear_tf']:
+            np.log(matrix.data, matrix.data)
+            matrix.data += 1
+        matrix.data *= self.idf[matrix.indices]
+        if self.meta['norm'] == 'l2':
+            lengths = np.diff(matrix.indptr)
+            norms = np.sqrt(np.add.reduceat(matrix.data ** 2, matrix.indptr[:-1][lengths > 0])) if len(matrix.data) else np.array([])
+            matrix.data /= np.repeat(norms, lengths[lengths > 0])
+        elif self.meta['norm'] == 'l1':
+            raise ValueError('l1 norm is not supported')
+        return matrix
+
+    def decision_function(self, texts):
+        matrix = self.vectorize(texts)
+        if self.kernel == 'linear':
+            return matrix @ self.coef + self.intercept
+        scores = np.empty(matrix.shape[0])
+        row_norms = np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel()
+        for start in range(0, matrix.shape[0], ROWS_PER_BLOCK):
+            block = matrix[start:start + ROWS_PER_BLOCK]
+            distances = (block @ self.support_vectors_t).toarray()
+            distances *= -2
+            distances += row_norms[start:start + ROWS_PER_BLOCK, None]
+            distances += self.sv_norms
+            np.maximum(distances, 0, out=distances)
+            distances *= -self.gamma
+            np.exp(distances, out=distances)
+            scores[start:start + ROWS_PER_BLOCK] = distances @ self.dual_coef + self.intercept
+        return scores
+
+    # Đóng góp của từng token vào điểm quyết định, cùng cấu trúc thưa với ma trận văn bản.
+    # Tuyến tính: trọng số tf-idf x hệ số (tổng đóng góp + intercept đúng bằng điểm).
+    # RBF: gradient x input theo trọng số tf-idf trước chuẩn hóa l2, với gradient
+    # g_j = -2 gamma (x_j sum_i a_i k_i - sum_i a_i k_i s_ij) của f(x) = sum_i a_i exp(-gamma |x - s_i|^2) + b
+    # đi qua phép chuẩn hóa: x_j g_j - x_j^2 (x . g). Tính theo khối hàng, chỉ trên các cột
+    # token có mặt trong khối; là xấp xỉ tuyến tính (tổng bằng 0), bám sát mức điểm thay đổi
+    # khi bỏ từng token khỏi văn bản. Văn bản chỉ có một token thì token đó nhận cả điểm.
+    def contributions(self, texts):
+        matrix = self.vectorize(texts)
+        contributions = matrix.copy()
+        if self.kernel == 'linear':
+            contributions.data *= self.coef[matrix.indices]
+            return contributions, matrix @ self.coef + self.intercept
+        scores = np.empty(matrix.shape[0])
+        row_norms = np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel()
+        for start in range(0, matrix.shape[0], EXPLAIN_ROWS_PER_BLOCK):
+            block = matrix[start:start + EXPLAIN_ROWS_PER_BLOCK]
+            if block.nnz == 0:
+                scores[start:start + block.shape[0]] = np.exp(-self.gamma * np.asarray(self.sv_norms)) @ self.dual_coef + self.intercept
+                continue
+            distances = (block @ self.support_vectors_t).toarray()
+            distances *= -2
+            distances += row_norms[start:start + EXPLAIN_ROWS_PER_BLOCK, None]
+            distances += self.sv_norms
+            np.maximum(distances, 0, out=distances)
+            distances *= -self.gamma
+            np.exp(distances, out=distances)
+            weighted = distances * self.dual_coef
+            totals = weighted.sum(axis=1)
+            scores[start:start + block.shape[0]] = totals + self.intercept
+            columns, positions = np.unique(block.indices, return_inverse=True)
+            projected = (self.support_vectors_t[columns] @ weighted.T).T
+            rows = np.repeat(np.arange(block.shape[0]), np.diff(block.indptr))
+            gradient = (block.data * totals[rows] - projected[rows, positions]) * (-2 * self.gamma)
+            values = block.data * gradient
+            if self.meta['norm'] == 'l2':
+                values -= block.data ** 2 * np.bincount(rows, weights=values, minlength=block.shape[0])[rows]
+                # Văn bản một token: phần tương đối luôn bằng 0, token đó nhận toàn bộ điểm
+                single = np.diff(block.indptr)[rows] == 1
+                values[single] = scores[start + rows[single]]
+            contributions.data[matrix.indptr[start]:matrix.indptr[start] + block.nnz] = values
+        return contributions, scores
+
+    # Giải thích cả lô: (nhãn, điểm, các token đẩy về lớp thứ hai, các token đẩy về lớp thứ nhất),
+    # mỗi hàng tối đa top token dạng (token, đóng góp), sắp theo độ lớn đóng góp
+    def explain(self, texts, top=3):
+        with metrics.timer('model.explain'):
+            contributions, scores = self.contributions(texts)
+            lengths = np.diff(contributions.indptr)
+            rows = np.repeat(np.arange(contributions.shape[0]), lengths)
+            data = contributions.data
+            explained = []
+            for sign in (1, -1):
+                # Sắp theo hàng rồi theo đóng góp giảm dần (theo hướng sign); giữ top phần tử đầu mỗi hàng
+                order = np.lexsort((-sign * data, rows))
+                rank = np.arange(len(order)) - contributions.indptr[rows[order]]
+                keep = order[(rank < top) & (sign * data[order] > 0)]
+                terms = [[] for _ in range(contributions.shape[0])]
+                for row, index, value in zip(rows[keep].tolist(), contributions.indices[keep].tolist(), data[keep].tolist()):
+                    terms[row].append((self.terms[index], value))
+                explained.append(terms)
+        return self.classes[(scores > 0).astype(int)], scores, explained[0], explained[1]
+
+    # Trả về (nhãn, điểm quyết định); điểm > 0 là lớp thứ hai (như SVC.decision_function)
+    def predict_with_scores(self, texts):
+        with metrics.timer('model.compiled_predict'):
+            scores = self.decision_function(texts)
+        return self.classes[(scores > 0).astype(int)], scores
+
+    def predict(self, texts):
+        return self.predict_with_scores(texts)[0]
+
+
+# Danh sách (token, đóng góp) của một hàng thành chuỗi hiển thị, vd: "kém (-0.29), chậm (-0.74)"
+def format_terms(terms):
+    return ', '.join(f'{term} ({value:+.2f})' for term, value in terms)
+
+
+# Kiểm tra nhãn của mô hình biên dịch trùng với pipeline gốc trên một tập văn bản
+def verify(pipeline, model, texts):
+    start = time.perf_counter()
+    expected = pipeline.predict(texts)
+    pipeline_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    actual, scores = model.predict_with_scores(texts)
+    compiled_seconds = time.perf_counter() - start
+    mismatches = np.flatnonzero(np.asarray(expected, dtype=object) != actual)
+    return {
+        'texts': len(texts),
+        'mismatches': int(len(mismatches)),
+        'min_abs_score': float(np.abs(scores).min()) if len(scores) else None,
+        'pipeline_seconds': pipeline_seconds,
+        'compiled_seconds': compiled_seconds,
+    }
+
+
+def main():
+    import pandas as pd
+
+    from model_registry import get_registry
+
+    parser = argparse.ArgumentParser(description='Compile a registered model into numpy arrays and check label parity')
+    parser.add_argument('--version', default=None, help='model version (default: the active one)')
+    parser.add_argument('--data', default='data_clean_2.csv', help='CSV of preprocessed texts used for the parity check')
+    parser.add_argument('--column', default='noi_dung_binh_luan')
+    args = parser.parse_args()
+
+    registry = get_registry()
+    version = args.version or registry.current_version()
+    directory = registry.compile(version)
+    print(f'Compiled {version} -> {directory}', file=sys.stderr)
+
+    texts = pd.read_csv(args.data, usecols=[args.column], dtype={args.column: str}, keep_default_na=False)[args.column].tolist()
+    result = verify(registry.load(version).pipeline, CompiledModel(directory), texts)
+    print(json.dumps(result, indent=2))
+    if result['mismatches']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+
+import metrics
+from artifacts import cache_path, file_signature, load_artifact, save_artifact
+
+PRODUCTS_FILE = 'San_pham_full.csv'
+RATINGS_FILE = 'Danh_gia_full.csv'
+CLEAN_RATINGS_FILE = 'data_clean_2.csv'
+DATA_FILES = (PRODUCTS_FILE, RATINGS_FILE, CLEAN_RATINGS_FILE)
+
+# Tăng khi đổi cách chuyển đổi dữ liệu sang file cột
+DATA_FORMAT = 1
+
+
+def _write_table(df, path):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+# File Arrow IPC không nén được memory-map: các process dùng chung page cache,
+# chỉ phần dữ liệu của sản phẩm được chọn mới được đổi sang pandas
+def _read_table(path):
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+# Vị trí [start, stop) của từng sản phẩm trong bảng đã sắp theo ma_san_pham
+def _row_offsets(df):
+    codes = df['ma_san_pham'].to_numpy()
+    if len(codes) == 0:
+        return {}
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    stops = np.r_[starts[1:], len(codes)]
+    return {codes[start].item(): (int(start), int(stop)) for start, stop in zip(starts, stops)}
+
+
+# Đọc 3 file CSV một lần, ghi ra file cột trong .cache/data/ kèm chỉ mục theo sản phẩm
+def build_product_data(directory, signature):
+    df_products = pd.read_csv(PRODUCTS_FILE)
+    df_ratings = pd.read_csv(RATINGS_FILE)
+    df_ratings_da_xu_ly = pd.read_csv(CLEAN_RATINGS_FILE)
+
+    df_ratings = df_ratings.sort_values('ma_san_pham', kind='stable').reset_index(drop=True)
+    # Bình luận đã xử lý của từng sản phẩm, nối sẵn theo id thay vì merge ở mỗi lần xem
+    product_ids = df_ratings[['ma_san_pham', 'id']].drop_duplicates()
+    df_clean = pd.merge(product_ids, df_ratings_da_xu_ly, on='id', how='inner')
+    df_clean = df_clean.sort_values('ma_san_pham', kind='stable').reset_index(drop=True)
+
+    _write_table(df_products, os.path.join(directory, 'products.arrow'))
+    _write_table(df_ratings, os.path.join(directory, 'ratings.arrow'))
+    _write_table(df_clean, os.path.join(directory, 'ratings_clean.arrow'))
+    index = {
+        'ratings': _row_offsets(df_ratings),
+        'ratings_clean': _row_offsets(df_clean),
+    }
+    save_artifact(os.path.join(directory, 'index.pkl'), signature, index)
+    return index
+
+
+class ProductData:
+    def __init__(self, directory, index):
+        self.products = _read_table(os.path.join(directory, 'products.arrow')).to_pandas()
+        self._ratings = _read_table(os.path.join(directory, 'ratings.arrow'))
+        self._ratings_clean = _read_table(os.path.join(directory, 'ratings_clean.arrow'))
+        self._index = index
+        self._product_rows = {code: i for i, code in enumerate(self.products['ma_san_pham'].tolist())}
+
+    def _slice(self, table, name, ma_sp):
+        start, stop = self._index[name].get(ma_sp, (0, 0))
+        return table.slice(start, stop - start).to_pandas()
+
+    def product(self, ma_sp):
+        row = self._product_rows.get(ma_sp)
+        return None if row is None else self.products.iloc[row]
+
+    def _product_frame(self, ma_sp):
+        return self.products[self.products['ma_san_pham'] == ma_sp]
+
+    # Tương đương merge(products, ratings, how='left') rồi lọc theo ma_san_pham
+    def ratings(self, ma_sp):
+        return self._slice(self._ratings, 'ratings', ma_sp)
+
+    def product_ratings(self, ma_sp):
+        return pd.merge(self._product_frame(ma_sp), self.ratings(ma_sp), on='ma_san_pham', how='left')
+
+    # Tương đương merge thêm data_clean_2.csv theo id như trang phân tích cảm xúc
+    def product_reviews(self, ma_sp):
+        df_clean = self._slice(self._ratings_clean, 'ratings_clean', ma_sp).drop(columns=['ma_san_pham'])
+        df_merged = self.product_ratings(ma_sp).drop(columns=['noi_dung_binh_luan'])
+        return pd.merge(df_merged, df_clean, on='id', how='left')
+
+
+_product_data = None
+_product_data_signature = None
+_product_data_lock = threading.Lock()
+
+
+# Dùng chung cho mọi phiên trong process; tự dựng lại khi một file CSV thay đổi
+def load_product_data():
+    global _product_data, _product_data_signature
+    signature = (DATA_FORMAT, file_signature(DATA_FILES))
+    with _product_data_lock, metrics.timer('load_data'):
+        if _product_data is None or _product_data_signature != signature:
+            directory = cache_path('data')
+            os.makedirs(directory, exist_ok=True)
+            index = load_artifact(os.path.join(directory, 'index.pkl'), signature)
+            if index is None:
+                index = build_product_data(directory, signature)
+            _product_data = ProductData(directory, index)
+            _product_data_signature = signature
+        return _product_data
@@ -0,0 +1,21 @@
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
+
+
+# Bọc một bộ phân loại chỉ nhận nhãn số (XGBoost): học trên nhãn đã mã hóa 0..n-1 theo
+# thứ tự classes_, trả về nhãn gốc ('Negative'/'Positive') khi dự đoán. Nằm trong module
+# riêng để model_pipeline.pkl nạp được ở app dù training.py chạy dưới dạng script.
+class DecodedLabelClassifier(ClassifierMixin, BaseEstimator):
+    def __init__(self, estimator):
+        self.estimator = estimator
+
+    def fit(self, X, y, **fit_params):
+        self.classes_, encoded = np.unique(np.asarray(y, dtype=object), return_inverse=True)
+        self.estimator_ = clone(self.estimator).fit(X, encoded, **fit_params)
+        return self
+
+    def predict(self, X):
+        return self.classes_[np.asarray(self.estimator_.predict(X), dtype=int)]
+
+    def predict_proba(self, X):
+        return self.estimator_.predict_proba(X)
@@ -0,0 +1,202 @@
+import argparse
+import hashlib
+import json
+import random
+import sys
+import time
+from collections import Counter
+
+import pandas as pd
+
+import metrics
+from artifacts import cache_path, file_signature, load_artifact, save_artifact
+from lexicon import PhraseTrie, load_lexicon
+from preprocessing import PREPROCESS_VERSION, _POS_TAGS, Normalizer, join_negations, tag_words
+
+TRAINING_FILE = 'data_clean_2.csv'
+SOURCE_FILES = (TRAINING_FILE,)
+# Nhãn cho token chắc chắn bị loại (stopword): không thuộc _POS_TAGS
+DROPPED_TAG = 'X'
+
+# Tăng khi đổi cách dựng bảng hoặc cấu trúc dữ liệu lưu trong file cache
+FAST_POS_FORMAT = 3
+
+
+# Bảng tách từ và từ loại dựng sẵn cho chế độ preprocess 'fast':
+# - compounds: các từ ghép (theo âm tiết) có trong văn bản đã tách từ của data_clean_2.csv,
+#   tách câu bằng so khớp dài nhất từ trái sang phải rồi ghép từ phủ định như chế độ 'full'
+# - tags: token -> nhãn từ loại giữ lại (token đã qua bộ lọc từ loại của chế độ 'full'),
+#   hoặc DROPPED_TAG cho stopword (đằng nào cũng bị xóa ở bước cuối)
+# Câu có token không có trong bảng được gán nhãn lại bằng CRF (chỉ dùng nhãn của các token đó).
+class FastTagger:
+    def __init__(self, compounds, tags, fingerprint):
+        self.compounds = compounds
+        self.tags = tags
+        self.fingerprint = fingerprint
+        self.sentences = 0
+        self.fallbacks = 0
+
+    def segment(self, syllables):
+        words = []
+        i = 0
+        while i < len(syllables):
+            length, word = self.compounds.longest_match(syllables, i)
+            if length > 1:
+                words.append(word)
+                i += length
+            else:
+                words.append(syllables[i])
+                i += 1
+        return words
+
+    def postag_words(self, sentence):
+        with metrics.timer('preprocess.fast_segment'):
+            words = join_negations(self.segment(sentence.split()))
+            tags = [self.tags.get(word) for word in words]
+        self.sentences += 1
+        if None in tags:
+            self.fallbacks += 1
+            metrics.increment('preprocess.fast_fallback')
+            with metrics.timer('preprocess.pos_tag'):
+                crf_tags = [tag for _, tag in tag_words(words)]
+            tags = [tag if tag is not None else crf_tag for tag, crf_tag in zip(tags, crf_tags)]
+        return [word for word, tag in zip(words, tags) if tag.upper() in _POS_TAGS]
+
+
+# Văn bản đã qua preprocess() (từ ghép nối bằng '_') và nhãn của tập huấn luyện
+def training_texts():
+    df = pd.read_csv(TRAINING_FILE, usecols=['noi_dung_binh_luan', 'sentiment'], dtype={'noi_dung_binh_luan': str},
+                     keep_default_na=False)
+    df = df[df['noi_dung_binh_luan'].str.strip() != '']
+    return df['noi_dung_binh_luan'].tolist(), df['sentiment'].tolist()
+
+
+# Mọi token trong data_clean_2.csv đã được chế độ 'full' giữ lại, nên nhãn của token là nhãn
+# giữ lại mà CRF gán nhiều nhất khi chạy trên chính các câu đó ('N' nếu CRF không gán nhãn
+# giữ lại nào). Token không có trong bảng (từ bị loại theo từ loại, từ lạ) vẫn đi qua CRF.
+def build_tables(texts, lexicon, log=None):
+    compounds = PhraseTrie()
+    tag_counts = {}
+    for n, text in enumerate(texts, 1):
+        words = text.split()
+        for word, tag in tag_words(words):
+            if '_' in word:
+                compounds.add(word.split('_'), word)
+            counts = tag_counts.setdefault(word, Counter())
+            if tag.upper() in _POS_TAGS:
+                counts[tag] += 1
+        if log and n % 5000 == 0:
+            print(f'{n:,}/{len(texts):,} reviews', file=log, flush=True)
+    tags = dict.fromkeys((word for word in lexicon.stopword_set if word), DROPPED_TAG)
+    tags.update((word, counts.most_common(1)[0][0] if counts else 'N') for word, counts in tag_counts.items())
+    return compounds, tags
+
+
+def _signature(lexicon):
+    return (FAST_POS_FORMAT, PREPROCESS_VERSION, lexicon.fingerprint, file_signature(SOURCE_FILES))
+
+
+_fast_tagger = None
+
+
+# Đọc bảng từ file cache, dựng lại khi dữ liệu huấn luyện hoặc lexicon thay đổi
+def load_fast_tagger(log=sys.stderr):
+    global _fast_tagger
+    lexicon = load_lexicon()
+    signature = _signature(lexicon)
+    fingerprint = hashlib.sha1(repr(signature).encode('utf8')).hexdigest()[:12]
+    if _fast_tagger is None or _fast_tagger.fingerprint != fingerprint:
+        path = cache_path('fast_pos.pkl')
+        tables = load_artifact(path, signature)
+        if tables is None:
+            print('Building fast POS tables from the training corpus...', file=log, flush=True)
+            texts, _ = training_texts()
+            tables = build_tables(texts, lexicon, log)
+            save_artifact(path, signature, tables)
+        _fast_tagger = FastTagger(*tables, fingerprint)
+    return _fast_tagger
+
+
+def _token_f1(expected, actual):
+    expected, actual = Counter(expected.split()), Counter(actual.split())
+    overlap = sum((expected & actual).values())
+    if not expected and not actual:
+        return 1.0
+    if not overlap:
+        return 0.0
+    precision = overlap / sum(actual.values())
+    recall = overlap / sum(expected.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+# So sánh chế độ 'fast' với 'full' trên một mẫu review huấn luyện. Bảng dùng cho
+# báo cáo được dựng từ phần còn lại của tập huấn luyện để mẫu là dữ liệu chưa gặp.
+# Repo không kèm văn bản gốc nên đầu vào là văn bản đã tách từ với '_' đổi lại thành
+# khoảng trắng: cả hai chế độ phải tự tách từ và gán nhãn lại từ các âm tiết.
+def accuracy_report(sample_size=1000, seed=0, log=sys.stderr):
+    from model_registry import get_model
+
+    lexicon = load_lexicon()
+    texts, labels = training_texts()
+    indices = list(range(len(texts)))
+    random.Random(seed).shuffle(indices)
+    sample, rest = indices[:sample_size], indices[sample_size:]
+    print(f'Building held-out tables from {len(rest):,} reviews...', file=log, flush=True)
+    tagger = FastTagger(*build_tables([texts[i] for i in rest], lexicon, log), 'report')
+
+    resources = (lexicon.emoji_dict, lexicon.teen_dict, lexicon.wrong_set, lexicon.stopword_set)
+    full = Normalizer(*resources, mode='full')
+    fast = Normalizer(*resources, mode='full')
+    fast.postag_words = tagger.postag_words
+    sample_texts = [texts[i].replace('_', ' ') for i in sample]
+    sample_labels = [labels[i] for i in sample]
+
+    start = time.perf_counter()
+    full_outputs = [full(text) for text in sample_texts]
+    full_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    fast_outputs = [fast(text) for text in sample_texts]
+    fast_seconds = time.perf_counter() - start
+
+    model = get_model()
+    full_predictions = model.predict(full_outputs)
+    fast_predictions = model.predict(fast_outputs)
+    n = len(sample_texts)
+    return {
+        'sample_size': n,
+        'full_ms_per_text': full_seconds / n * 1000,
+        'fast_ms_per_text': fast_seconds / n * 1000,
+        'speedup': full_seconds / fast_seconds if fast_seconds else None,
+        'crf_fallback_rate': tagger.fallbacks / tagger.sentences if tagger.sentences else 0.0,
+        'exact_match_rate': sum(a == b for a, b in zip(full_outputs, fast_outputs)) / n,
+        'token_f1': sum(_token_f1(a, b) for a, b in zip(full_outputs, fast_outputs)) / n,
+        'prediction_agreement': sum(a == b for a, b in zip(full_predictions, fast_predictions)) / n,
+        'full_accuracy': sum(a == b for a, b in zip(full_predictions, sample_labels)) / n,
+        'fast_accuracy': sum(a == b for a, b in zip(fast_predictions, sample_labels)) / n,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the fast-mode POS tables and compare fast vs full preprocessing")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('build', help='(re)build the tables in the cache directory')
+    report = commands.add_parser('report', help='accuracy/latency of fast mode against full mode')
+    report.add_argument('--sample', type=int, default=1000, help='held-out training reviews to compare on')
+    report.add_argument('--seed', type=int, default=0)
+    report.add_argument('--output', default=None, help='also write the report to this JSON file')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        tagger = load_fast_tagger()
+        print(f'{len(tagger.tags):,} tokens in the POS table ({tagger.fingerprint})', file=sys.stderr)
+        return
+
+    result = accuracy_report(args.sample, args.seed)
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf8') as file:
+            json.dump(result, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import metrics
+from artifacts import cache_path
+
+# Tắt bằng biến môi trường HASAKI_PREDICTION_HISTORY=0
+enabled = os.environ.get('HASAKI_PREDICTION_HISTORY', '1').lower() not in ('0', 'false', 'no')
+DAY_FORMAT = '%Y-%m-%d'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS batches (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    source TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    rows INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY,
+    batch_id INTEGER NOT NULL,
+    created REAL NOT NULL,
+    text_hash BLOB NOT NULL,
+    processed TEXT NOT NULL,
+    label TEXT NOT NULL,
+    score REAL,
+    model_version TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS predictions_created ON predictions (created);
+CREATE INDEX IF NOT EXISTS predictions_label ON predictions (label, created);
+CREATE INDEX IF NOT EXISTS predictions_model_version ON predictions (model_version, created);
+CREATE INDEX IF NOT EXISTS predictions_text_hash ON predictions (text_hash);
+CREATE TABLE IF NOT EXISTS daily (
+    day TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    label TEXT NOT NULL,
+    predictions INTEGER NOT NULL,
+    scored INTEGER NOT NULL,
+    score_sum REAL NOT NULL,
+    PRIMARY KEY (day, model_version, label)
+) WITHOUT ROWID;
+'''
+
+
+def text_hash(text):
+    return hashlib.blake2b(text.encode('utf8'), digest_size=16).digest()
+
+
+# Lịch sử dự đoán trong SQLite (.cache/history/history.sqlite): mỗi lô dự đoán là một
+# dòng trong batches và một lần executemany vào predictions trong cùng transaction.
+# Bảng daily (ngày, phiên bản mô hình, nhãn) được cộng dồn khi ghi nên xu hướng cảm xúc
+# và so sánh mô hình chỉ đọc vài trăm dòng, dù predictions có hàng triệu dòng.
+class PredictionHistory:
+    def __init__(self, path=None):
+        if path is None:
+            directory = cache_path('history')
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, 'history.sqlite')
+        self.path = path
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    # Ghi một lô dự đoán; scores có thể là None (mô hình không có điểm quyết định). Trả về mã lô
+    def record(self, texts, processed, labels, scores, model_version, source='text', created=None):
+        created = time.time() if created is None else created
+        labels = [str(label) for label in labels]
+        scores = [None] * len(labels) if scores is None else [float(score) for score in scores]
+        day = time.strftime(DAY_FORMAT, time.localtime(created))
+        totals = {}
+        for label, score in zip(labels, scores):
+            count, scored, score_sum = totals.get(label, (0, 0, 0.0))
+            totals[label] = (count + 1, scored + (score is not None), score_sum + (score or 0.0))
+
+        with metrics.timer('history.record'), self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                batch_id = self._db.execute(
+                    'INSERT INTO batches (created, source, model_version, rows) VALUES (?, ?, ?, ?)',
+                    (created, source, model_version, len(labels))).lastrowid
+                self._db.executemany(
+                    'INSERT INTO predictions (batch_id, created, text_hash, processed, label, score, model_version) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    ((batch_id, created, text_hash(text), processed_text, label, score, model_version)
+                     for text, processed_text, label, score in zip(texts, processed, labels, scores)))
+                self._db.executemany(
+                    'INSERT INTO daily (day, model_version, label, predictions, scored, score_sum) VALUES (?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (day, model_version, label) DO UPDATE SET predictions = predictions + excluded.predictions, '
+                    'scored = scored + excluded.scored, score_sum = score_sum + excluded.score_sum',
+                    ((day, model_version, label, *total) for label, total in totals.items()))
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+        return batch_id
+
+    # Số dự đoán theo ngày và nhãn (days: chỉ N ngày gần nhất tính đến hôm nay)
+    def trend(self, days=None, model_version=None):
+        conditions, params = [], []
+        if days is not None:
+            conditions.append('day > ?')
+            params.append(time.strftime(DAY_FORMAT, time.localtime(time.time() - days * 86400)))
+        if model_version is not None:
+            conditions.append('model_version = ?')
+            params.append(model_version)
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        return self._query(
+            'SELECT day, label, SUM(predictions) AS predictions, SUM(score_sum) / NULLIF(SUM(scored), 0) AS average_score '
+            f'FROM daily {where} GROUP BY day, label ORDER BY day, label', params)
+
+    # Mỗi phiên bản mô hình: số dự đoán, tỉ lệ từng nhãn, điểm trung bình, khoảng ngày đã dùng
+    def compare_models(self, days=None):
+        where, params = '', []
+        if days is not None:
+            where = 'WHERE day > ?'
+            params.append(time.strftime(DAY_FORMAT, time.localtime(time.time() - days * 86400)))
+        rows = self._query(
+            'SELECT model_version, label, SUM(predictions) AS predictions, SUM(scored) AS scored, SUM(score_sum) AS score_sum, '
+            f'MIN(day) AS first_day, MAX(day) AS last_day FROM daily {where} GROUP BY model_version, label', params)
+        models = {}
+        for row in rows:
+            model = models.setdefault(row['model_version'], {
+                'model_version': row['model_version'], 'predictions': 0, 'scored': 0, 'score_sum': 0.0,
+                'first_day': row['first_day'], 'last_day': row['last_day'], 'labels': {}})
+            model['predictions'] += row['predictions']
+            model['scored'] += row['scored']
+            model['score_sum'] += row['score_sum']
+            model['first_day'] = min(model['first_day'], row['first_day'])
+            model['last_day'] = max(model['last_day'], row['last_day'])
+            model['labels'][row['label']] = row['predictions']
+        result = []
+        for model in sorted(models.values(), key=lambda item: item['last_day'], reverse=True):
+            scored, score_sum = model.pop('scored'), model.pop('score_sum')
+            labels = model.pop('labels')
+            for label, count in sorted(labels.items()):
+                model[f'{label.lower()}_share'] = count / model['predictions']
+            model['average_score'] = score_sum / scored if scored else None
+            result.append(model)
+        return result
+
+    # Các dự đoán gần nhất (dùng chỉ mục theo thời gian / nhãn / phiên bản mô hình)
+    def recent(self, limit=50, label=None, model_version=None):
+        conditions, params = [], []
+        if label is not None:
+            conditions.append('label = ?')
+            params.append(label)
+        if model_version is not None:
+            conditions.append('model_version = ?')
+            params.append(model_version)
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        return self._query(
+            'SELECT created, processed, label, score, model_version, batch_id FROM predictions '
+            f'{where} ORDER BY created DESC LIMIT ?', (*params, limit))
+
+    # Các lần một văn bản (cùng nội dung gốc) đã được dự đoán, qua các phiên bản mô hình
+    def lookup(self, text):
+        return self._query(
+            'SELECT created, label, score, model_version, batch_id FROM predictions WHERE text_hash = ? ORDER BY created',
+            (text_hash(text),))
+
+    def totals(self):
+        row = self._query('SELECT COALESCE(SUM(predictions), 0) AS predictions FROM daily')[0]
+        row['batches'] = self._query('SELECT COUNT(*) AS batches FROM batches')[0]['batches']
+        return row
+
+    # Xóa các dự đoán cũ hơn N ngày (bảng daily được giữ lại cho xu hướng dài hạn)
+    def prune(self, keep_days):
+        cutoff = time.time() - keep_days * 86400
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                deleted = self._db.execute('DELETE FROM predictions WHERE created < ?', (cutoff,)).rowcount
+                self._db.execute('DELETE FROM batches WHERE created < ?', (cutoff,))
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+        return deleted
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+# Dùng chung trong process; None nếu lịch sử dự đoán bị tắt
+def get_history():
+    global _history
+    if not enabled:
+        return None
+    with _history_lock:
+        if _history is None:
+            _history = PredictionHistory()
+        return _history
+
+
+def _print_rows(rows):
+    import pandas as pd
+
+    with pd.option_context('display.width', 200, 'display.max_colwidth', 60):
+        print(pd.DataFrame(rows).to_string(index=False) if rows else 'No predictions recorded')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the prediction history')
+    commands = parser.add_subparsers(dest='command', required=True)
+    trend = commands.add_parser('trend', help='predictions per day and label')
+    trend.add_argument('--days', type=int, default=30)
+    trend.add_argument('--model-version', default=None)
+    models = commands.add_parser('models', help='compare model versions')
+    models.add_argument('--days', type=int, default=None)
+    recent = commands.add_parser('recent', help='most recent predictions')
+    recent.add_argument('--limit', type=int, default=20)
+    recent.add_argument('--label', default=None)
+    recent.add_argument('--model-version', default=None)
+    prune = commands.add_parser('prune', help='delete individual predictions older than N days')
+    prune.add_argument('--keep-days', type=int, required=True)
+    args = parser.parse_args()
+
+    history = PredictionHistory()
+    start = time.perf_counter()
+    if args.command == 'trend':
+        _print_rows(history.trend(args.days, args.model_version))
+    elif args.command == 'models':
+        _print_rows(history.compare_models(args.days))
+    elif args.command == 'recent':
+        rows = history.recent(args.limit, args.label, args.model_version)
+        for row in rows:
+            row['created'] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(row['created']))
+        _print_rows(rows)
+    else:
+        print(f'Deleted {history.prune(args.keep_days):,} predictions')
+    totals = history.totals()
+    print(f'{totals["predictions"]:,} predictions in {totals["batches"]:,} batches '
+          f'(query {time.perf_counter() - start:.3f}s)', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import Pipeline
+
+from artifacts import cache_path
+from model_registry import MODEL_FILE, get_registry
+
+CLASSES = np.array(['Negative', 'Positive'], dtype=object)
+TEXT_COLUMN = 'noi_dung_binh_luan'
+TRAINING_FILE = 'data_clean_2.csv'
+N_FEATURES = 2 ** 20
+CHUNKSIZE = 1000
+BOOTSTRAP_EPOCHS = 3
+
+
+# Cùng quy tắc với dữ liệu huấn luyện: 1-3 sao là Negative, 4-5 sao là Positive
+def label_from_stars(stars):
+    return np.where(np.asarray(stars, dtype=float) >= 4, 'Positive', 'Negative').astype(object)
+
+
+# Mô hình học dần: HashingVectorizer (từ đơn + cặp từ) không cần fit nên mọi từ mới
+# đều có cột, SGDClassifier (hinge, như SVM tuyến tính) cập nhật bằng partial_fit trên
+# từng lô. Không dùng SMOTE hay trọng số lớp: trên data_clean_2.csv cân bằng theo số
+# review đã gặp làm macro-F1 giảm rõ so với để nguyên.
+class OnlineModel:
+    def __init__(self, alpha=1e-5, random_state=42):
+        self.vectorizer = HashingVectorizer(n_features=N_FEATURES, ngram_range=(1, 2), alternate_sign=False, norm='l2')
+        self.classifier = SGDClassifier(loss='hinge', alpha=alpha, random_state=random_state)
+        self.reviews = 0
+        self.sources = {}
+
+    def partial_fit(self, texts, labels):
+        labels = np.asarray(labels, dtype=object)
+        self.classifier.partial_fit(self.vectorizer.transform(texts), labels, classes=CLASSES)
+        self.reviews += len(labels)
+
+    def predict(self, texts):
+        return self.classifier.predict(self.vectorizer.transform(texts))
+
+    def pipeline(self):
+        return Pipeline([('hashing', self.vectorizer), ('sgd', self.classifier)])
+
+
+def state_path():
+    return cache_path('online_model.joblib')
+
+
+# Trạng thái lưu dưới dạng dict các đối tượng scikit-learn/numpy để nạp lại được
+# dù module này chạy dưới dạng script hay được import
+def load_state():
+    try:
+        state = joblib.load(state_path())
+    except FileNotFoundError:
+        return None
+    model = OnlineModel()
+    model.__dict__.update(state)
+    return model
+
+
+def save_state(model):
+    tmp_path = f'{state_path()}.{os.getpid()}.tmp'
+    joblib.dump(dict(model.__dict__), tmp_path)
+    os.replace(tmp_path, state_path())
+
+
+# Ghi trạng thái và đăng ký một phiên bản mới trong registry (app tự hot-swap khi activate)
+def checkpoint(model, activate, log=sys.stderr):
+    save_state(model)
+    version = f'online-{time.strftime("%Y%m%d-%H%M%S")}-{model.reviews}'
+    get_registry().publish(model.pipeline(), version=version, activate=activate)
+    print(f'Checkpoint {version} after {model.reviews:,} training samples' + (' (active)' if activate else ''), file=log, flush=True)
+    return version
+
+
+# Khởi tạo từ tập huấn luyện đã tiền xử lý (data_clean_2.csv)
+def bootstrap(chunksize=CHUNKSIZE, epochs=BOOTSTRAP_EPOCHS, log=sys.stderr):
+    df = pd.read_csv(TRAINING_FILE, usecols=[TEXT_COLUMN, 'sentiment'], dtype={TEXT_COLUMN: str}, keep_default_na=False)
+    model = OnlineModel()
+    for _ in range(epochs):
+        for start in range(0, len(df), chunksize):
+            chunk = df.iloc[start:start + chunksize]
+            model.partial_fit(chunk[TEXT_COLUMN].tolist(), chunk['sentiment'].to_numpy(dtype=object))
+    model.sources[os.path.abspath(TRAINING_FILE)] = len(df)
+    print(f'Bootstrapped on {len(df):,} reviews ({epochs} epochs)', file=log)
+    return model
+
+
+# Đọc các review mới (cột noi_dung_binh_luan + so_sao) theo từng khối, bỏ qua các dòng
+# đã học ở lần chạy trước, tiền xử lý (có cache) rồi partial_fit; cứ checkpoint_every
+# review thì ghi một phiên bản mới.
+def update(model, path, chunksize=CHUNKSIZE, checkpoint_every=10_000, activate=True, log=sys.stderr):
+    from lexicon import load_lexicon
+    from preprocess_cache import cached_preprocess_batch
+
+    lexicon = load_lexicon()
+    source = os.path.abspath(path)
+    done = model.sources.get(source, 0)
+    # Nội dung rỗng giữ là '', số sao rỗng là NaN để bỏ qua dòng đó
+    reader = pd.read_csv(path, usecols=[TEXT_COLUMN, 'so_sao'], dtype={TEXT_COLUMN: str}, keep_default_na=False,
+                         na_values={'so_sao': ['']}, skiprows=range(1, done + 1), chunksize=chunksize)
+    since_checkpoint = 0
+    version = None
+    for chunk in reader:
+        rows = len(chunk)
+        chunk = chunk[chunk['so_sao'].notna() & (chunk[TEXT_COLUMN].str.strip() != '')]
+        if len(chunk):
+            model.partial_fit(cached_preprocess_batch(chunk[TEXT_COLUMN].tolist(), lexicon), label_from_stars(chunk['so_sao']))
+        done += rows
+        model.sources[source] = done
+        since_checkpoint += len(chunk)
+        if since_checkpoint >= checkpoint_every:
+            version = checkpoint(model, activate, log)
+            since_checkpoint = 0
+    if since_checkpoint:
+        version = checkpoint(model, activate, log)
+    elif version is None:
+        print(f'No new reviews in {path}', file=log)
+    return version
+
+
+def _scores(expected, predicted):
+    from sklearn.metrics import accuracy_score, f1_score
+
+    return {
+        'accuracy': accuracy_score(expected, predicted),
+        'f1_macro': f1_score(expected, predicted, average='macro'),
+    }
+
+
+# So sánh chi phí cập nhật mỗi 1k review với huấn luyện lại toàn bộ pipeline gốc
+# (TF-IDF + SMOTE + SVC), và độ lệch chất lượng so với model_pipeline.pkl trên tập kiểm tra.
+# model_pipeline.pkl đã được huấn luyện trên toàn bộ dữ liệu nên điểm của nó trên tập
+# kiểm tra là lạc quan; pipeline huấn luyện lại trên tập train là mốc so sánh công bằng.
+def run_benchmark(test_size=0.2, full_retrain=True, seed=42, log=sys.stderr):
+    from sklearn.base import clone
+    from sklearn.model_selection import train_test_split
+
+    df = pd.read_csv(TRAINING_FILE, usecols=[TEXT_COLUMN, 'sentiment'], dtype={TEXT_COLUMN: str}, keep_default_na=False)
+    train, test = train_test_split(df, test_size=test_size, stratify=df['sentiment'], random_state=seed)
+    train_texts, train_labels = train[TEXT_COLUMN].tolist(), train['sentiment'].to_numpy(dtype=object)
+    test_texts, test_labels = test[TEXT_COLUMN].tolist(), test['sentiment'].to_numpy(dtype=object)
+
+    model = OnlineModel()
+    timings = []
+    begin_training = time.perf_counter()
+    for _ in range(BOOTSTRAP_EPOCHS):
+        for start in range(0, len(train_texts), CHUNKSIZE):
+            begin = time.perf_counter()
+            model.partial_fit(train_texts[start:start + CHUNKSIZE], train_labels[start:start + CHUNKSIZE])
+            timings.append((time.perf_counter() - begin) / len(train_texts[start:start + CHUNKSIZE]) * 1000)
+    online_training_seconds = time.perf_counter() - begin_training
+    online_predictions = model.predict(test_texts)
+
+    shipped = joblib.load(MODEL_FILE)
+    shipped_predictions = shipped.predict(test_texts)
+    result = {
+        'train_reviews': len(train_texts),
+        'test_reviews': len(test_texts),
+        # Không gồm bước tiền xử lý (dữ liệu đã tiền xử lý sẵn, cả hai cách đều phải làm)
+        'online_update_seconds_per_1k': float(np.median(timings)),
+        'online_bootstrap_seconds': online_training_seconds,
+        'online': _scores(test_labels, online_predictions),
+        'shipped_model': _scores(test_labels, shipped_predictions),
+        'agreement_with_shipped_model': float(np.mean(online_predictions == shipped_predictions)),
+    }
+    if full_retrain:
+        print('Retraining the full pipeline (TF-IDF + SMOTE + SVC)...', file=log, flush=True)
+        pipeline = clone(shipped)
+        begin = time.perf_counter()
+        pipeline.fit(train_texts, train_labels)
+        result['full_retrain_seconds'] = time.perf_counter() - begin
+        result['full_retrain'] = _scores(test_labels, pipeline.predict(test_texts))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incrementally update a hashing + SGD sentiment model from new reviews')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    start = commands.add_parser('bootstrap', help='train a new online model on data_clean_2.csv and publish it')
+    start.add_argument('--epochs', type=int, default=BOOTSTRAP_EPOCHS)
+    start.add_argument('--no-activate', action='store_true', help='publish without switching the app to it')
+
+    refresh = commands.add_parser('update', help='learn from new labelled reviews (CSV with noi_dung_binh_luan, so_sao)')
+    refresh.add_argument('input')
+    refresh.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    refresh.add_argument('--checkpoint-every', type=int, default=10_000, help='publish a version every N reviews')
+    refresh.add_argument('--no-activate', action='store_true', help='publish without switching the app to it')
+
+    bench = commands.add_parser('benchmark', help='update cost per 1k reviews and accuracy vs the shipped model')
+    bench.add_argument('--test-size', type=float, default=0.2)
+    bench.add_argument('--skip-full-retrain', action='store_true')
+    bench.add_argument('--output', default=None, help='also write the result to this JSON file')
+
+    args = parser.parse_args()
+    if args.command == 'bootstrap':
+        model = bootstrap(epochs=args.epochs)
+        checkpoint(model, not args.no_activate)
+    elif args.command == 'update':
+        model = load_state()
+        if model is None:
+            print('No online model yet, bootstrapping from the training data first', file=sys.stderr)
+            model = bootstrap()
+        update(model, args.input, args.chunksize, args.checkpoint_every, not args.no_activate)
+    else:
+        result = run_benchmark(args.test_size, not args.skip_full_retrain)
+        print(json.dumps(result, indent=2))
+        if args.output:
+            with open(args.output, 'w', encoding='utf8') as file:
+                json.dump(result, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
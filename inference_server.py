@@ -0,0 +1,334 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import metrics
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+
+class Overloaded(Exception):
+    pass
+
+
+# Gom các request đến gần nhau (trong max_wait_ms hoặc đủ max_batch_size văn bản)
+# thành một lần preprocess + model.predict. Hàng đợi có giới hạn: vượt quá
+# max_pending văn bản thì từ chối ngay (backpressure) thay vì để độ trễ tăng mãi.
+class MicroBatcher:
+    def __init__(self, handler, max_batch_size=256, max_wait_ms=5, max_pending=10_000):
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_pending = max_pending
+        self.pending = 0
+        self.batches = 0
+        self.batched_texts = 0
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def submit(self, texts):
+        if self.pending + len(texts) > self.max_pending:
+            raise Overloaded()
+        future = asyncio.get_running_loop().create_future()
+        self.pending += len(texts)
+        await self._queue.put((texts, future))
+        try:
+            return await future
+        finally:
+            self.pending -= len(texts)
+
+    async def _collect(self):
+        items = [await self._queue.get()]
+        size = len(items[0][0])
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            items.append(item)
+            size += len(item[0])
+        return items
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [item for item in await self._collect() if not item[1].done()]
+            if not items:
+                continue
+            texts = [text for item_texts, _ in items for text in item_texts]
+            try:
+                # Chạy trong thread để event loop vẫn nhận request trong lúc dự đoán
+                results = await loop.run_in_executor(None, self.handler, texts)
+            except Exception as error:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            self.batches += 1
+            self.batched_texts += len(texts)
+            start = 0
+            for item_texts, future in items:
+                if not future.done():
+                    future.set_result(results[start:start + len(item_texts)])
+                start += len(item_texts)
+
+
+def load_predictor():
+    from lexicon import load_lexicon
+    from model_registry import get_model
+    from preprocess_cache import cached_preprocess_batch
+
+    lexicon = load_lexicon()
+
+    def predict(texts):
+        processed = cached_preprocess_batch(texts, lexicon)
+        model = get_model()
+        return [str(label) for label in model.predict(processed)]
+
+    return predict
+
+
+# Độ dài body theo header; None nếu Content-Length không hợp lệ hoặc body gửi dạng chunked
+def _content_length(headers):
+    if headers.get('transfer-encoding', 'identity').lower() != 'identity':
+        return None
+    value = headers.get('content-length', '0') or '0'
+    if not (value.isascii() and value.isdigit()):
+        return None
+    return int(value)
+
+
+class InferenceServer:
+    def __init__(self, predictor, timeout=5.0, **batcher_options):
+        self.batcher = MicroBatcher(predictor, **batcher_options)
+        self.timeout = timeout
+        self.requests = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.failed = 0
+
+    async def _predict(self, texts):
+        try:
+            return 200, await asyncio.wait_for(self.batcher.submit(texts), self.timeout)
+        except Overloaded:
+            self.rejected += 1
+            return 503, {'error': 'server overloaded, retry later'}
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            return 504, {'error': 'prediction timed out'}
+        except Exception as error:
+            # Lỗi của bộ dự đoán (mô hình, tiền xử lý) trả về 500 thay vì làm rớt kết nối
+            self.failed += 1
+            metrics.increment('http.predict_error')
+            return 500, {'error': f'prediction failed: {type(error).__name__}'}
+
+    async def route(self, method, path, body):
+        if method == 'GET' and path == '/health':
+            return 200, {
+                'status': 'ok',
+                'pending': self.batcher.pending,
+                'batches': self.batcher.batches,
+                'batched_texts': self.batcher.batched_texts,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'failed': self.failed,
+            }
+        # Dạng text của Prometheus; chỉ có số liệu khi bật HASAKI_METRICS=1
+        if method == 'GET' and path == '/metrics':
+            return 200, metrics.render_prometheus()
+        if method != 'POST' or path not in ('/predict', '/predict_batch'):
+            return 404, {'error': 'not found'}
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            return 400, {'error': 'invalid JSON'}
+
+        if path == '/predict':
+            text = payload.get('text') if isinstance(payload, dict) else None
+            if not isinstance(text, str):
+                return 400, {'error': '"text" must be a string'}
+            status, result = await self._predict([text])
+            return status, {'sentiment': result[0]} if status == 200 else result
+
+        texts = payload.get('texts') if isinstance(payload, dict) else None
+        if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+            return 400, {'error': '"texts" must be a list of strings'}
+        if not texts:
+            return 200, {'sentiments': []}
+        status, result = await self._predict(texts)
+        return status, {'sentiments': result} if status == 200 else result
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, path, version = lines[0].split(' ', 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+                length = _content_length(headers)
+                if length is None:
+                    # Không biết body dài bao nhiêu thì không đọc tiếp được request sau: trả 400 rồi đóng
+                    status, response = 400, {'error': 'invalid Content-Length or unsupported Transfer-Encoding'}
+                    keep_alive = False
+                elif length > MAX_BODY_BYTES:
+                    status, response = 413, {'error': 'request body too large'}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    self.requests += 1
+                    with metrics.timer('http.request'):
+                        status, response = await self.route(method, path.split('?', 1)[0], body)
+                    keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+
+                if isinstance(response, str):
+                    data, content_type = response.encode('utf8'), 'text/plain; version=0.0.4'
+                else:
+                    data, content_type = json.dumps(response, ensure_ascii=False).encode('utf8'), 'application/json'
+                writer.write(
+                    f'HTTP/1.1 {status} {"OK" if status == 200 else "Error"}\r\n'
+                    f'Content-Type: {content_type}; charset=utf-8\r\n'
+                    f'Content-Length: {len(data)}\r\n'
+                    f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f'Listening on http://{host}:{port}', flush=True)
+        async with server:
+            await server.serve_forever()
+
+
+# ---- Client tải giả lập: nhiều kết nối keep-alive gửi review mẫu ----
+
+async def _post(reader, writer, host, path, payload):
+    data = json.dumps(payload, ensure_ascii=False).encode('utf8')
+    writer.write(
+        f'POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n'
+        f'Content-Length: {len(data)}\r\n\r\n'.encode('latin-1') + data)
+    await writer.drain()
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1')
+    status = int(head.split(' ', 2)[1])
+    length = next(int(line.split(':', 1)[1]) for line in head.split('\r\n') if line.lower().startswith('content-length'))
+    await reader.readexactly(length)
+    return status
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+# unique=True gắn số thứ tự vào mỗi văn bản để không request nào trúng cache tiền xử lý
+async def run_load(host, port, texts, requests, concurrency, batch_size=1, unique=False):
+    latencies = []
+    statuses = {}
+    counter = iter(range(requests))
+    serial = iter(range(requests * batch_size))
+
+    def pick():
+        text = random.choice(texts)
+        return f'{text} {next(serial)}' if unique else text
+
+    async def session():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for _ in counter:
+                if batch_size == 1:
+                    path, payload = '/predict', {'text': pick()}
+                else:
+                    path, payload = '/predict_batch', {'texts': [pick() for _ in range(batch_size)]}
+                start = time.perf_counter()
+                status = await _post(reader, writer, host, path, payload)
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'requests_per_second': requests / elapsed if elapsed else 0.0,
+        'statuses': statuses,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless sentiment inference service')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help='run the HTTP inference server')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8600)
+    serve.add_argument('--max-batch-size', type=int, default=256)
+    serve.add_argument('--max-wait-ms', type=float, default=5)
+    serve.add_argument('--max-pending', type=int, default=10_000)
+    serve.add_argument('--timeout', type=float, default=5.0, help='per-request timeout in seconds')
+
+    load = commands.add_parser('load', help='send synthetic load to a running server')
+    load.add_argument('--host', default='127.0.0.1')
+    load.add_argument('--port', type=int, default=8600)
+    load.add_argument('--requests', type=int, default=2000)
+    load.add_argument('--concurrency', type=int, default=32)
+    load.add_argument('--batch-size', type=int, default=1, help='texts per request (>1 uses /predict_batch)')
+    load.add_argument('--source', default='comments.txt', help='file with one review per line')
+    load.add_argument('--unique', action='store_true', help='make every text distinct so the preprocess cache never hits')
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        server = InferenceServer(
+            load_predictor(),
+            timeout=args.timeout,
+            max_batch_size=args.max_batch_size,
+            max_wait_ms=args.max_wait_ms,
+            max_pending=args.max_pending,
+        )
+        asyncio.run(server.serve(args.host, args.port))
+    else:
+        with open(args.source, encoding='utf8') as file:
+            texts = [line for line in file.read().split('\n') if line.strip()]
+        result = asyncio.run(run_load(args.host, args.port, texts, args.requests, args.concurrency, args.batch_size, args.unique))
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+import codecs
+import io
+import itertools
+import os
+
+import pandas as pd
+
+import metrics
+from preprocess_cache import cached_preprocess_batch
+
+TEXT_COLUMN = 'noi_dung_binh_luan'
+SAMPLE_BYTES = 64 * 1024
+# Khối đầu nhỏ để trang hiện kết quả ngay, các khối sau lớn hơn cho nhanh
+FIRST_CHUNKSIZE = 200
+CHUNKSIZE = 1000
+
+
+def detect_encoding(sample):
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    # Mẫu có thể cắt giữa một ký tự nhiều byte nên giải mã kiểu incremental
+    for encoding in ('utf-8', 'cp1258'):
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return 'latin-1'
+
+
+# File upload (CSV/TXT/Parquet) được đọc dần từ file-like, không giải mã toàn bộ vào bộ nhớ
+class Upload:
+    def __init__(self, file, name):
+        self.file = file
+        self.format = os.path.splitext(name)[1].lower().lstrip('.') or 'txt'
+        self.file.seek(0, io.SEEK_END)
+        self.size = self.file.tell()
+        self.file.seek(0)
+        self.encoding = None
+        self.columns = []
+        self.num_rows = None
+
+        if self.format == 'parquet':
+            import pyarrow.parquet as pq
+            import pyarrow.types
+
+            parquet_file = pq.ParquetFile(self.file)
+            self.num_rows = parquet_file.metadata.num_rows
+            self.columns = [
+                field.name for field in parquet_file.schema_arrow
+                if pyarrow.types.is_string(field.type) or pyarrow.types.is_large_string(field.type)
+            ]
+        else:
+            self.encoding = detect_encoding(self.file.read(SAMPLE_BYTES))
+            self.file.seek(0)
+            if self.format == 'csv':
+                stream = self._text_stream()
+                self.columns = list(pd.read_csv(stream, nrows=0).columns)
+                stream.detach()
+                self.file.seek(0)
+
+        self.default_column = TEXT_COLUMN if TEXT_COLUMN in self.columns else (self.columns[0] if self.columns else None)
+
+    def _text_stream(self):
+        return io.TextIOWrapper(self.file, encoding=self.encoding, errors='replace', newline=None)
+
+    def _progress(self, rows):
+        if self.num_rows:
+            return min(1.0, rows / self.num_rows)
+        return min(1.0, self.file.tell() / self.size) if self.size else 1.0
+
+    # Đọc lần lượt các khối với kích thước lấy từ sizes
+    def _batches(self, column, sizes):
+        if self.format == 'parquet':
+            import pyarrow.parquet as pq
+
+            for batch in pq.ParquetFile(self.file).iter_batches(batch_size=next(sizes), columns=[column]):
+                yield batch.column(0).to_pylist()
+            return
+
+        # Không để TextIOWrapper đóng file upload khi bị thu hồi
+        stream = self._text_stream()
+        try:
+            if self.format == 'csv':
+                reader = pd.read_csv(stream, usecols=[column], dtype={column: str}, keep_default_na=False, iterator=True)
+                while True:
+                    try:
+                        yield reader.get_chunk(next(sizes))[column].tolist()
+                    except StopIteration:
+                        return
+            else:
+                while True:
+                    lines = [line.rstrip('\n') for line in itertools.islice(stream, next(sizes))]
+                    if not lines:
+                        return
+                    yield lines
+        finally:
+            stream.detach()
+
+    # Sinh ra (danh sách review, tỉ lệ đã đọc); bỏ qua dòng trống
+    def iter_chunks(self, column=None, chunksize=CHUNKSIZE, first_chunksize=FIRST_CHUNKSIZE):
+        column = column or self.default_column
+        self.file.seek(0)
+        rows = 0
+        sizes = itertools.chain([first_chunksize], itertools.repeat(chunksize))
+        batches = self._batches(column, sizes)
+        while True:
+            with metrics.timer(f'upload.parse.{self.format}'):
+                texts = next(batches, None)
+            if texts is None:
+                return
+            rows += len(texts)
+            texts = [text for text in texts if text and text.strip()]
+            if texts:
+                yield texts, self._progress(rows)
+
+
+def open_upload(file, name):
+    return Upload(file, name)
+
+
+# Preprocess + dự đoán từng khối ngay khi đọc được, sinh ra (texts, văn bản đã preprocess,
+# predictions, điểm quyết định, giải thích, tỉ lệ đã đọc). explain=True: giải thích là
+# (token tích cực, token tiêu cực) của mỗi hàng, tính cùng lúc với điểm; ngược lại None
+def score_upload(upload, column, lexicon, model, chunksize=CHUNKSIZE, explain=False, **batch_options):
+    for texts, progress in upload.iter_chunks(column, chunksize):
+        processed = cached_preprocess_batch(texts, lexicon, **batch_options)
+        explained = model.explain(processed) if explain else None
+        if explained is not None:
+            predictions, scores, positive, negative = explained
+            yield texts, processed, predictions, scores, (positive, negative), progress
+        else:
+            predictions, scores = model.predict_with_scores(processed)
+            yield texts, processed, predictions, scores, None, progress
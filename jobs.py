@@ -0,0 +1,354 @@
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from collections import Counter
+from contextlib import closing
+
+import pandas as pd
+
+from artifacts import cache_path
+
+POLL_SECONDS = 0.5
+# Job 'running' không cập nhật heartbeat quá lâu (worker chết) được đưa lại vào hàng đợi
+STALE_SECONDS = 120
+# Worker đang chạy job ghi heartbeat từ một thread riêng, kể cả khi một khối chấm điểm rất lâu
+HEARTBEAT_SECONDS = 10
+RETENTION_DAYS = 7
+# Worker chạy với độ ưu tiên thấp hơn để không làm chậm dự đoán tương tác trong app
+WORKER_NICE = 10
+WORKERS = int(os.environ.get('HASAKI_JOB_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+RESULT_COLUMNS = ['Original Text', 'Prediction']
+EXPLANATION_COLUMNS = ['Positive terms', 'Negative terms']
+FINISHED = ('done', 'failed', 'cancelled')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    column_name TEXT,
+    explain INTEGER NOT NULL DEFAULT 0,
+    label_counts TEXT,
+    status TEXT NOT NULL,
+    rows INTEGER NOT NULL DEFAULT 0,
+    progress REAL NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    model_version TEXT,
+    error TEXT,
+    worker_pid INTEGER,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    heartbeat REAL
+)
+'''
+
+
+def jobs_dir():
+    directory = cache_path('jobs')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def job_dir(job_id):
+    return os.path.join(jobs_dir(), job_id)
+
+
+def result_path(job_id):
+    return os.path.join(job_dir(job_id), 'result.csv')
+
+
+# Kết quả đang ghi dở của worker pid, đổi tên thành result.csv khi job xong
+def partial_path(job_id, pid):
+    return f'{result_path(job_id)}.{pid}.tmp'
+
+
+# Tối đa `limit` dòng kết quả cuối cùng của một job đang chạy (chỉ các dòng đã báo tiến độ);
+# None nếu chưa có dòng nào hoặc file tạm đã được đổi tên / xóa
+def read_partial(job, limit=1000):
+    if job['status'] != 'running' or not job['rows']:
+        return None
+    skipped = max(0, job['rows'] - limit)
+    try:
+        return pd.read_csv(partial_path(job['id'], job['worker_pid']), encoding='utf-8-sig', dtype=str,
+                           keep_default_na=False, skiprows=range(1, skipped + 1), nrows=job['rows'] - skipped)
+    except FileNotFoundError:
+        return None
+
+
+# `limit` dòng đầu của kết quả một job đã xong, không đọc cả file
+def read_result(job_id, limit=1000):
+    return pd.read_csv(result_path(job_id), encoding='utf-8-sig', dtype=str, keep_default_na=False, nrows=limit)
+
+
+# Số dự đoán theo nhãn của một job đã xong, do worker đếm khi chấm điểm. Job xong trước khi
+# có cột label_counts thì đếm lại từ cột Prediction, đọc theo từng khối
+def label_counts(job):
+    if job['label_counts'] is not None:
+        return json.loads(job['label_counts'])
+    counts = Counter()
+    for chunk in pd.read_csv(result_path(job['id']), encoding='utf-8-sig', usecols=[RESULT_COLUMNS[1]], dtype=str,
+                             keep_default_na=False, chunksize=100_000):
+        counts.update(chunk[RESULT_COLUMNS[1]])
+    return dict(counts)
+
+
+# Job đã được đưa lại vào hàng đợi (worker bị coi là chết) hoặc bị hủy khi đang chờ:
+# worker cũ dừng lại, không ghi kết quả
+class JobLost(Exception):
+    pass
+
+
+# Hàng đợi job lưu trong SQLite (.cache/jobs/jobs.sqlite); file upload và kết quả nằm
+# trong thư mục riêng của từng job. App và các worker (process khác) dùng chung file này.
+class JobQueue:
+    def __init__(self, path=None):
+        self.path = path or os.path.join(jobs_dir(), 'jobs.sqlite')
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(_SCHEMA)
+        # Hàng đợi tạo trước khi có cột explain / label_counts
+        columns = {row['name'] for row in self._db.execute('PRAGMA table_info(jobs)')}
+        for name, definition in (('explain', 'INTEGER NOT NULL DEFAULT 0'), ('label_counts', 'TEXT')):
+            if name not in columns:
+                self._db.execute(f'ALTER TABLE jobs ADD COLUMN {name} {definition}')
+        self._lock = threading.Lock()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params)
+
+    # Lưu file upload vào thư mục job rồi đưa vào hàng đợi; trả về mã job.
+    # explain=True thêm các cột token đóng góp nhiều nhất vào kết quả
+    def submit(self, file, name, column=None, explain=False):
+        self.cleanup()
+        job_id = uuid.uuid4().hex[:12]
+        os.makedirs(job_dir(job_id))
+        extension = os.path.splitext(name)[1].lower() or '.txt'
+        file.seek(0)
+        with open(os.path.join(job_dir(job_id), f'input{extension}'), 'wb') as target:
+            shutil.copyfileobj(file, target)
+        self._execute('INSERT INTO jobs (id, name, column_name, explain, status, created) VALUES (?, ?, ?, ?, ?, ?)',
+                      (job_id, name, column, int(explain), 'queued', time.time()))
+        return job_id
+
+    def get(self, job_id):
+        row = self._execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def recent(self, limit=20):
+        return [dict(row) for row in self._execute('SELECT * FROM jobs ORDER BY created DESC LIMIT ?', (limit,))]
+
+    # Job đang chờ bị hủy ngay; job đang chạy dừng sau khối hiện tại
+    def cancel(self, job_id):
+        self._execute("UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'", (time.time(), job_id))
+        self._execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+
+    # Lấy job cũ nhất đang chờ (BEGIN IMMEDIATE: chỉ một worker nhận được mỗi job)
+    def claim(self, pid):
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                now = time.time()
+                self._db.execute(
+                    "UPDATE jobs SET status = 'queued', worker_pid = NULL WHERE status = 'running' AND heartbeat < ?",
+                    (now - STALE_SECONDS,))
+                row = self._db.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1").fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running', worker_pid = ?, started = ?, heartbeat = ?, rows = 0, progress = 0 "
+                        "WHERE id = ?", (pid, now, now, row['id']))
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+        return row['id'] if row is not None else None
+
+    # Trả về False nếu job không còn thuộc worker pid
+    def heartbeat(self, job_id, pid):
+        return self._execute("UPDATE jobs SET heartbeat = ? WHERE id = ? AND worker_pid = ? AND status = 'running'",
+                             (time.time(), job_id, pid)).rowcount > 0
+
+    # Cập nhật tiến độ; trả về True nếu người dùng đã yêu cầu hủy.
+    # JobLost nếu job không còn thuộc worker pid
+    def report(self, job_id, pid, rows, progress):
+        updated = self._execute(
+            "UPDATE jobs SET rows = ?, progress = ?, heartbeat = ? WHERE id = ? AND worker_pid = ? AND status = 'running'",
+            (rows, progress, time.time(), job_id, pid)).rowcount
+        if not updated:
+            raise JobLost(job_id)
+        return bool(self._execute('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,)).fetchone()[0])
+
+    # Kết thúc job của worker pid; trả về False (không đổi gì) nếu job đã không còn thuộc
+    # worker đó. replace=(file tạm, file đích) đổi tên file kết quả trong cùng transaction
+    # nên không thể ghi đè kết quả của worker đã nhận lại job
+    def finish(self, job_id, pid, status, error=None, replace=None, **fields):
+        assignments = ''.join(f', {name} = ?' for name in fields)
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                updated = self._db.execute(
+                    f"UPDATE jobs SET status = ?, error = ?, finished = ?{assignments} "
+                    "WHERE id = ? AND worker_pid = ? AND status = 'running'",
+                    (status, error, time.time(), *fields.values(), job_id, pid)).rowcount > 0
+                if updated and replace is not None:
+                    os.replace(*replace)
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+        return updated
+
+    # Xóa các job đã xong quá RETENTION_DAYS ngày cùng file của chúng
+    def cleanup(self):
+        cutoff = time.time() - RETENTION_DAYS * 86400
+        expired = [row['id'] for row in self._execute(
+            f"SELECT id FROM jobs WHERE status IN ({','.join('?' * len(FINISHED))}) AND finished < ?", (*FINISHED, cutoff))]
+        for job_id in expired:
+            shutil.rmtree(job_dir(job_id), ignore_errors=True)
+            self._execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+
+
+# Ghi heartbeat định kỳ cho job đang chạy cho tới khi stop được set
+def _keep_alive(queue, job_id, pid, stop):
+    while not stop.wait(HEARTBEAT_SECONDS):
+        if not queue.heartbeat(job_id, pid):
+            return
+
+
+# Chấm điểm một job: đọc file theo từng khối, ghi nối kết quả vào file tạm của worker và báo
+# tiến độ. Job bị worker khác nhận lại giữa chừng (JobLost) thì bỏ file tạm, không ghi gì thêm
+def run_job(queue, job_id):
+    from ingestion import open_upload, score_upload
+    from lexicon import load_lexicon
+    from model_registry import get_model
+
+    from compiled_model import format_terms
+    from history import get_history
+
+    job = queue.get(job_id)
+    directory = job_dir(job_id)
+    input_name = next(name for name in os.listdir(directory) if name.startswith('input'))
+    model = get_model()
+    history = get_history()
+    pid = os.getpid()
+    rows = 0
+    counts = Counter()
+    cancelled = False
+    # Ghi ra file tạm riêng của worker, chỉ đổi tên khi xong để không tải về kết quả dở dang
+    tmp_path = partial_path(job_id, pid)
+    stop = threading.Event()
+    threading.Thread(target=_keep_alive, args=(queue, job_id, pid, stop), daemon=True).start()
+    try:
+        with open(os.path.join(directory, input_name), 'rb') as file, \
+                open(tmp_path, 'w', encoding='utf-8-sig', newline='') as output:
+            upload = open_upload(file, job['name'])
+            column = job['column_name'] or upload.default_column
+            columns = RESULT_COLUMNS + (EXPLANATION_COLUMNS if job['explain'] else [])
+            pd.DataFrame(columns=columns).to_csv(output, index=False)
+            # Mỗi worker là một process, không mở thêm process pool cho preprocess
+            scored = score_upload(upload, column, load_lexicon(), model, explain=bool(job['explain']), n_jobs=1)
+            # Đóng generator (và stream đọc file) trước khi file upload bị đóng
+            with closing(scored):
+                for texts, processed, predictions, scores, explained, progress in scored:
+                    result = {RESULT_COLUMNS[0]: texts, RESULT_COLUMNS[1]: predictions}
+                    if job['explain']:
+                        # Mô hình không giải thích được: giữ các cột, để trống
+                        positive, negative = explained or ([[]] * len(texts), [[]] * len(texts))
+                        result[EXPLANATION_COLUMNS[0]] = [format_terms(terms) for terms in positive]
+                        result[EXPLANATION_COLUMNS[1]] = [format_terms(terms) for terms in negative]
+                    pd.DataFrame(result).to_csv(output, header=False, index=False)
+                    # Các dòng đã báo tiến độ phải có trên đĩa để app hiển thị kết quả dở dang
+                    output.flush()
+                    rows += len(texts)
+                    counts.update(str(label) for label in predictions)
+                    if queue.report(job_id, pid, rows, progress):
+                        cancelled = True
+                        break
+                    if history is not None:
+                        history.record(texts, processed, predictions, scores, model.version, source=f'job:{job_id}')
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        stop.set()
+    if cancelled:
+        os.remove(tmp_path)
+        queue.finish(job_id, pid, 'cancelled', rows=rows)
+    elif not queue.finish(job_id, pid, 'done', replace=(tmp_path, result_path(job_id)),
+                          rows=rows, progress=1.0, model_version=model.version, label_counts=json.dumps(counts)):
+        os.remove(tmp_path)
+
+
+def worker_loop(parent_pid=None):
+    if hasattr(os, 'nice'):
+        os.nice(WORKER_NICE)
+    queue = JobQueue()
+    while parent_pid is None or os.getppid() == parent_pid:
+        job_id = queue.claim(os.getpid())
+        if job_id is None:
+            time.sleep(POLL_SECONDS)
+            continue
+        try:
+            run_job(queue, job_id)
+        except JobLost:
+            pass
+        except Exception:
+            queue.finish(job_id, os.getpid(), 'failed', traceback.format_exc(limit=5))
+
+
+_workers = []
+_workers_lock = threading.Lock()
+
+
+# Khởi động các worker (process spawn, daemon) một lần cho mỗi process app;
+# worker tự thoát khi process app kết thúc
+def ensure_workers(count=WORKERS):
+    with _workers_lock:
+        _workers[:] = [worker for worker in _workers if worker.is_alive()]
+        context = multiprocessing.get_context('spawn')
+        while len(_workers) < count:
+            worker = context.Process(target=worker_loop, args=(os.getpid(),), daemon=True, name='hasaki-job-worker')
+            worker.start()
+            _workers.append(worker)
+
+
+_queue = None
+
+
+def get_queue():
+    global _queue
+    if _queue is None:
+        _queue = JobQueue()
+    return _queue
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Background scoring jobs: run workers or inspect the queue')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('worker', help='run a worker in the foreground (in addition to the ones the app starts)')
+    commands.add_parser('list', help='show the most recent jobs')
+    cancel = commands.add_parser('cancel', help='cancel a queued or running job')
+    cancel.add_argument('job_id')
+    args = parser.parse_args()
+
+    if args.command == 'worker':
+        worker_loop()
+    elif args.command == 'list':
+        jobs = get_queue().recent()
+        columns = ['id', 'name', 'status', 'rows', 'progress', 'model_version']
+        print(pd.DataFrame(jobs, columns=columns).to_string(index=False) if jobs else 'No jobs')
+    else:
+        get_queue().cancel(args.job_id)
+
+
+if __name__ == '__main__':
+    main()
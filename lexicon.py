@@ -0,0 +1,89 @@
+from artifacts import cache_path, fingerprint, load_artifact, save_artifact
+
+EMOJI_FILE = 'emojicon.txt'
+TEENCODE_FILE = 'teencode.txt'
+WRONG_WORD_FILE = 'wrong-word.txt'
+STOPWORD_FILE = 'vietnamese-stopwords.txt'
+LEXICON_FILES = (EMOJI_FILE, TEENCODE_FILE, WRONG_WORD_FILE, STOPWORD_FILE)
+
+# Tăng khi đổi cấu trúc dữ liệu lưu trong file cache
+LEXICON_FORMAT = 2
+
+
+# Trie theo từng token để tra cụm nhiều từ (fast_pos.py dùng để ghép từ ghép)
+class PhraseTrie:
+    _END = None
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, words, value):
+        node = self.root
+        for word in words:
+            node = node.setdefault(word, {})
+        node[self._END] = value
+
+    def __contains__(self, words):
+        node = self.root
+        for word in words:
+            node = node.get(word)
+            if node is None:
+                return False
+        return self._END in node
+
+    # Cụm dài nhất bắt đầu tại words[start]: trả về (số token, giá trị) hoặc (0, None)
+    def longest_match(self, words, start=0):
+        node = self.root
+        length, value = 0, None
+        for i in range(start, len(words)):
+            node = node.get(words[i])
+            if node is None:
+                break
+            if self._END in node:
+                length, value = i - start + 1, node[self._END]
+        return length, value
+
+
+class Lexicon:
+    def __init__(self, emoji_dict, teen_dict, wrong_set, stopword_set):
+        self.emoji_dict = emoji_dict
+        self.teen_dict = teen_dict
+        self.wrong_set = wrong_set
+        self.stopword_set = stopword_set
+
+
+def _read_lines(path):
+    with open(path, 'r', encoding="utf8") as file:
+        return file.read().split('\n')
+
+
+def _read_dict(path):
+    return {key: str(value) for key, value in (line.split('\t') for line in _read_lines(path))}
+
+
+def build_lexicon():
+    return Lexicon(
+        _read_dict(EMOJI_FILE),
+        _read_dict(TEENCODE_FILE),
+        frozenset(_read_lines(WRONG_WORD_FILE)),
+        frozenset(_read_lines(STOPWORD_FILE)),
+    )
+
+
+_lexicon = None
+
+
+# Đọc lexicon từ file cache đã dựng sẵn, chỉ dựng lại khi một file .txt thay đổi
+def load_lexicon():
+    global _lexicon
+    if _lexicon is None:
+        path = cache_path('lexicon.pkl')
+        source_fingerprint = fingerprint(LEXICON_FILES)
+        signature = (LEXICON_FORMAT, source_fingerprint)
+        _lexicon = load_artifact(path, signature)
+        if _lexicon is None:
+            _lexicon = build_lexicon()
+            save_artifact(path, signature, _lexicon)
+        # Dùng làm một phần khóa cho các cache phụ thuộc vào lexicon
+        _lexicon.fingerprint = source_fingerprint
+    return _lexicon
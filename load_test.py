@@ -0,0 +1,316 @@
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+TRAINING_FILE = 'data_clean_2.csv'
+TEXT_COLUMN = 'noi_dung_binh_luan'
+# File của repo mà thư mục chạy thử cần (lexicon, mô hình); dữ liệu sản phẩm được sinh mới
+LINKED_FILES = ('emojicon.txt', 'teencode.txt', 'wrong-word.txt', 'vietnamese-stopwords.txt', 'model_pipeline.pkl')
+CATEGORIES = ('Kem Chống Nắng', 'Sữa Rửa Mặt', 'Son', 'Nước Tẩy Trang', 'Toner', 'Serum')
+BRANDS = ('Bioderma', 'La Roche-Posay', 'Cerave', 'Black Rouge', 'Senka', 'Klairs', 'Innisfree')
+DECORATIONS = ('', '', '', '!!', '...', ' 😍', ' :(', ' 👍', ' ạ', '??')
+ACTIONS = ('single', 'upload', 'product')
+SAMPLE_SECONDS = 0.1
+
+
+# Review giả lập từ data_clean_2.csv: ghép đoạn của 1-3 review cùng cảm xúc, bỏ dấu '_'
+# của từ ghép, thêm chữ hoa/dấu câu/emoji để bước tiền xử lý phải làm việc như với review thật
+class ReviewGenerator:
+    def __init__(self, path=TRAINING_FILE, seed=0):
+        df = pd.read_csv(path, usecols=[TEXT_COLUMN, 'sentiment'], dtype={TEXT_COLUMN: str}, keep_default_na=False)
+        df = df[df[TEXT_COLUMN].str.strip() != '']
+        self.words = {sentiment: [text.split() for text in group[TEXT_COLUMN]] for sentiment, group in df.groupby('sentiment')}
+        self.weights = df['sentiment'].value_counts(normalize=True).to_dict()
+        self.random = random.Random(seed)
+
+    def review(self, sentiment=None):
+        sentiment = sentiment or self.random.choices(list(self.weights), weights=list(self.weights.values()))[0]
+        words = []
+        for source in self.random.sample(self.words[sentiment], k=self.random.randint(1, 3)):
+            start = self.random.randrange(len(source))
+            words.extend(source[start:start + self.random.randint(3, 12)])
+        text = ' '.join(words).replace('_', ' ')
+        if self.random.random() < 0.3:
+            text = text.capitalize()
+        return text + self.random.choice(DECORATIONS), sentiment
+
+    def reviews(self, count):
+        return [self.review()[0] for _ in range(count)]
+
+
+# Ghi bộ dữ liệu sản phẩm thay thế (San_pham_full.csv, Danh_gia_full.csv và data_clean_2.csv
+# tương ứng) vào directory, cùng cấu trúc cột với dữ liệu thật
+def write_standin_data(directory, generator, products=200, max_reviews=80, seed=0):
+    rng = random.Random(seed)
+    product_rows, rating_rows, clean_rows = [], [], []
+    review_id = 0
+    for i in range(products):
+        code = 1000 + i
+        price = rng.randrange(50, 1500) * 1000
+        product_rows.append({
+            'ma_san_pham': code,
+            'ten_san_pham': f'{rng.choice(CATEGORIES)} {rng.choice(BRANDS)} {i}',
+            'gia_ban': price,
+            'gia_goc': int(price * rng.uniform(1.0, 1.4)),
+            'phan_loai': rng.choice(CATEGORIES),
+            'mo_ta': 'mô tả',
+            'diem_trung_binh': round(rng.uniform(3.0, 5.0), 1),
+        })
+        for _ in range(rng.randint(0, max_reviews)):
+            review_id += 1
+            text, sentiment = generator.review()
+            stars = rng.choice((4, 5)) if sentiment == 'Positive' else rng.choice((1, 2, 3))
+            rating_rows.append({
+                'id': review_id,
+                'ma_khach_hang': rng.randrange(1, 2000),
+                TEXT_COLUMN: text,
+                'ngay_binh_luan': f'{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2024',
+                'gio_binh_luan': f'{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}',
+                'so_sao': stars,
+                'ma_san_pham': code,
+            })
+            clean_rows.append({TEXT_COLUMN: text.lower(), 'id': review_id, 'sentiment': sentiment})
+    pd.DataFrame(product_rows).to_csv(os.path.join(directory, 'San_pham_full.csv'), index=False)
+    pd.DataFrame(rating_rows).to_csv(os.path.join(directory, 'Danh_gia_full.csv'), index=False)
+    pd.DataFrame(clean_rows).to_csv(os.path.join(directory, TRAINING_FILE), index=False)
+    return [row['ten_san_pham'] for row in product_rows]
+
+
+def prepare_workdir(directory, source_dir):
+    for name in LINKED_FILES:
+        target = os.path.join(directory, name)
+        if not os.path.exists(target):
+            os.symlink(os.path.abspath(os.path.join(source_dir, name)), target)
+
+
+def _rss(pid='self'):
+    try:
+        with open(f'/proc/{pid}/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+
+# RSS của process app cộng các worker job nền của nó
+def total_rss():
+    import jobs
+
+    return _rss() + sum(_rss(worker.pid) for worker in jobs._workers if worker.is_alive())
+
+
+# Các thao tác của một phiên, gọi đúng các hàm mà trang New Prediction / Product Analysis dùng
+class SessionActions:
+    def __init__(self, generator, product_names, upload_rows):
+        self.generator = generator
+        self.product_names = product_names
+        self.upload_rows = upload_rows
+
+    def single(self, rng):
+        from lexicon import load_lexicon
+        from model_registry import get_model
+        from preprocess_cache import cached_preprocess_batch
+
+        text = self.generator.review()[0]
+        get_model().predict(cached_preprocess_batch([text], load_lexicon()))
+
+    # Như trang: gửi file thành job nền, chờ xong rồi đọc file kết quả
+    def upload(self, rng):
+        import jobs
+
+        jobs.ensure_workers()
+        data = '\n'.join(self.generator.reviews(self.upload_rows)).encode('utf8')
+        queue = jobs.get_queue()
+        job_id = queue.submit(io.BytesIO(data), 'load_test.txt')
+        while queue.get(job_id)['status'] not in jobs.FINISHED:
+            time.sleep(0.05)
+        job = queue.get(job_id)
+        if job['status'] != 'done':
+            raise RuntimeError(f'job {job_id} {job["status"]}: {job["error"]}')
+        pd.read_csv(jobs.result_path(job_id), encoding='utf-8-sig', dtype=str, keep_default_na=False)
+
+    # Như trang: tìm theo từ khóa, xem sản phẩm, biểu đồ số sao, bình luận mẫu, wordcloud
+    def product(self, rng):
+        from matplotlib.figure import Figure
+
+        from aggregates import STARS, load_aggregates
+        from data_store import load_product_data
+        from product_search import get_search_index
+        from wordcloud_store import SENTIMENT_COLORS, wordcloud_png
+
+        product_data = load_product_data()
+        rating_aggregates = load_aggregates()
+        keyword = ' '.join(rng.choice(self.product_names).split()[:2])
+        rows = get_search_index(product_data).search(keyword)
+        if len(rows) == 0:
+            return
+        ma_sp = int(product_data.products['ma_san_pham'].iloc[rng.choice(list(rows))])
+        product_data.product(ma_sp)
+        summary = rating_aggregates.product(ma_sp)
+        product_data.product_ratings(ma_sp)[[TEXT_COLUMN, 'so_sao']].dropna().head(5)
+        # pyplot không an toàn khi nhiều thread cùng vẽ, dùng Figure trực tiếp với cùng chi phí vẽ
+        figure = Figure(figsize=(15, 8))
+        axes = figure.subplots(1, 2)
+        counts = [summary[f'stars_{stars}'] for stars in STARS]
+        axes[0].bar(STARS, counts, color='#FFB636')
+        if sum(counts):
+            axes[1].pie([count for count in counts if count], autopct='%1.1f%%')
+        figure.savefig(io.BytesIO(), format='png')
+        for sentiment in SENTIMENT_COLORS:
+            wordcloud_png(ma_sp, sentiment)
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+# Chạy concurrency phiên song song (mỗi phiên một thread, như Streamlit chạy script của
+# mỗi phiên trong thread riêng) trong duration giây; lấy mẫu RSS trong lúc chạy
+def run_level(actions, concurrency, duration, mix, think_seconds=0.0, seed=0):
+    latencies = {action: [] for action in ACTIONS}
+    errors = {action: 0 for action in ACTIONS}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+    done = threading.Event()
+    peak_rss = [total_rss()]
+
+    def sample_rss():
+        while not done.wait(SAMPLE_SECONDS):
+            peak_rss[0] = max(peak_rss[0], total_rss())
+
+    def session(index):
+        rng = random.Random(seed * 1000 + index)
+        while time.perf_counter() < stop_at:
+            action = rng.choices(list(mix), weights=list(mix.values()))[0]
+            start = time.perf_counter()
+            try:
+                getattr(actions, action)(rng)
+                failed = False
+            except Exception as error:
+                print(f'{action} failed: {error!r}', file=sys.stderr)
+                failed = True
+            elapsed = time.perf_counter() - start
+            with lock:
+                if failed:
+                    errors[action] += 1
+                else:
+                    latencies[action].append(elapsed)
+            if think_seconds:
+                time.sleep(rng.expovariate(1 / think_seconds))
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    sampler.join()
+
+    everything = [latency for values in latencies.values() for latency in values]
+    result = {
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'actions': len(everything),
+        'throughput_per_second': len(everything) / elapsed if elapsed else 0.0,
+        'errors': sum(errors.values()),
+        'peak_rss_mb': peak_rss[0] / 2 ** 20,
+        'all': _latency_summary(everything),
+    }
+    for action in mix:
+        result[action] = {**_latency_summary(latencies[action]), 'errors': errors[action]}
+    return result
+
+
+def _latency_summary(values):
+    return {
+        'count': len(values),
+        'p50_ms': percentile(values, 50) * 1000,
+        'p95_ms': percentile(values, 95) * 1000,
+        'p99_ms': percentile(values, 99) * 1000,
+    }
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ACTIONS:
+            raise argparse.ArgumentTypeError(f'unknown action {name!r} (expected one of {", ".join(ACTIONS)})')
+        mix[name] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive the app prediction and product-analysis paths from concurrent sessions')
+    parser.add_argument('--concurrency', default='1,2,4,8', help='comma-separated session counts to step through')
+    parser.add_argument('--duration', type=float, default=20, help='seconds per concurrency level')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('single=0.6,upload=0.1,product=0.3'),
+                        help='action weights, e.g. single=0.6,upload=0.1,product=0.3')
+    parser.add_argument('--upload-rows', type=int, default=500, help='reviews per uploaded file')
+    parser.add_argument('--think-ms', type=float, default=0, help='mean pause between actions of a session')
+    parser.add_argument('--products', type=int, default=200, help='products in the stand-in product CSVs')
+    parser.add_argument('--workdir', default=None, help='directory for the stand-in data and caches (default: a temp dir)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    source_dir = os.getcwd()
+    generator = ReviewGenerator(os.path.join(source_dir, TRAINING_FILE), args.seed)
+    workdir = args.workdir or tempfile.mkdtemp(prefix='hasaki-load-')
+    os.makedirs(workdir, exist_ok=True)
+    product_names = write_standin_data(workdir, generator, args.products, seed=args.seed)
+    prepare_workdir(workdir, source_dir)
+    # Các module của app đọc file theo đường dẫn tương đối và cache trong HASAKI_CACHE_DIR
+    # (đọc khi import), nên phải đổi thư mục trước khi import chúng
+    os.chdir(workdir)
+    os.environ['HASAKI_CACHE_DIR'] = os.path.join(workdir, '.cache')
+    print(f'Stand-in data and caches in {workdir}', file=sys.stderr)
+
+    actions = SessionActions(generator, product_names, args.upload_rows)
+    # Làm nóng: dựng các cache (lexicon, dữ liệu sản phẩm, tổng hợp, wordcloud) và nạp mô hình
+    warmup = random.Random(args.seed)
+    for action in args.mix:
+        getattr(actions, action)(warmup)
+
+    levels = []
+    for concurrency in (int(value) for value in args.concurrency.split(',')):
+        result = run_level(actions, concurrency, args.duration, args.mix, args.think_ms / 1000, args.seed)
+        levels.append(result)
+        print(f'{concurrency:>4} sessions: {result["throughput_per_second"]:7.1f} actions/s  '
+              f'p50 {result["all"]["p50_ms"]:8.1f} ms  p95 {result["all"]["p95_ms"]:8.1f} ms  '
+              f'p99 {result["all"]["p99_ms"]:8.1f} ms  peak RSS {result["peak_rss_mb"]:7.1f} MB  '
+              f'errors {result["errors"]}', file=sys.stderr, flush=True)
+        for action in args.mix:
+            print(f'       {action:<8} n={result[action]["count"]:<6} p50 {result[action]["p50_ms"]:8.1f} ms  '
+                  f'p95 {result[action]["p95_ms"]:8.1f} ms  p99 {result[action]["p99_ms"]:8.1f} ms', file=sys.stderr)
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'cpu_count': os.cpu_count(),
+        'mix': args.mix,
+        'duration': args.duration,
+        'upload_rows': args.upload_rows,
+        'levels': levels,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(os.path.join(source_dir, args.output), 'w', encoding='utf8') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+from collections import deque
+
+SAMPLES_PER_METRIC = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Bật bằng biến môi trường HASAKI_METRICS=1 hoặc enable(). Khi tắt, timer()
+# trả về một context manager rỗng dùng chung nên chi phí chỉ là một lần gọi hàm.
+enabled = os.environ.get('HASAKI_METRICS', '').lower() in ('1', 'true', 'yes')
+
+_lock = threading.Lock()
+_timings = {}
+_counters = {}
+_collectors = []
+
+
+class _Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        # Chỉ giữ các mẫu gần nhất để tính phân vị, bộ nhớ không tăng theo thời gian chạy
+        self.samples = deque(maxlen=SAMPLES_PER_METRIC)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.samples.append(seconds)
+
+    def quantiles(self):
+        samples = sorted(self.samples)
+        if not samples:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: samples[min(len(samples) - 1, int(round(q * (len(samples) - 1))))] for q in QUANTILES}
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class _Timer:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def enable(value=True):
+    global enabled
+    enabled = value
+
+
+def timer(name):
+    return _Timer(name) if enabled else _NULL_TIMER
+
+
+def observe(name, seconds):
+    if not enabled:
+        return
+    with _lock:
+        histogram = _timings.get(name)
+        if histogram is None:
+            histogram = _timings[name] = _Histogram()
+        histogram.observe(seconds)
+
+
+def increment(name, value=1):
+    if not enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+# Hàm trả về {tên: giá trị} được gọi khi lấy snapshot (vd: thống kê cache)
+def register_collector(collector):
+    _collectors.append(collector)
+
+
+def reset():
+    with _lock:
+        _timings.clear()
+        _counters.clear()
+
+
+def snapshot():
+    with _lock:
+        timings = {
+            name: {
+                'count': histogram.count,
+                'total_seconds': histogram.total,
+                **{f'p{int(q * 100)}': value for q, value in histogram.quantiles().items()},
+            }
+            for name, histogram in _timings.items()
+        }
+        counters = dict(_counters)
+    from model_registry import resident_bytes
+
+    gauges = {}
+    for collector in _collectors:
+        gauges.update(collector())
+    resident = resident_bytes()
+    if resident is not None:
+        gauges['process_resident_memory_bytes'] = resident
+    return {'enabled': enabled, 'timings': timings, 'counters': counters, 'gauges': gauges}
+
+
+def _metric_name(name):
+    return 'hasaki_' + ''.join(char if char.isalnum() else '_' for char in name)
+
+
+# Dạng text của Prometheus: mỗi timer là một summary (phân vị + _sum + _count)
+def render_prometheus(data=None):
+    data = data or snapshot()
+    lines = []
+    for name, timing in sorted(data['timings'].items()):
+        metric = _metric_name(name) + '_seconds'
+        lines.append(f'# TYPE {metric} summary')
+        for q in QUANTILES:
+            lines.append(f'{metric}{{quantile="{q}"}} {timing[f"p{int(q * 100)}"]:.6f}')
+        lines.append(f'{metric}_sum {timing["total_seconds"]:.6f}')
+        lines.append(f'{metric}_count {timing["count"]}')
+    for name, value in sorted(data['counters'].items()):
+        metric = _metric_name(name) + '_total'
+        lines.append(f'# TYPE {metric} counter')
+        lines.append(f'{metric} {value}')
+    for name, value in sorted(data['gauges'].items()):
+        metric = _metric_name(name)
+        lines.append(f'# TYPE {metric} gauge')
+        lines.append(f'{metric} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,216 @@
+import hashlib
+import os
+import threading
+import time
+
+import joblib
+
+import metrics
+from artifacts import cache_path
+
+MODEL_FILE = 'model_pipeline.pkl'
+CURRENT_FILE = 'CURRENT'
+
+
+def resident_bytes():
+    # RSS hiện tại của process (Linux); None nếu không đọc được
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+class LoadedModel:
+    def __init__(self, version, pipeline, load_seconds, resident_bytes, artifact_bytes, registry=None):
+        self.version = version
+        self.pipeline = pipeline
+        self.load_seconds = load_seconds
+        self.resident_bytes = resident_bytes
+        self.artifact_bytes = artifact_bytes
+        # Registry đã nạp phiên bản này (biên dịch khi giải thích); mặc định registry dùng chung
+        self._registry = registry
+        self._explainer = None
+
+    def predict(self, texts):
+        with metrics.timer('model.predict'):
+            return self.pipeline.predict(texts)
+
+    # Trả về (nhãn, điểm quyết định); điểm là None nếu bộ phân loại không có decision_function
+    def predict_with_scores(self, texts):
+        if hasattr(self.pipeline, 'predict_with_scores'):
+            return self.pipeline.predict_with_scores(texts)
+        with metrics.timer('model.predict'):
+            if not hasattr(self.pipeline, 'decision_function'):
+                return self.pipeline.predict(texts), None
+            scores = self.pipeline.decision_function(texts)
+            # Bộ phân loại nhị phân: điểm > 0 là lớp thứ hai, như predict()
+            return self.pipeline.classes_[(scores > 0).astype(int)], scores
+
+    # Giải thích cả lô bằng bản biên dịch của phiên bản này (biên dịch khi cần lần đầu):
+    # (nhãn, điểm, token đẩy về lớp thứ hai, token đẩy về lớp thứ nhất); None nếu
+    # pipeline không biên dịch được
+    def explain(self, texts, top=3):
+        if self._explainer is None:
+            from compiled_model import CompiledModel
+
+            if isinstance(self.pipeline, CompiledModel):
+                self._explainer = self.pipeline
+            else:
+                # Giải thích là tính năng phụ: mô hình không biên dịch được (RandomForest,
+                # MultinomialNB, ...) hay lỗi khi biên dịch không được làm hỏng dự đoán
+                try:
+                    self._explainer = CompiledModel((self._registry or get_registry()).compile(self.version))
+                except Exception:
+                    metrics.increment('model.explain_unavailable')
+                    self._explainer = False
+        return self._explainer.explain(texts, top) if self._explainer else None
+
+    def info(self):
+        return {
+            'version': self.version,
+            'load_seconds': self.load_seconds,
+            'resident_bytes': self.resident_bytes,
+            'artifact_bytes': self.artifact_bytes,
+        }
+
+
+# Mỗi phiên bản mô hình là một file joblib không nén trong .cache/models/, được
+# nạp với mmap_mode='r': các mảng numpy (idf, support vector, hệ số) được map
+# thẳng từ file nên các worker/replica trên cùng máy dùng chung page cache.
+# File CURRENT trỏ tới phiên bản đang dùng; đổi file này là hot-swap mô hình.
+class ModelRegistry:
+    def __init__(self, directory=None):
+        self.directory = directory or cache_path('models')
+        os.makedirs(self.directory, exist_ok=True)
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def path(self, version):
+        return os.path.join(self.directory, f'{version}.joblib')
+
+    def compiled_path(self, version):
+        return os.path.join(self.directory, f'{version}.compiled')
+
+    def versions(self):
+        return sorted(name[:-len('.joblib')] for name in os.listdir(self.directory) if name.endswith('.joblib'))
+
+    def publish(self, pipeline, version=None, activate=True):
+        version = version or time.strftime('%Y%m%d-%H%M%S')
+        tmp_path = f'{self.path(version)}.{os.getpid()}.tmp'
+        joblib.dump(pipeline, tmp_path)
+        os.replace(tmp_path, self.path(version))
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version):
+        if not os.path.exists(self.path(version)):
+            raise ValueError(f'Unknown model version: {version}')
+        tmp_path = os.path.join(self.directory, f'{CURRENT_FILE}.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as file:
+            file.write(version)
+        os.replace(tmp_path, os.path.join(self.directory, CURRENT_FILE))
+
+    # Nhập một file pickle (mặc định model_pipeline.pkl) thành phiên bản đặt tên theo nội dung
+    def import_file(self, path=MODEL_FILE, activate=True):
+        with open(path, 'rb') as file:
+            version = 'pipeline-' + hashlib.sha1(file.read()).hexdigest()[:12]
+        if not os.path.exists(self.path(version)):
+            self.publish(joblib.load(path), version, activate=False)
+        if activate:
+            self.activate(version)
+        return version
+
+    # Biên dịch một phiên bản thành các mảng numpy (compiled_model.py); bỏ qua nếu đã có
+    def compile(self, version):
+        from compiled_model import compile_pipeline
+
+        directory = self.compiled_path(version)
+        if not os.path.exists(os.path.join(directory, 'meta.json')):
+            tmp_directory = f'{directory}.{os.getpid()}.tmp'
+            compile_pipeline(joblib.load(self.path(version)), tmp_directory)
+            os.replace(tmp_directory, directory)
+        return directory
+
+    # Phiên bản đang dùng: biến môi trường HASAKI_MODEL_VERSION, rồi tới file CURRENT.
+    # model_pipeline.pkl được nhập lại khi chưa có CURRENT hoặc file pickle mới hơn.
+    def current_version(self):
+        version = os.environ.get('HASAKI_MODEL_VERSION')
+        if version:
+            return version
+        current_path = os.path.join(self.directory, CURRENT_FILE)
+        try:
+            with open(current_path) as file:
+                version = file.read().strip()
+        except FileNotFoundError:
+            return self.import_file()
+        # Không có model_pipeline.pkl (chỉ phát hành qua registry) thì giữ CURRENT
+        if os.path.exists(MODEL_FILE) and os.path.getmtime(MODEL_FILE) > os.path.getmtime(current_path):
+            return self.import_file()
+        return version
+
+    # compiled=True dùng bản biên dịch (chỉ numpy, không cần đồ thị đối tượng scikit-learn);
+    # mặc định theo biến môi trường HASAKI_COMPILED_MODEL
+    def load(self, version=None, compiled=None):
+        version = version or self.current_version()
+        if compiled is None:
+            compiled = os.environ.get('HASAKI_COMPILED_MODEL', '').lower() in ('1', 'true', 'yes')
+        with self._lock:
+            if (version, compiled) not in self._loaded:
+                resident_before = resident_bytes()
+                start = time.perf_counter()
+                pipeline = None
+                if compiled:
+                    from compiled_model import CompiledModel
+
+                    try:
+                        directory = self.compile(version)
+                    except ValueError:
+                        # Pipeline không biên dịch được (vd: HashingVectorizer) thì dùng bản joblib
+                        directory = None
+                    if directory is not None:
+                        pipeline = CompiledModel(directory)
+                        artifact_bytes = sum(entry.stat().st_size for entry in os.scandir(directory))
+                if pipeline is None:
+                    pipeline = joblib.load(self.path(version), mmap_mode='r')
+                    artifact_bytes = os.path.getsize(self.path(version))
+                load_seconds = time.perf_counter() - start
+                resident_after = resident_bytes()
+                self._loaded[version, compiled] = LoadedModel(
+                    version,
+                    pipeline,
+                    load_seconds,
+                    resident_after - resident_before if resident_before is not None else None,
+                    artifact_bytes,
+                    self,
+                )
+            return self._loaded[version, compiled]
+
+    # Giữ lại mô hình đang dùng, bỏ các phiên bản cũ khỏi bộ nhớ sau khi hot-swap
+    def release_others(self, version):
+        with self._lock:
+            for key in list(self._loaded):
+                if key[0] != version:
+                    del self._loaded[key]
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+        return _registry
+
+
+# Nạp mô hình lần đầu khi cần dự đoán, dùng chung trong process; tự chuyển sang
+# phiên bản mới khi CURRENT đổi
+def get_model():
+    registry = get_registry()
+    model = registry.load()
+    registry.release_others(model.version)
+    return model
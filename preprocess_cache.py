@@ -0,0 +1,162 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+from artifacts import cache_path
+from preprocessing import DEFAULT_MODE, PREPROCESS_VERSION, preprocess_batch
+
+MEMORY_ENTRIES = 50_000
+DISK_ENTRIES = 2_000_000
+
+
+# Cache kết quả preprocess() theo nội dung: khóa là hash của văn bản gốc cùng
+# namespace (phiên bản preprocess + dấu vân tay lexicon). Gồm 2 tầng: LRU trong
+# bộ nhớ và SQLite trên đĩa, mỗi tầng giới hạn số bản ghi.
+class PreprocessCache:
+    def __init__(self, namespace, path=None, memory_entries=MEMORY_ENTRIES, disk_entries=DISK_ENTRIES):
+        self.namespace = namespace
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self._hasher = hashlib.blake2b(namespace.encode('utf8') + b'\0', digest_size=16)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if disk_entries:
+            self._db = sqlite3.connect(path or cache_path('preprocess_cache.sqlite'), timeout=30, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS entries (key BLOB PRIMARY KEY, value TEXT NOT NULL, last_used INTEGER NOT NULL)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)')
+            self._db.commit()
+            self._disk_count = self._db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def key(self, text):
+        hasher = self._hasher.copy()
+        hasher.update(text.encode('utf8'))
+        return hasher.digest()
+
+    # Trả về {văn bản: kết quả} cho các văn bản đã có trong cache
+    def get_many(self, texts):
+        found = {}
+        disk_keys = {}
+        with self._lock:
+            for text in texts:
+                key = self.key(text)
+                value = self._memory.get(key)
+                if value is not None:
+                    self._memory.move_to_end(key)
+                    found[text] = value
+                    self.memory_hits += 1
+                else:
+                    disk_keys[key] = text
+
+            if disk_keys and self._db is not None:
+                keys = list(disk_keys)
+                now = int(time.time())
+                for i in range(0, len(keys), 500):
+                    batch = keys[i:i + 500]
+                    rows = self._db.execute(
+                        f'SELECT key, value FROM entries WHERE key IN ({",".join("?" * len(batch))})', batch).fetchall()
+                    for key, value in rows:
+                        found[disk_keys.pop(key)] = value
+                        self._remember(key, value)
+                    self._db.executemany('UPDATE entries SET last_used = ? WHERE key = ?', ((now, key) for key, _ in rows))
+                    self.disk_hits += len(rows)
+                self._db.commit()
+            self.misses += len(disk_keys)
+        return found
+
+    def put_many(self, items):
+        rows = []
+        now = int(time.time())
+        with self._lock:
+            for text, value in items:
+                key = self.key(text)
+                self._remember(key, value)
+                rows.append((key, value, now))
+            if rows and self._db is not None:
+                cursor = self._db.executemany('INSERT OR IGNORE INTO entries (key, value, last_used) VALUES (?, ?, ?)', rows)
+                self._disk_count += max(cursor.rowcount, 0)
+                if self._disk_count > self.disk_entries:
+                    self._evict_disk()
+                self._db.commit()
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    # Xóa các bản ghi lâu không dùng nhất, giảm về 90% giới hạn để không phải xóa sau mỗi lần ghi
+    def _evict_disk(self):
+        excess = self._disk_count - int(self.disk_entries * 0.9)
+        self._db.execute(
+            'DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_used LIMIT ?)', (excess,))
+        self._disk_count = self._db.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            'memory_entries': len(self._memory),
+            'disk_entries': self._disk_count if self._db is not None else 0,
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+# Gộp thống kê của các cache trong process cho bảng metrics
+def _collect_stats():
+    with _caches_lock:
+        stats = [cache.stats() for cache in _caches.values()]
+    totals = {name: sum(item[name] for item in stats) for name in ('memory_hits', 'disk_hits', 'misses', 'memory_entries', 'disk_entries')}
+    lookups = totals['memory_hits'] + totals['disk_hits'] + totals['misses']
+    totals['hit_rate'] = (totals['memory_hits'] + totals['disk_hits']) / lookups if lookups else 0.0
+    return {f'preprocess_cache_{name}': value for name, value in totals.items()}
+
+
+metrics.register_collector(_collect_stats)
+
+
+def get_cache(lexicon, mode=None):
+    namespace = f'{PREPROCESS_VERSION}:{lexicon.fingerprint}'
+    if (mode or DEFAULT_MODE) == 'fast':
+        # Kết quả chế độ fast phụ thuộc thêm vào bảng tách từ/từ loại
+        from fast_pos import load_fast_tagger
+        namespace += f':fast:{load_fast_tagger().fingerprint}'
+    with _caches_lock:
+        if namespace not in _caches:
+            _caches[namespace] = PreprocessCache(namespace)
+        return _caches[namespace]
+
+
+# preprocess_batch() có cache: các văn bản trùng trong cùng lô chỉ xử lý một lần,
+# văn bản đã gặp trước đó lấy thẳng từ cache
+def cached_preprocess_batch(texts, lexicon, cache=None, mode=None, **batch_options):
+    texts = list(texts)
+    cache = cache or get_cache(lexicon, mode)
+    unique_texts = list(dict.fromkeys(texts))
+    with metrics.timer('preprocess_cache.lookup'):
+        results = cache.get_many(unique_texts)
+    missing = [text for text in unique_texts if text not in results]
+    if missing:
+        processed = preprocess_batch(
+            missing, lexicon.emoji_dict, lexicon.teen_dict, lexicon.wrong_set, lexicon.stopword_set, mode=mode, **batch_options)
+        cache.put_many(zip(missing, processed))
+        results.update(zip(missing, processed))
+    return [results[text] for text in texts]
+
+
+def cached_preprocess(text, lexicon, cache=None, mode=None):
+    return cached_preprocess_batch([text], lexicon, cache, mode)[0]
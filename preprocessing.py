@@ -1,131 +1,390 @@
-import re
-import string
-import regex 
-from underthesea import word_tokenize, pos_tag, sent_tokenize
-# 1. Chuyển văn bản thành chữ thường
-def to_lower(text):
-    return text.lower()
-
-
-# 2. Loại bỏ những ký tự kéo dài: Ví dụ: Áo đẹp quáaaaaaaa--> Áo đẹp quá.
-def normalize_repeated_characters(text):
-    return re.sub(r'(.)\1+', r'\1', text)
-
-# 3. Loại bỏ dấu câu
-def remove_punctuation(text):
-    translator = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
-    return text.translate(translator)
-
-
-# 4. Xử lý từ điển emoji, teen code, lỗi
-def process_text(text, emoji_dict, teen_dict, wrong_lst):
-    document = text.replace("’",'')
-    document = regex.sub(r'\.+', ".", document)
-    new_sentence =''
-    for sentence in sent_tokenize(document):
-        # if not(sentence.isascii()):
-        ###### CONVERT EMOJICON
-        sentence = ''.join(emoji_dict[word]+' ' if word in emoji_dict else word for word in list(sentence))
-        ###### CONVERT TEENCODE
-        sentence = ' '.join(teen_dict[word] if word in teen_dict else word for word in sentence.split())
-        ###### DEL Punctuation & Numbers
-        pattern = r'(?i)\b[a-záàảãạăắằẳẵặâấầẩẫậéèẻẽẹêếềểễệóòỏõọôốồổỗộơớờởỡợíìỉĩịúùủũụưứừửữựýỳỷỹỵđ]+\b'
-        sentence = ' '.join(regex.findall(pattern,sentence))
-        # ...
-        ###### DEL wrong words
-        sentence = ' '.join('' if word in wrong_lst else word for word in sentence.split())
-        new_sentence = new_sentence+ sentence + '. '
-    document = new_sentence
-    #print(document)
-    ###### DEL excess blank space
-    document = regex.sub(r'\s+', ' ', document).strip()
-    #...
-    return document
-
-
-# 5. Chuẩn hóa Unicode
-def loaddicchar():
-    uniChars = "àáảãạâầấẩẫậăằắẳẵặèéẻẽẹêềếểễệđìíỉĩịòóỏõọôồốổỗộơờớởỡợùúủũụưừứửữựỳýỷỹỵÀÁẢÃẠÂẦẤẨẪẬĂẰẮẲẴẶÈÉẺẼẸÊỀẾỂỄỆĐÌÍỈĨỊÒÓỎÕỌÔỒỐỔỖỘƠỜỚỞỠỢÙÚỦŨỤƯỪỨỬỮỰỲÝỶỸỴÂĂĐÔƠƯ"
-    unsignChars = "aaaaaaaaaaaaaaaaaeeeeeeeeeeediiiiiooooooooooooooooouuuuuuuuuuuyyyyyAAAAAAAAAAAAAAAAAEEEEEEEEEEEDIIIOOOOOOOOOOOOOOOOOOOUUUUUUUUUUUYYYYYAADOOU"
-
-    dic = {}
-    char1252 = 'à|á|ả|ã|ạ|ầ|ấ|ẩ|ẫ|ậ|ằ|ắ|ẳ|ẵ|ặ|è|é|ẻ|ẽ|ẹ|ề|ế|ể|ễ|ệ|ì|í|ỉ|ĩ|ị|ò|ó|ỏ|õ|ọ|ồ|ố|ổ|ỗ|ộ|ờ|ớ|ở|ỡ|ợ|ù|ú|ủ|ũ|ụ|ừ|ứ|ử|ữ|ự|ỳ|ý|ỷ|ỹ|ỵ|À|Á|Ả|Ã|Ạ|Ầ|Ấ|Ẩ|Ẫ|Ậ|Ằ|Ắ|Ẳ|Ẵ|Ặ|È|É|Ẻ|Ẽ|Ẹ|Ề|Ế|Ể|Ễ|Ệ|Ì|Í|Ỉ|Ĩ|Ị|Ò|Ó|Ỏ|Õ|Ọ|Ồ|Ố|Ổ|Ỗ|Ộ|Ờ|Ớ|Ở|Ỡ|Ợ|Ù|Ú|Ủ|Ũ|Ụ|Ừ|Ứ|Ử|Ữ|Ự|Ỳ|Ý|Ỷ|Ỹ|Ỵ'.split(
-        '|')
-    charutf8 = "à|á|ả|ã|ạ|ầ|ấ|ẩ|ẫ|ậ|ằ|ắ|ẳ|ẵ|ặ|è|é|ẻ|ẽ|ẹ|ề|ế|ể|ễ|ệ|ì|í|ỉ|ĩ|ị|ò|ó|ỏ|õ|ọ|ồ|ố|ổ|ỗ|ộ|ờ|ớ|ở|ỡ|ợ|ù|ú|ủ|ũ|ụ|ừ|ứ|ử|ữ|ự|ỳ|ý|ỷ|ỹ|ỵ|À|Á|Ả|Ã|Ạ|Ầ|Ấ|Ẩ|Ẫ|Ậ|Ằ|Ắ|Ẳ|Ẵ|Ặ|È|É|Ẻ|Ẽ|Ẹ|Ề|Ế|Ể|Ễ|Ệ|Ì|Í|Ỉ|Ĩ|Ị|Ò|Ó|Ỏ|Õ|Ọ|Ồ|Ố|Ổ|Ỗ|Ộ|Ờ|Ớ|Ở|Ỡ|Ợ|Ù|Ú|Ủ|Ũ|Ụ|Ừ|Ứ|Ử|Ữ|Ự|Ỳ|Ý|Ỷ|Ỹ|Ỵ".split(
-        '|')
-    for i in range(len(char1252)):
-        dic[char1252[i]] = charutf8[i]
-    return dic
-
-# Đưa toàn bộ dữ liệu qua hàm này để chuẩn hóa lại
-def convert_unicode(txt):
-    dicchar = loaddicchar()
-    return regex.sub(
-        r'à|á|ả|ã|ạ|ầ|ấ|ẩ|ẫ|ậ|ằ|ắ|ẳ|ẵ|ặ|è|é|ẻ|ẽ|ẹ|ề|ế|ể|ễ|ệ|ì|í|ỉ|ĩ|ị|ò|ó|ỏ|õ|ọ|ồ|ố|ổ|ỗ|ộ|ờ|ớ|ở|ỡ|ợ|ù|ú|ủ|ũ|ụ|ừ|ứ|ử|ữ|ự|ỳ|ý|ỷ|ỹ|ỵ|À|Á|Ả|Ã|Ạ|Ầ|Ấ|Ẩ|Ẫ|Ậ|Ằ|Ắ|Ẳ|Ẵ|Ặ|È|É|Ẻ|Ẽ|Ẹ|Ề|Ế|Ể|Ễ|Ệ|Ì|Í|Ỉ|Ĩ|Ị|Ò|Ó|Ỏ|Õ|Ọ|Ồ|Ố|Ổ|Ỗ|Ộ|Ờ|Ớ|Ở|Ỡ|Ợ|Ù|Ú|Ủ|Ũ|Ụ|Ừ|Ứ|Ử|Ữ|Ự|Ỳ|Ý|Ỷ|Ỹ|Ỵ',
-        lambda x: dicchar[x.group()], txt)
-
-
-# 6. Xử lý từ đặc biệt
-def process_special_word(text):
-    # List các từ phủ định cần xử lý
-    negations = ['không', 'chẳng', 'chả', 'đừng', 'chưa']
-    
-    new_text = ''
-    text_lst = text.split()  # Tách văn bản thành các từ
-    i = 0
-    
-    while i < len(text_lst):
-        word = text_lst[i]
-        
-        # Nếu từ là một từ phủ định
-        if word in negations:
-            next_idx = i + 1
-            # Nếu có từ tiếp theo trong câu
-            if next_idx < len(text_lst):
-                # Gắn từ phủ định với từ tiếp theo, ví dụ: 'không đẹp' -> 'không_đẹp'
-                word = word + '_' + text_lst[next_idx]
-                i = next_idx + 1  # Bỏ qua từ tiếp theo vì đã ghép vào
-            else:
-                i += 1
-        else:
-            i += 1
-        
-        new_text = new_text + word + ' '  # Thêm từ vào câu mới
-    
-    return new_text.strip()  # Trả về câu đã xử lý
-
-
-def process_postag_thesea(text):
-    new_document = ''
-    for sentence in sent_tokenize(text):
-        sentence = sentence.replace('.','')
-        ###### POS tag
-        lst_word_type = ['N','Np','A','AB','V','VB','VY','R']
-        # lst_word_type = ['A','AB','V','VB','VY','R']
-        sentence = ' '.join( word[0] if word[1].upper() in lst_word_type else '' for word in pos_tag(process_special_word(word_tokenize(sentence, format="text"))))
-        new_document = new_document + sentence + ' '
-    ###### DEL excess blank space
-    new_document = regex.sub(r'\s+', ' ', new_document).strip()
-    return new_document
-
-
-# 8. Loại bỏ stopword
-def remove_stopword(text, stopwords):
-    ###### REMOVE stop words
-    document = ' '.join('' if word in stopwords else word for word in text.split())
-    #print(document)
-    ###### DEL excess blank space
-    document = regex.sub(r'\s+', ' ', document).strip()
-    return document
-
-
-def preprocess(text, emoji_dict, teen_dict, wrong_lst, stopwords):
-    text = to_lower(text)
-    text = normalize_repeated_characters(text)
-    text = remove_punctuation(text)
-    text = process_text(text, emoji_dict, teen_dict, wrong_lst)
-    text = convert_unicode(text)
-    text = process_special_word(text)
-    text = process_postag_thesea(text)
-    text = remove_stopword(text, stopwords)
-    return text
\ No newline at end of file
+import multiprocessing
+import os
+import re
+import string
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import regex 
+from nltk.tokenize.punkt import PunktToken
+from underthesea import word_tokenize, sent_tokenize
+from underthesea.pipeline import sent_tokenize as _sent_tokenize_module
+from underthesea.pipeline.pos_tag.model_crf import CRFPOSTagPredictor
+from underthesea.pipeline.pos_tag.tagged_feature import apply_function
+
+import metrics
+
+# Tăng khi kết quả preprocess() thay đổi để các cache kết quả cũ không còn được dùng
+PREPROCESS_VERSION = 1
+
+# 'full': tách từ + gán nhãn từ loại bằng underthesea cho mọi câu.
+# 'fast': tra bảng tách từ / từ loại dựng sẵn (fast_pos.py), CRF chỉ cho câu có từ lạ.
+PREPROCESS_MODES = ('full', 'fast')
+DEFAULT_MODE = os.environ.get('HASAKI_PREPROCESS_MODE', 'full')
+
+# Các bảng tra và pattern dùng chung, biên dịch một lần khi import module
+_REPEATED_CHAR_PATTERN = re.compile(r'(.)\1+')
+_PUNCTUATION_TABLE = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
+_DOTS_PATTERN = regex.compile(r'\.+')
+_VIET_WORD_PATTERN = regex.compile(r'(?i)\b[a-záàảãạăắằẳẵặâấầẩẫậéèẻẽẹêếềểễệóòỏõọôốồổỗộơớờởỡợíìỉĩịúùủũụưứừửữựýỳỷỹỵđ]+\b')
+_SPACES_PATTERN = regex.compile(r'\s+')
+_NEGATIONS = frozenset(['không', 'chẳng', 'chả', 'đừng', 'chưa'])
+_POS_TAGS = frozenset(['N','Np','A','AB','V','VB','VY','R'])
+
+
+# 1. Chuyển văn bản thành chữ thường
+def to_lower(text):
+    return text.lower()
+
+
+# 2. Loại bỏ những ký tự kéo dài: Ví dụ: Áo đẹp quáaaaaaaa--> Áo đẹp quá.
+def normalize_repeated_characters(text):
+    return _REPEATED_CHAR_PATTERN.sub(r'\1', text)
+
+# 3. Loại bỏ dấu câu
+def remove_punctuation(text):
+    return text.translate(_PUNCTUATION_TABLE)
+
+
+# 4. Xử lý từ điển emoji, teen code, lỗi
+def process_text(text, emoji_dict, teen_dict, wrong_lst):
+    document = text.replace("’",'')
+    document = _DOTS_PATTERN.sub(".", document)
+    new_sentences = []
+    for sentence in sent_tokenize(document):
+        # if not(sentence.isascii()):
+        ###### CONVERT EMOJICON
+        sentence = ''.join(emoji_dict[word]+' ' if word in emoji_dict else word for word in list(sentence))
+        ###### CONVERT TEENCODE
+        sentence = ' '.join(teen_dict[word] if word in teen_dict else word for word in sentence.split())
+        ###### DEL Punctuation & Numbers
+        sentence = ' '.join(_VIET_WORD_PATTERN.findall(sentence))
+        # ...
+        ###### DEL wrong words
+        sentence = ' '.join('' if word in wrong_lst else word for word in sentence.split())
+        new_sentences.append(sentence + '. ')
+    document = ''.join(new_sentences)
+    #print(document)
+    ###### DEL excess blank space
+    document = _SPACES_PATTERN.sub(' ', document).strip()
+    #...
+    return document
+
+
+# 5. Chuẩn hóa Unicode
+def loaddicchar():
+    uniChars = "àáảãạâầấẩẫậăằắẳẵặèéẻẽẹêềếểễệđìíỉĩịòóỏõọôồốổỗộơờớởỡợùúủũụưừứửữựỳýỷỹỵÀÁẢÃẠÂẦẤẨẪẬĂẰẮẲẴẶÈÉẺẼẸÊỀẾỂỄỆĐÌÍỈĨỊÒÓỎÕỌÔỒỐỔỖỘƠỜỚỞỠỢÙÚỦŨỤƯỪỨỬỮỰỲÝỶỸỴÂĂĐÔƠƯ"
+    unsignChars = "aaaaaaaaaaaaaaaaaeeeeeeeeeeediiiiiooooooooooooooooouuuuuuuuuuuyyyyyAAAAAAAAAAAAAAAAAEEEEEEEEEEEDIIIOOOOOOOOOOOOOOOOOOOUUUUUUUUUUUYYYYYAADOOU"
+
+    dic = {}
+    char1252 = 'à|á|ả|ã|ạ|ầ|ấ|ẩ|ẫ|ậ|ằ|ắ|ẳ|ẵ|ặ|è|é|ẻ|ẽ|ẹ|ề|ế|ể|ễ|ệ|ì|í|ỉ|ĩ|ị|ò|ó|ỏ|õ|ọ|ồ|ố|ổ|ỗ|ộ|ờ|ớ|ở|ỡ|ợ|ù|ú|ủ|ũ|ụ|ừ|ứ|ử|ữ|ự|ỳ|ý|ỷ|ỹ|ỵ|À|Á|Ả|Ã|Ạ|Ầ|Ấ|Ẩ|Ẫ|Ậ|Ằ|Ắ|Ẳ|Ẵ|Ặ|È|É|Ẻ|Ẽ|Ẹ|Ề|Ế|Ể|Ễ|Ệ|Ì|Í|Ỉ|Ĩ|Ị|Ò|Ó|Ỏ|Õ|Ọ|Ồ|Ố|Ổ|Ỗ|Ộ|Ờ|Ớ|Ở|Ỡ|Ợ|Ù|Ú|Ủ|Ũ|Ụ|Ừ|Ứ|Ử|Ữ|Ự|Ỳ|Ý|Ỷ|Ỹ|Ỵ'.split(
+        '|')
+    charutf8 = "à|á|ả|ã|ạ|ầ|ấ|ẩ|ẫ|ậ|ằ|ắ|ẳ|ẵ|ặ|è|é|ẻ|ẽ|ẹ|ề|ế|ể|ễ|ệ|ì|í|ỉ|ĩ|ị|ò|ó|ỏ|õ|ọ|ồ|ố|ổ|ỗ|ộ|ờ|ớ|ở|ỡ|ợ|ù|ú|ủ|ũ|ụ|ừ|ứ|ử|ữ|ự|ỳ|ý|ỷ|ỹ|ỵ|À|Á|Ả|Ã|Ạ|Ầ|Ấ|Ẩ|Ẫ|Ậ|Ằ|Ắ|Ẳ|Ẵ|Ặ|È|É|Ẻ|Ẽ|Ẹ|Ề|Ế|Ể|Ễ|Ệ|Ì|Í|Ỉ|Ĩ|Ị|Ò|Ó|Ỏ|Õ|Ọ|Ồ|Ố|Ổ|Ỗ|Ộ|Ờ|Ớ|Ở|Ỡ|Ợ|Ù|Ú|Ủ|Ũ|Ụ|Ừ|Ứ|Ử|Ữ|Ự|Ỳ|Ý|Ỷ|Ỹ|Ỵ".split(
+        '|')
+    for i in range(len(char1252)):
+        dic[char1252[i]] = charutf8[i]
+    return dic
+
+# Bảng chuyển đổi và pattern tương ứng chỉ cần tạo một lần
+_DICCHAR = loaddicchar()
+_UNICODE_PATTERN = regex.compile('|'.join(_DICCHAR))
+
+
+# Đưa toàn bộ dữ liệu qua hàm này để chuẩn hóa lại
+def convert_unicode(txt):
+    return _UNICODE_PATTERN.sub(lambda x: _DICCHAR[x.group()], txt)
+
+
+# 6. Xử lý từ đặc biệt
+def join_negations(words):
+    new_words = []
+    i = 0
+
+    while i < len(words):
+        word = words[i]
+
+        # Gắn từ phủ định với từ tiếp theo, ví dụ: 'không đẹp' -> 'không_đẹp'
+        if word in _NEGATIONS and i + 1 < len(words):
+            word = word + '_' + words[i + 1]
+            i += 2  # Bỏ qua từ tiếp theo vì đã ghép vào
+        else:
+            i += 1
+
+        new_words.append(word)
+
+    return new_words
+
+
+def process_special_word(text):
+    return ' '.join(join_negations(text.split()))
+
+
+# 7. Tách từ, gán nhãn từ loại và chỉ giữ các từ loại mang cảm xúc
+# pos_tag của underthesea dựng lại toàn bộ các cột của câu cho từng token và
+# từng template nên chậm theo bình phương độ dài câu (review dài không còn dấu
+# câu là một câu duy nhất). Ở đây tạo đúng các đặc trưng đó trong một lượt
+# rồi gọi thẳng mô hình CRF của pos_tag.
+_POS_TEMPLATE_PATTERN = re.compile(r"T\[(?P<index1>\-?\d+)(\,(?P<index2>\-?\d+))?\](\[(?P<column>.*)\])?(\.(?P<function>.*))?")
+_pos_tagger = None
+
+
+def _load_pos_tagger():
+    global _pos_tagger
+    if _pos_tagger is None:
+        predictor = CRFPOSTagPredictor.Instance()
+        template = []
+        for token_syntax in predictor.transformer.template:
+            matched = _POS_TEMPLATE_PATTERN.match(token_syntax)
+            column = matched.group("column")
+            index2 = matched.group("index2")
+            template.append((
+                token_syntax + '=',
+                int(matched.group("index1")),
+                int(index2) if index2 else None,
+                int(column) if column else 0,
+                matched.group("function"),
+            ))
+        _pos_tagger = (predictor.model, template)
+    return _pos_tagger
+
+
+def tag_words(tokens):
+    if not tokens:
+        return []
+    model, template = _load_pos_tagger()
+    columns = (tokens, ['X'] * len(tokens))
+    n = len(tokens)
+    features = []
+    for i in range(n):
+        token_features = []
+        for prefix, index1, index2, column, func in template:
+            if i + index1 < 0:
+                token_features.append(prefix + 'BOS')
+                continue
+            if i + index1 >= n or (index2 is not None and i + index2 >= n):
+                token_features.append(prefix + 'EOS')
+                continue
+            if index2 is not None:
+                word = ' '.join(columns[column][i + index1: i + index2 + 1])
+            else:
+                word = columns[column][i + index1]
+            if func is not None:
+                word = apply_function(func, word)
+            token_features.append('%s%s' % (prefix, word))
+        features.append(token_features)
+    return list(zip(tokens, model.tag(features)))
+
+
+def postag_words(sentence):
+    with metrics.timer('preprocess.word_tokenize'):
+        words = join_negations(word_tokenize(sentence, format="text").split())
+        tokens = word_tokenize(' '.join(words))
+    # Tương đương pos_tag(' '.join(words)); từ ghép trả về có thể chứa khoảng trắng nên tách lại thành token
+    with metrics.timer('preprocess.pos_tag'):
+        tagged = tag_words(tokens)
+    return [token for word, tag in tagged if tag.upper() in _POS_TAGS for token in word.split()]
+
+
+def process_postag_thesea(text):
+    new_words = []
+    for sentence in sent_tokenize(text):
+        new_words.extend(postag_words(sentence.replace('.','')))
+    return ' '.join(new_words)
+
+
+# 8. Loại bỏ stopword
+def remove_stopword(text, stopwords):
+    ###### REMOVE stop words
+    document = ' '.join('' if word in stopwords else word for word in text.split())
+    #print(document)
+    ###### DEL excess blank space
+    document = _SPACES_PATTERN.sub(' ', document).strip()
+    return document
+
+
+# Tách câu trên danh sách token đã có, dùng lại đúng mô hình Punkt của
+# underthesea.sent_tokenize thay vì ghép chuỗi rồi tách câu lần thứ hai
+_sentence_tokenizer = None
+
+
+def split_sentences(words):
+    global _sentence_tokenizer
+    if _sentence_tokenizer is None:
+        _sent_tokenize_module._load_model()
+        _sentence_tokenizer = _sent_tokenize_module.sentence_tokenizer
+
+    sentences = []
+    sentence = []
+    for token in _sentence_tokenizer._annotate_tokens(PunktToken(word) for word in words):
+        sentence.append(token.tok)
+        if token.sentbreak:
+            sentences.append(sentence)
+            sentence = []
+    if sentence:
+        sentences.append(sentence)
+    return sentences
+
+
+# Bộ chuẩn hóa dựng sẵn từ các từ điển: bảng emoji, set teencode/từ sai/stopword
+# được tạo một lần thay vì duyệt list ở mỗi lần gọi preprocess().
+# Văn bản được tách câu một lần, các bước sau làm việc trên danh sách token
+# và chỉ ghép thành chuỗi ở cuối.
+class Normalizer:
+    def __init__(self, emoji_dict, teen_dict, wrong_lst, stopwords, mode=None):
+        # Chỉ các emoji 1 ký tự mới được so khớp (duyệt từng ký tự như process_text)
+        self.emoji_table = str.maketrans({key: value + ' ' for key, value in emoji_dict.items() if len(key) == 1})
+        self.teen_dict = dict(teen_dict)
+        self.wrong_set = frozenset(wrong_lst)
+        self.stopword_set = frozenset(stopwords)
+        self.mode = mode or DEFAULT_MODE
+        if self.mode not in PREPROCESS_MODES:
+            raise ValueError(f'Unknown preprocess mode: {self.mode}')
+        if self.mode == 'fast':
+            from fast_pos import load_fast_tagger
+            self.postag_words = load_fast_tagger().postag_words
+        else:
+            self.postag_words = postag_words
+
+    # Bước 4 trên token: mỗi câu kết thúc bằng dấu '.', gắn vào từ cuối
+    # hoặc đứng riêng như khi process_text ghép chuỗi
+    def text_tokens(self, text):
+        document = _DOTS_PATTERN.sub(".", text.replace("’",''))
+        teen_dict = self.teen_dict
+        wrong_set = self.wrong_set
+        words = []
+        for sentence in sent_tokenize(document):
+            sentence = sentence.translate(self.emoji_table)
+            found = [word for token in sentence.split() for word in _VIET_WORD_PATTERN.findall(teen_dict.get(token, token))]
+            kept = [word for word in found if word not in wrong_set]
+            if kept and found[-1] not in wrong_set:
+                kept[-1] += '.'
+            else:
+                kept.append('.')
+            words.extend(kept)
+        return words
+
+    def process_text(self, text):
+        return ' '.join(self.text_tokens(text))
+
+    def remove_stopword(self, text):
+        return ' '.join(self.stopword_tokens(text.split()))
+
+    def stopword_tokens(self, words):
+        stopword_set = self.stopword_set
+        return [word for word in words if word not in stopword_set]
+
+    # Các câu (đã bỏ dấu '.') đưa vào bước tách từ + gán nhãn từ loại
+    def postag_sentences(self, text):
+        with metrics.timer('preprocess.clean'):
+            text = text.lower()
+            text = _REPEATED_CHAR_PATTERN.sub(r'\1', text)
+            text = text.translate(_PUNCTUATION_TABLE)
+        with metrics.timer('preprocess.process_text'):
+            words = self.text_tokens(text)
+        with metrics.timer('preprocess.convert_unicode'):
+            words = join_negations([convert_unicode(word) for word in words])
+        with metrics.timer('preprocess.split_sentences'):
+            return [' '.join(word.replace('.','') for word in sentence) for sentence in split_sentences(words)]
+
+    def tokens(self, text):
+        tagged_words = []
+        for sentence in self.postag_sentences(text):
+            tagged_words.extend(self.postag_words(sentence))
+        with metrics.timer('preprocess.remove_stopword'):
+            return self.stopword_tokens(tagged_words)
+
+    def __call__(self, text):
+        with metrics.timer('preprocess'):
+            return ' '.join(self.tokens(text))
+
+
+# Giữ lại Normalizer gần nhất: app luôn truyền cùng các đối tượng từ điển
+# nên chỉ phải dựng lại khi các từ điển được thay bằng đối tượng khác
+_normalizer_cache = (None, None, None)
+
+
+def get_normalizer(emoji_dict, teen_dict, wrong_lst, stopwords, mode=None):
+    global _normalizer_cache
+    resources = (emoji_dict, teen_dict, wrong_lst, stopwords)
+    mode = mode or DEFAULT_MODE
+    cached_resources, cached_mode, normalizer = _normalizer_cache
+    if cached_resources is None or cached_mode != mode or any(a is not b for a, b in zip(resources, cached_resources)):
+        normalizer = Normalizer(*resources, mode=mode)
+        _normalizer_cache = (resources, mode, normalizer)
+    return normalizer
+
+
+def preprocess_tokens(text, emoji_dict, teen_dict, wrong_lst, stopwords, mode=None):
+    return get_normalizer(emoji_dict, teen_dict, wrong_lst, stopwords, mode).tokens(text)
+
+
+def preprocess(text, emoji_dict, teen_dict, wrong_lst, stopwords, mode=None):
+    return get_normalizer(emoji_dict, teen_dict, wrong_lst, stopwords, mode)(text)
+
+
+# Xử lý theo lô: chia văn bản cho một pool process dùng lại giữa các lần gọi.
+# Mỗi worker dựng Normalizer và nạp các mô hình underthesea một lần khi khởi động.
+_MIN_PARALLEL_TEXTS = 64
+_executor = None
+_executor_key = None
+_worker_normalizer = None
+
+
+def _init_worker(emoji_dict, teen_dict, wrong_lst, stopwords, mode):
+    global _worker_normalizer
+    _worker_normalizer = Normalizer(emoji_dict, teen_dict, wrong_lst, stopwords, mode)
+    # Chạy thử một câu để nạp sẵn mô hình tách từ và gán nhãn từ loại
+    _worker_normalizer('khởi động')
+
+
+def _preprocess_chunk(texts):
+    return [_worker_normalizer(text) for text in texts]
+
+
+def _get_executor(resources, mode, n_jobs):
+    global _executor, _executor_key
+    key = (tuple(id(resource) for resource in resources), mode, n_jobs)
+    if _executor is None or _executor_key != key:
+        shutdown_batch_pool()
+        # spawn thay vì fork: process cha (Streamlit) chạy nhiều thread
+        _executor = ProcessPoolExecutor(
+            max_workers=n_jobs,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(*resources, mode),
+        )
+        _executor_key = key
+    return _executor
+
+
+def shutdown_batch_pool():
+    global _executor, _executor_key
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+    _executor = None
+    _executor_key = None
+
+
+def preprocess_batch(texts, emoji_dict, teen_dict, wrong_lst, stopwords, n_jobs=None, chunksize=None, mode=None):
+    texts = list(texts)
+    n_jobs = n_jobs or os.cpu_count() or 1
+    mode = mode or DEFAULT_MODE
+    if n_jobs == 1 or len(texts) < _MIN_PARALLEL_TEXTS:
+        normalizer = get_normalizer(emoji_dict, teen_dict, wrong_lst, stopwords, mode)
+        return [normalizer(text) for text in texts]
+    if mode == 'fast':
+        # Dựng bảng một lần ở process cha thay vì để mỗi worker tự dựng
+        from fast_pos import load_fast_tagger
+        load_fast_tagger()
+
+    if chunksize is None:
+        chunksize = min(512, max(16, -(-len(texts) // (n_jobs * 4))))
+    chunks = [texts[i:i + chunksize] for i in range(0, len(texts), chunksize)]
+    executor = _get_executor((emoji_dict, teen_dict, wrong_lst, stopwords), mode, n_jobs)
+    try:
+        # executor.map giữ nguyên thứ tự các chunk; thời gian từng bước trong worker
+        # không được thu về, chỉ đo tổng thời gian của cả lô
+        with metrics.timer('preprocess_batch.parallel'):
+            return [text for chunk in executor.map(_preprocess_chunk, chunks) for text in chunk]
+    except BrokenProcessPool:
+        shutdown_batch_pool()
+        raise
@@ -0,0 +1,125 @@
+import bisect
+import re
+import unicodedata
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r'\w+')
+_MAX_PREFIX_EXPANSIONS = 64
+_PREFIX_WEIGHT = 0.7
+_TRIGRAM_WEIGHT = 0.5
+_MIN_TRIGRAM_OVERLAP = 0.5
+
+
+# Bỏ dấu tiếng Việt: 'kem chống nắng' -> 'kem chong nang'
+def fold(text):
+    text = unicodedata.normalize('NFD', text.lower().replace('đ', 'd'))
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    return _TOKEN_PATTERN.findall(fold(text))
+
+
+def trigrams(token):
+    padded = f' {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# Chỉ mục ngược trên tên sản phẩm đã bỏ dấu: token -> sản phẩm, trigram -> token.
+# Token cuối của truy vấn (hoặc token không có trong từ điển) được mở rộng theo
+# tiền tố; token gõ sai/thiếu được so theo trigram.
+class ProductSearchIndex:
+    def __init__(self, names):
+        self.size = len(names)
+        postings = {}
+        for doc, name in enumerate(names):
+            for token in set(tokenize(name if isinstance(name, str) else '')):
+                postings.setdefault(token, []).append(doc)
+        self.postings = {token: np.array(docs, dtype=np.int32) for token, docs in postings.items()}
+        self.vocabulary = sorted(self.postings)
+        self.idf = {token: np.log(1 + self.size / len(docs)) for token, docs in self.postings.items()}
+        self.trigram_tokens = {}
+        for token in self.vocabulary:
+            for trigram in trigrams(token):
+                self.trigram_tokens.setdefault(trigram, []).append(token)
+
+    def _prefix_tokens(self, prefix):
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        stop = bisect.bisect_left(self.vocabulary, prefix + '￿', lo=start)
+        return self.vocabulary[start:min(stop, start + _MAX_PREFIX_EXPANSIONS)]
+
+    def _similar_tokens(self, token):
+        query_trigrams = trigrams(token)
+        counts = {}
+        for trigram in query_trigrams:
+            for candidate in self.trigram_tokens.get(trigram, ()):
+                counts[candidate] = counts.get(candidate, 0) + 1
+        similar = []
+        for candidate, shared in counts.items():
+            overlap = shared / len(query_trigrams | trigrams(candidate))
+            if overlap >= _MIN_TRIGRAM_OVERLAP:
+                similar.append((candidate, overlap))
+        return similar
+
+    # Các token trong từ điển khớp với một token truy vấn, kèm trọng số
+    def _matches(self, token, is_last):
+        matches = []
+        if token in self.postings:
+            matches.append((token, 1.0))
+        if is_last or not matches:
+            matches.extend((candidate, _PREFIX_WEIGHT) for candidate in self._prefix_tokens(token) if candidate != token)
+        if not matches:
+            matches.extend((candidate, _TRIGRAM_WEIGHT * overlap) for candidate, overlap in self._similar_tokens(token))
+        return matches
+
+    # Điểm của một token truy vấn trên các sản phẩm chứa token khớp (lấy trọng số lớn nhất)
+    def _token_scores(self, token, is_last):
+        matches = self._matches(token, is_last)
+        if not matches:
+            return None, None
+        if len(matches) == 1:
+            candidate, weight = matches[0]
+            docs = self.postings[candidate]
+            return docs, np.full(len(docs), weight * self.idf[candidate])
+        docs = np.concatenate([self.postings[candidate] for candidate, _ in matches])
+        weights = np.concatenate([np.full(len(self.postings[candidate]), weight * self.idf[candidate]) for candidate, weight in matches])
+        order = np.lexsort((-weights, docs))
+        docs, first = np.unique(docs[order], return_index=True)
+        return docs, weights[order][first]
+
+    # Trả về vị trí (theo thứ tự names) của tối đa k sản phẩm, xếp theo số token
+    # truy vấn khớp rồi tới điểm idf. Chi phí tỉ lệ với số sản phẩm khớp,
+    # không phụ thuộc kích thước danh mục.
+    def search(self, query, k=50):
+        query_tokens = list(dict.fromkeys(tokenize(query)))
+        all_docs, all_scores = [], []
+        for i, token in enumerate(query_tokens):
+            docs, scores = self._token_scores(token, i == len(query_tokens) - 1)
+            if docs is not None:
+                all_docs.append(docs)
+                all_scores.append(scores)
+        if not all_docs:
+            return []
+
+        docs, inverse = np.unique(np.concatenate(all_docs), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+        matched = np.bincount(inverse)
+        ranking = matched * (scores.max() + 1) + scores
+        if len(docs) > k:
+            top = np.argpartition(-ranking, k - 1)[:k]
+            docs, ranking = docs[top], ranking[top]
+        order = np.lexsort((docs, -ranking))
+        return docs[order].tolist()
+
+
+_indexes = {}
+
+
+# Mỗi bộ dữ liệu sản phẩm (load_product_data) chỉ dựng chỉ mục một lần
+def get_search_index(product_data):
+    key = id(product_data)
+    if key not in _indexes:
+        _indexes.clear()
+        _indexes[key] = (product_data, ProductSearchIndex(product_data.products['ten_san_pham'].tolist()))
+    return _indexes[key][1]
@@ -0,0 +1,182 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+from model_registry import resident_bytes, get_model
+
+MIN_CHUNKSIZE = 100
+
+
+# Đọc file theo từng khối: CSV qua pandas (chọn cột), TXT mỗi dòng một review.
+# Khối kế tiếp có thể nhỏ hơn nếu vượt giới hạn bộ nhớ.
+class ChunkReader:
+    def __init__(self, path, column, keep_columns, skip_rows):
+        self.is_text = path.lower().endswith('.txt')
+        self.column = column
+        if self.is_text:
+            self._file = open(path, encoding='utf8')
+            for _ in range(skip_rows):
+                self._file.readline()
+        else:
+            self._reader = pd.read_csv(
+                path,
+                usecols=[column] + keep_columns,
+                skiprows=range(1, skip_rows + 1),
+                iterator=True,
+                dtype={column: str},
+                keep_default_na=False,
+            )
+
+    def read(self, size):
+        if self.is_text:
+            lines = []
+            for line in self._file:
+                lines.append(line.rstrip('\r\n'))
+                if len(lines) == size:
+                    break
+            return pd.DataFrame({self.column: lines}) if lines else None
+        try:
+            return self._reader.get_chunk(size)
+        except StopIteration:
+            return None
+
+    def close(self):
+        (self._file if self.is_text else self._reader).close()
+
+
+# Ghi kết quả: CSV nối thêm vào một file, Parquet thành từng part trong một thư mục
+class ResultWriter:
+    def __init__(self, path, resume_size):
+        self.path = path
+        self.is_parquet = path.lower().endswith('.parquet')
+        if self.is_parquet:
+            os.makedirs(path, exist_ok=True)
+        elif resume_size is not None and os.path.exists(path):
+            # Bỏ phần ghi dở của khối chưa kịp checkpoint
+            with open(path, 'r+b') as file:
+                file.truncate(resume_size)
+
+    def write(self, df, chunk_index):
+        if self.is_parquet:
+            df.to_parquet(os.path.join(self.path, f'part-{chunk_index:05d}.parquet'), index=False)
+            return None
+        header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        df.to_csv(self.path, mode='a', header=header, index=False)
+        return os.path.getsize(self.path)
+
+
+def _load_checkpoint(path, source):
+    try:
+        with open(path, encoding='utf8') as file:
+            checkpoint = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return checkpoint if checkpoint.get('source') == source else None
+
+
+def _save_checkpoint(path, checkpoint):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf8') as file:
+        json.dump(checkpoint, file)
+    os.replace(tmp_path, path)
+
+
+def score_file(input_path, output_path, column='noi_dung_binh_luan', keep_columns=(), chunksize=5000,
+               max_memory_mb=None, n_jobs=None, resume=True, log=sys.stderr):
+    from lexicon import load_lexicon
+    from preprocess_cache import cached_preprocess_batch
+
+    keep_columns = [name for name in keep_columns if name != column]
+    stat = os.stat(input_path)
+    source = {'path': os.path.abspath(input_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'column': column}
+    checkpoint_path = f'{output_path}.checkpoint.json'
+    checkpoint = _load_checkpoint(checkpoint_path, source) if resume else None
+    if checkpoint is None:
+        checkpoint = {'source': source, 'rows': 0, 'chunks': 0, 'output_size': 0}
+        if os.path.isfile(output_path):
+            os.remove(output_path)
+        elif os.path.isdir(output_path):
+            for name in os.listdir(output_path):
+                if name.startswith('part-') and name.endswith('.parquet'):
+                    os.remove(os.path.join(output_path, name))
+    elif checkpoint.get('done'):
+        print(f'{output_path} is already complete ({checkpoint["rows"]:,} rows)', file=log)
+        return checkpoint
+    else:
+        print(f'Resuming after {checkpoint["rows"]:,} rows', file=log)
+
+    lexicon = load_lexicon()
+    model = get_model()
+    reader = ChunkReader(input_path, column, list(keep_columns), checkpoint['rows'])
+    writer = ResultWriter(output_path, checkpoint['output_size'])
+    max_memory = max_memory_mb * 1024 * 1024 if max_memory_mb else None
+    start_rows = checkpoint['rows']
+    start = time.perf_counter()
+    try:
+        while True:
+            chunk = reader.read(chunksize)
+            if chunk is None or len(chunk) == 0:
+                break
+            texts = chunk[column].tolist()
+            processed = cached_preprocess_batch(texts, lexicon, n_jobs=n_jobs)
+            result = pd.DataFrame({'row': range(checkpoint['rows'], checkpoint['rows'] + len(chunk))})
+            for name in keep_columns:
+                result[name] = chunk[name].to_numpy()
+            result[column] = texts
+            result['prediction'] = model.predict(processed)
+            result['model_version'] = model.version
+
+            output_size = writer.write(result, checkpoint['chunks'])
+            checkpoint['rows'] += len(chunk)
+            checkpoint['chunks'] += 1
+            checkpoint['output_size'] = output_size
+            _save_checkpoint(checkpoint_path, checkpoint)
+
+            elapsed = time.perf_counter() - start
+            resident = resident_bytes()
+            print(f'{checkpoint["rows"]:,} rows | {(checkpoint["rows"] - start_rows) / elapsed:,.0f} rows/s'
+                  + (f' | RSS {resident / 2**20:,.0f} MB' if resident else ''), file=log, flush=True)
+            # Giảm kích thước khối khi vượt giới hạn bộ nhớ
+            if max_memory and resident and resident > max_memory and chunksize > MIN_CHUNKSIZE:
+                chunksize = max(MIN_CHUNKSIZE, chunksize // 2)
+                print(f'Memory above {max_memory_mb} MB, chunk size -> {chunksize}', file=log)
+    finally:
+        reader.close()
+
+    checkpoint['done'] = True
+    checkpoint['seconds'] = time.perf_counter() - start
+    _save_checkpoint(checkpoint_path, checkpoint)
+    return checkpoint
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score a CSV/TXT of reviews with the sentiment model')
+    parser.add_argument('input', help='CSV file (use --column) or TXT file with one review per line')
+    parser.add_argument('output', help='output .csv file or .parquet directory')
+    parser.add_argument('--column', default='noi_dung_binh_luan', help='CSV column holding the review text')
+    parser.add_argument('--keep', default='', help='comma-separated input columns copied to the output, e.g. id,ma_san_pham')
+    parser.add_argument('--chunksize', type=int, default=5000)
+    parser.add_argument('--max-memory-mb', type=int, default=None, help='shrink chunks when RSS goes above this')
+    parser.add_argument('--n-jobs', type=int, default=None, help='preprocessing processes (default: all cores)')
+    parser.add_argument('--restart', action='store_true', help='ignore an existing checkpoint and start over')
+    args = parser.parse_args()
+
+    result = score_file(
+        args.input,
+        args.output,
+        column=args.column,
+        keep_columns=[name for name in args.keep.split(',') if name],
+        chunksize=args.chunksize,
+        max_memory_mb=args.max_memory_mb,
+        n_jobs=args.n_jobs,
+        resume=not args.restart,
+    )
+    print(f'Done: {result["rows"]:,} rows -> {args.output}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+import metrics
+from artifacts import cache_path, file_signature, load_artifact, save_artifact
+from data_store import PRODUCTS_FILE, RATINGS_FILE, CLEAN_RATINGS_FILE
+
+TEXT_COLUMN = 'noi_dung_binh_luan'
+TOKEN_PATTERN = r'(?u)\b\w\w+\b'
+# Token có trong quá nhiều văn bản không dùng để chọn ứng viên (chỉ dùng khi chấm lại điểm)
+MAX_POSTING_FRACTION = 0.05
+MAX_CANDIDATES = 5000
+
+# Tăng khi đổi cách dựng chỉ mục hoặc cấu trúc thư mục chỉ mục
+SIMILAR_FORMAT = 1
+
+
+# Chỉ mục review tương tự trên văn bản đã làm sạch của data_clean_2.csv. Các review trùng
+# nội dung gộp thành một văn bản; mỗi văn bản là một hàng TF-IDF (l2) trong ma trận CSR,
+# ma trận CSC cùng dữ liệu là chỉ mục ngược (token -> văn bản). Các mảng lưu dạng .npy
+# và được memory-map nên mọi process dùng chung page cache. Chỉ data_clean_2.csv là
+# bắt buộc: nội dung gốc, số sao và sản phẩm được nối vào khi có file đánh giá/sản phẩm.
+def build_index(directory, files=None):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    files = _source_files() if files is None else files
+    clean = pd.read_csv(CLEAN_RATINGS_FILE, usecols=['id', TEXT_COLUMN, 'sentiment'], dtype={TEXT_COLUMN: str}, keep_default_na=False)
+    reviews = clean[clean[TEXT_COLUMN].str.strip() != '']
+    if RATINGS_FILE in files:
+        ratings = pd.read_csv(RATINGS_FILE, usecols=['id', TEXT_COLUMN, 'so_sao', 'ma_san_pham']).rename(columns={TEXT_COLUMN: 'original'})
+        reviews = reviews.merge(ratings.drop_duplicates('id'), on='id', how='left')
+    else:
+        reviews = reviews.assign(original=None, so_sao=0, ma_san_pham=-1)
+    if PRODUCTS_FILE in files:
+        products = pd.read_csv(PRODUCTS_FILE, usecols=['ma_san_pham', 'ten_san_pham'])
+        reviews = reviews.merge(products.drop_duplicates('ma_san_pham'), on='ma_san_pham', how='left')
+    else:
+        reviews = reviews.assign(ten_san_pham=None)
+    reviews['original'] = reviews['original'].fillna(reviews[TEXT_COLUMN]).astype(str)
+
+    # Văn bản theo thứ tự xuất hiện đầu tiên; review sắp theo văn bản để mỗi văn bản là một đoạn liền
+    codes, texts = pd.factorize(reviews[TEXT_COLUMN])
+    order = np.argsort(codes, kind='stable')
+    reviews = reviews.iloc[order].reset_index(drop=True)
+    review_offsets = np.r_[0, np.cumsum(np.bincount(codes, minlength=len(texts)))].astype(np.int64)
+
+    vectorizer = TfidfVectorizer(token_pattern=TOKEN_PATTERN, sublinear_tf=True)
+    matrix = vectorizer.fit_transform(texts).astype(np.float32).tocsr()
+    matrix.sort_indices()
+    postings = matrix.tocsc()
+    postings.sort_indices()
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+
+    os.makedirs(directory, exist_ok=True)
+    arrays = {
+        'idf': vectorizer.idf_.astype(np.float32),
+        'doc_data': matrix.data, 'doc_indices': matrix.indices.astype(np.int32), 'doc_indptr': matrix.indptr.astype(np.int64),
+        'term_data': postings.data, 'term_indices': postings.indices.astype(np.int32), 'term_indptr': postings.indptr.astype(np.int64),
+        'review_offsets': review_offsets,
+        'review_ids': reviews['id'].to_numpy(np.int64),
+        'review_products': reviews['ma_san_pham'].fillna(-1).to_numpy(np.int64),
+        'review_stars': reviews['so_sao'].fillna(0).to_numpy(np.int8),
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f'{name}.npy'), array)
+    with open(os.path.join(directory, 'terms.txt'), 'w', encoding='utf8') as file:
+        file.write('\n'.join(terms))
+    # Các cột chuỗi (nội dung, tên sản phẩm, cảm xúc) theo thứ tự review
+    save_artifact(os.path.join(directory, 'reviews.pkl'), SIMILAR_FORMAT, {
+        'texts': list(texts),
+        'original': reviews['original'].tolist(),
+        'product_names': reviews['ten_san_pham'].fillna('').tolist(),
+        'sentiments': reviews['sentiment'].tolist(),
+    })
+    with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf8') as file:
+        json.dump({'format': SIMILAR_FORMAT, 'documents': len(texts), 'reviews': len(reviews), 'terms': len(terms)}, file)
+
+
+class SimilarReviews:
+    def __init__(self, directory):
+        with open(os.path.join(directory, 'meta.json'), encoding='utf8') as file:
+            self.meta = json.load(file)
+
+        def load(name):
+            return np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r')
+
+        with open(os.path.join(directory, 'terms.txt'), encoding='utf8') as file:
+            self.vocabulary = {term: index for index, term in enumerate(file.read().split('\n'))}
+        shape = (self.meta['documents'], len(self.vocabulary))
+        self.idf = load('idf')
+        self.documents = sp.csr_matrix((load('doc_data'), load('doc_indices'), load('doc_indptr')), shape=shape)
+        self.postings = sp.csc_matrix((load('term_data'), load('term_indices'), load('term_indptr')), shape=shape)
+        self.review_offsets = load('review_offsets')
+        self.review_ids = load('review_ids')
+        self.review_products = load('review_products')
+        self.review_stars = load('review_stars')
+        columns = load_artifact(os.path.join(directory, 'reviews.pkl'), SIMILAR_FORMAT)
+        self.texts = columns['texts']
+        self.original = columns['original']
+        self.product_names = columns['product_names']
+        self.sentiments = columns['sentiments']
+        self._review_rows = None
+        self._token_pattern = re.compile(TOKEN_PATTERN)
+        self._max_postings = max(1, int(MAX_POSTING_FRACTION * self.meta['documents']))
+
+    # Hàng review theo id (dựng khi cần lần đầu)
+    def review_row(self, review_id):
+        if self._review_rows is None:
+            self._review_rows = {int(review_id): row for row, review_id in enumerate(self.review_ids)}
+        return self._review_rows.get(int(review_id))
+
+    # Vector TF-IDF (sublinear tf, l2) của một văn bản đã làm sạch, như TfidfVectorizer.transform
+    def vectorize(self, text):
+        counts = {}
+        for token in self._token_pattern.findall(text.lower()):
+            index = self.vocabulary.get(token)
+            if index is not None:
+                counts[index] = counts.get(index, 0) + 1
+        indices = np.fromiter(counts, dtype=np.int32, count=len(counts))
+        weights = (1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))) * self.idf[indices]
+        norm = np.sqrt(np.dot(weights, weights))
+        return indices, weights / norm if norm else weights
+
+    # Ứng viên lấy từ danh sách văn bản của các token hiếm (idf cao); token phổ biến chỉ
+    # dùng khi văn bản không có token nào khác. Điểm cosine được tính lại đầy đủ trên ứng viên.
+    def _candidates(self, indices):
+        lengths = self.postings.indptr[indices + 1] - self.postings.indptr[indices]
+        selective = indices[lengths <= self._max_postings]
+        chosen = selective if len(selective) else indices[np.argsort(lengths)[:1]]
+        candidates = np.unique(np.concatenate(
+            [self.postings.indices[self.postings.indptr[i]:self.postings.indptr[i + 1]] for i in chosen]))
+        if len(candidates) > MAX_CANDIDATES:
+            # Giữ các văn bản khớp nhiều trọng số nhất theo các token đã chọn
+            partial = self.postings[:, chosen][candidates] @ np.ones(len(chosen), dtype=np.float32)
+            candidates = candidates[np.argpartition(-partial, MAX_CANDIDATES)[:MAX_CANDIDATES]]
+        return candidates
+
+    def _search(self, indices, weights, k, exclude_document=None):
+        if len(indices) == 0:
+            return []
+        candidates = self._candidates(indices)
+        query = np.zeros(self.documents.shape[1], dtype=np.float32)
+        query[indices] = weights
+        scores = self.documents[candidates] @ query
+        if exclude_document is not None:
+            scores[candidates == exclude_document] = -1
+        top = np.argsort(-scores, kind='stable')[:k]
+        return [(int(candidates[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+    # Một dòng kết quả cho mỗi văn bản: review đại diện (bỏ qua review đang xem) và số review cùng nội dung
+    def _results(self, matches, exclude_row=None):
+        results = []
+        for document, score in matches:
+            rows = [row for row in range(self.review_offsets[document], self.review_offsets[document + 1]) if row != exclude_row]
+            if not rows:
+                continue
+            row = rows[0]
+            results.append({
+                'score': score,
+                'review_id': int(self.review_ids[row]),
+                'ma_san_pham': int(self.review_products[row]),
+                'ten_san_pham': self.product_names[row],
+                'so_sao': int(self.review_stars[row]),
+                'sentiment': self.sentiments[row],
+                'noi_dung_binh_luan': self.original[row],
+                'matching_reviews': len(rows),
+            })
+        return results
+
+    # Top-k review tương tự một văn bản đã làm sạch (vd: kết quả preprocess của văn bản nhập mới)
+    def similar_to_text(self, text, k=10):
+        with metrics.timer('similar_reviews.query'):
+            indices, weights = self.vectorize(text)
+            return self._results(self._search(indices, weights, k))
+
+    # Top-k review tương tự một review có sẵn (theo id), không gồm chính review đó
+    def similar_to_review(self, review_id, k=10):
+        row = self.review_row(review_id)
+        if row is None:
+            return None
+        with metrics.timer('similar_reviews.query'):
+            document = int(np.searchsorted(self.review_offsets, row, side='right') - 1)
+            start, stop = self.documents.indptr[document], self.documents.indptr[document + 1]
+            indices = np.asarray(self.documents.indices[start:stop])
+            weights = np.asarray(self.documents.data[start:stop])
+            # Văn bản giống hệt (các review trùng nội dung) vẫn được trả về, trừ review đang xem
+            matches = self._search(indices, weights, k + 1)
+            return self._results(matches, exclude_row=row)[:k]
+
+
+# data_clean_2.csv cùng các file đánh giá/sản phẩm đang có (thêm file thì chỉ mục được dựng lại)
+def _source_files():
+    return (CLEAN_RATINGS_FILE,) + tuple(path for path in (RATINGS_FILE, PRODUCTS_FILE) if os.path.exists(path))
+
+
+def _signature(files):
+    return (SIMILAR_FORMAT, file_signature(files))
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+# Dùng chung cho mọi phiên; dựng lại (vào thư mục mới theo phiên bản dữ liệu) khi một file CSV
+# thay đổi. FileNotFoundError nếu không có data_clean_2.csv
+def load_index(log=sys.stderr):
+    global _index, _index_version
+    files = _source_files()
+    signature = _signature(files)
+    version = hashlib.sha1(repr(signature).encode('utf8')).hexdigest()[:12]
+    with _index_lock:
+        if _index is None or _index_version != version:
+            directory = cache_path(os.path.join('similar_reviews', version))
+            if not os.path.exists(os.path.join(directory, 'meta.json')):
+                print('Building the similar-reviews index...', file=log, flush=True)
+                tmp_directory = f'{directory}.{os.getpid()}.tmp'
+                shutil.rmtree(tmp_directory, ignore_errors=True)
+                build_index(tmp_directory, files)
+                shutil.rmtree(directory, ignore_errors=True)
+                os.replace(tmp_directory, directory)
+            _index = SimilarReviews(directory)
+            _index_version = version
+        return _index
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the similar-reviews index and query it')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('build', help='(re)build the index in the cache directory')
+    query = commands.add_parser('query', help='reviews similar to a text or to an existing review')
+    query.add_argument('text', nargs='?', default=None, help='raw review text (preprocessed before searching)')
+    query.add_argument('--review-id', type=int, default=None)
+    query.add_argument('-k', type=int, default=10)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = load_index()
+    print(f'{index.meta["documents"]:,} distinct texts, {index.meta["reviews"]:,} reviews, '
+          f'{index.meta["terms"]:,} terms (loaded in {time.perf_counter() - start:.2f}s)', file=sys.stderr)
+    if args.command == 'build':
+        return
+    if args.review_id is not None:
+        results = index.similar_to_review(args.review_id, args.k)
+        if results is None:
+            parser.error(f'review {args.review_id} is not in the index')
+    elif args.text:
+        from lexicon import load_lexicon
+        from preprocess_cache import cached_preprocess
+
+        results = index.similar_to_text(cached_preprocess(args.text, load_lexicon()), args.k)
+    else:
+        parser.error('give a text or --review-id')
+    with pd.option_context('display.width', 200, 'display.max_colwidth', 80):
+        print(pd.DataFrame(results).to_string(index=False) if results else 'No similar reviews')
+
+
+if __name__ == '__main__':
+    main()
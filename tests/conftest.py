@@ -0,0 +1,24 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Các module đọc HASAKI_CACHE_DIR khi import: test không đụng tới .cache/ của repo
+os.environ['HASAKI_CACHE_DIR'] = tempfile.mkdtemp(prefix='hasaki-test-cache-')
+os.environ['HASAKI_PREDICTION_HISTORY'] = '0'
+
+
+# Các file dữ liệu (từ điển, mô hình, CSV) được mở theo đường dẫn tương đối từ thư mục repo
+@pytest.fixture(autouse=True)
+def repo_dir(monkeypatch):
+    monkeypatch.chdir(ROOT)
+
+
+def require_files(*names):
+    missing = [name for name in names if not os.path.exists(os.path.join(ROOT, name))]
+    if missing:
+        pytest.skip(f'missing data files: {", ".join(missing)}')
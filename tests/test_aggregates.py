@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+
+from aggregates import RatingAggregates
+from conftest import require_files
+from data_store import CLEAN_RATINGS_FILE, RATINGS_FILE
+
+
+def _synthetic_ratings(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    days = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 60, rows), unit='D')
+    return pd.DataFrame({
+        'id': np.arange(rows),
+        'ma_khach_hang': rng.integers(1, 500, rows),
+        'noi_dung_binh_luan': rng.choice(['tốt, "rất" thích', 'kém\nkhông mua', 'bình thường'], rows),
+        'ngay_binh_luan': days.strftime('%d/%m/%Y').where(rng.random(rows) > 0.02, 'không rõ'),
+        'so_sao': rng.integers(1, 6, rows),
+        'ma_san_pham': rng.integers(1, 40, rows),
+    })
+
+
+# Nhãn sentiment cho khoảng 2/3 số id, lệch với số sao để phân biệt hai cách đếm
+def _synthetic_sentiments(ratings, path, seed=1):
+    rng = np.random.default_rng(seed)
+    labelled = ratings[rng.random(len(ratings)) < 0.66]
+    pd.DataFrame({'noi_dung_binh_luan': 'tốt', 'id': labelled['id'],
+                  'sentiment': rng.choice(['Positive', 'Negative'], len(labelled))}).to_csv(path, index=False)
+    return path
+
+
+def _sorted(daily):
+    return daily.sort_index()
+
+
+def _check_refresh_equals_rebuild(ratings, path, sentiments_path):
+    head, tail = ratings.iloc[:len(ratings) // 2], ratings.iloc[len(ratings) // 2:]
+    head.to_csv(path, index=False)
+    aggregates = RatingAggregates.build(path, sentiments_path)
+    tail.to_csv(path, mode='a', header=False, index=False)
+
+    assert aggregates.refresh(path, sentiments_path) == len(tail)
+    rebuilt = RatingAggregates.build(path, sentiments_path)
+    assert aggregates.rows == rebuilt.rows
+    assert aggregates.offset == rebuilt.offset
+    assert aggregates.is_current(path, sentiments_path)
+    pdt.assert_frame_equal(_sorted(aggregates.daily), _sorted(rebuilt.daily))
+
+
+def test_refresh_equals_rebuild(tmp_path):
+    ratings = _synthetic_ratings(2000)
+    sentiments_path = _synthetic_sentiments(ratings, tmp_path / 'clean.csv')
+    _check_refresh_equals_rebuild(ratings, tmp_path / 'ratings.csv', sentiments_path)
+
+
+def test_refresh_equals_rebuild_on_real_ratings(tmp_path):
+    require_files(RATINGS_FILE, CLEAN_RATINGS_FILE)
+    _check_refresh_equals_rebuild(pd.read_csv(RATINGS_FILE, nrows=20_000), tmp_path / 'ratings.csv', CLEAN_RATINGS_FILE)
+
+
+def test_product_counts_follow_the_sentiment_column(tmp_path):
+    ratings = _synthetic_ratings(1000)
+    ratings.to_csv(tmp_path / 'ratings.csv', index=False)
+    sentiments_path = _synthetic_sentiments(ratings, tmp_path / 'clean.csv')
+    aggregates = RatingAggregates.build(tmp_path / 'ratings.csv', sentiments_path)
+
+    # Như trang sản phẩm gốc: nối đánh giá với data_clean_2.csv theo id, đếm cột sentiment
+    labelled = ratings.merge(pd.read_csv(sentiments_path), on='id', how='left')
+    for ma_sp in (1, 7, 39):
+        product = labelled[labelled['ma_san_pham'] == ma_sp]
+        summary = aggregates.product(ma_sp)
+        counts = product['sentiment'].value_counts()
+        assert summary['positive'] == counts.get('Positive', 0)
+        assert summary['negative'] == counts.get('Negative', 0)
+        assert summary['reviews'] == len(product)
+    assert aggregates.product(10_000)['reviews'] == 0
+
+
+def test_refresh_without_new_rows(tmp_path):
+    path = tmp_path / 'ratings.csv'
+    ratings = _synthetic_ratings(100)
+    ratings.to_csv(path, index=False)
+    sentiments_path = _synthetic_sentiments(ratings, tmp_path / 'clean.csv')
+    aggregates = RatingAggregates.build(path, sentiments_path)
+    assert aggregates.refresh(path, sentiments_path) == 0
+
+
+def test_refresh_detects_rewritten_file(tmp_path):
+    path = tmp_path / 'ratings.csv'
+    ratings = _synthetic_ratings(500)
+    ratings.to_csv(path, index=False)
+    sentiments_path = _synthetic_sentiments(ratings, tmp_path / 'clean.csv')
+    aggregates = RatingAggregates.build(path, sentiments_path)
+    # Cùng kích thước nhưng phần đã đọc bị sửa: phải tính lại toàn bộ
+    ratings.assign(so_sao=6 - ratings['so_sao']).to_csv(path, index=False)
+    assert aggregates.refresh(path, sentiments_path) is None
+    # File ngắn đi
+    ratings.iloc[:100].to_csv(path, index=False)
+    assert aggregates.refresh(path, sentiments_path) is None
+
+
+def test_refresh_detects_relabelled_sentiments(tmp_path):
+    path = tmp_path / 'ratings.csv'
+    ratings = _synthetic_ratings(200)
+    ratings.to_csv(path, index=False)
+    sentiments_path = _synthetic_sentiments(ratings, tmp_path / 'clean.csv')
+    aggregates = RatingAggregates.build(path, sentiments_path)
+    _synthetic_sentiments(ratings, sentiments_path, seed=2)
+    assert not aggregates.is_current(path, sentiments_path)
+    assert aggregates.refresh(path, sentiments_path) is None
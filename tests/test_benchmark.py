@@ -0,0 +1,45 @@
+import json
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('underthesea')
+
+import benchmark  # noqa: E402
+from conftest import ROOT  # noqa: E402
+
+
+def _results(**medians):
+    return {'results': {name: {'items': 10, 'median': median} for name, median in medians.items()}}
+
+
+def test_compare_flags_slowdowns_above_the_threshold():
+    rows = benchmark.compare(_results(a=1.05, b=1.2, c=0.5), _results(a=1.0, b=1.0, c=1.0), threshold=0.1)
+    assert {row['name']: row['regression'] for row in rows} == {'a': False, 'b': True, 'c': False}
+
+
+def test_compare_skips_measurements_without_a_comparable_baseline():
+    baseline = _results(a=1.0)
+    baseline['results']['a']['items'] = 20
+    assert benchmark.compare(_results(a=2.0, new=1.0), baseline) == []
+
+
+def test_texts_of_length():
+    # Ghép các review liên tiếp (quay vòng) cho tới khi đủ độ dài, cắt phần thừa
+    assert benchmark.texts_of_length(['abc', 'de', 'fgh'], 5, 2) == ['abc d', 'fgh a']
+
+
+def test_measure_counts_items():
+    result = benchmark.measure(lambda items: sum(items), list(range(100)), repeat=3)
+    assert result['items'] == 100
+    assert result['min'] <= result['median']
+
+
+def test_results_go_to_the_cache_directory_by_default(monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['benchmark.py', '--repeat', '1'])
+    monkeypatch.setattr(benchmark, 'run_benchmarks', lambda repeat, limit: {'results': {}})
+    benchmark.main()
+    with open(benchmark.cache_path('benchmark.json'), encoding='utf8') as file:
+        assert json.load(file) == {'results': {}}
+    assert not os.path.exists(os.path.join(ROOT, 'benchmark.json'))
@@ -0,0 +1,107 @@
+import re
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.svm import SVC, LinearSVC
+
+from compiled_model import CompiledModel, compile_pipeline, format_terms
+from conftest import require_files
+from data_store import CLEAN_RATINGS_FILE
+from model_registry import MODEL_FILE
+
+
+@pytest.fixture(scope='module')
+def reviews():
+    require_files(CLEAN_RATINGS_FILE)
+    data = pd.read_csv(CLEAN_RATINGS_FILE, dtype={'noi_dung_binh_luan': str}, keep_default_na=False)
+    return data['noi_dung_binh_luan'].tolist(), data['sentiment'].tolist()
+
+
+def _compiled(pipeline, tmp_path):
+    directory = str(tmp_path / 'compiled')
+    compile_pipeline(pipeline, directory)
+    return CompiledModel(directory)
+
+
+def _assert_same_predictions(pipeline, model, texts):
+    labels, scores = model.predict_with_scores(texts)
+    assert list(labels) == list(pipeline.predict(texts))
+    np.testing.assert_allclose(scores, pipeline.decision_function(texts), rtol=1e-6, atol=1e-6)
+
+
+def test_shipped_model_matches_joblib(reviews, tmp_path):
+    require_files(MODEL_FILE)
+    pipeline = joblib.load(MODEL_FILE)
+    texts = reviews[0][:3000] + ['', 'từ_lạ không_có_trong_từ_điển']
+    _assert_same_predictions(pipeline, _compiled(pipeline, tmp_path), texts)
+
+
+@pytest.mark.parametrize('classifier', [LinearSVC(), LogisticRegression(max_iter=1000), SVC(kernel='linear'), SVC()],
+                         ids=['linear_svc', 'logistic_regression', 'svc_linear', 'svc_rbf'])
+def test_linear_and_rbf_pipelines_match(classifier, reviews, tmp_path):
+    texts, labels = reviews[0][:1500], reviews[1][:1500]
+    pipeline = Pipeline([('tfidf', TfidfVectorizer(max_features=2000)), ('classifier', classifier)]).fit(texts, labels)
+    _assert_same_predictions(pipeline, _compiled(pipeline, tmp_path), reviews[0][1500:2500])
+
+
+@pytest.mark.parametrize('pipeline', [
+    Pipeline([('tfidf', TfidfVectorizer()), ('classifier', RandomForestClassifier(n_estimators=5))]),
+    Pipeline([('tfidf', TfidfVectorizer(binary=True)), ('classifier', LinearSVC())]),
+    Pipeline([('tfidf', TfidfVectorizer(strip_accents='unicode')), ('classifier', LinearSVC())]),
+    Pipeline([('tfidf', TfidfVectorizer()), ('classifier', SVC(kernel='poly'))]),
+], ids=['random_forest', 'binary', 'strip_accents', 'poly_kernel'])
+def test_unsupported_pipelines_are_rejected(pipeline, reviews, tmp_path):
+    pipeline.fit(reviews[0][:300], reviews[1][:300])
+    with pytest.raises(ValueError):
+        compile_pipeline(pipeline, str(tmp_path / 'compiled'))
+
+
+# Tuyến tính: tổng đóng góp + intercept đúng bằng điểm; các token được giải thích theo đúng hướng
+def test_linear_explain_sums_to_the_score(reviews, tmp_path):
+    texts, labels = reviews[0][:1500], reviews[1][:1500]
+    pipeline = Pipeline([('tfidf', TfidfVectorizer(max_features=2000)), ('classifier', LinearSVC())]).fit(texts, labels)
+    model = _compiled(pipeline, tmp_path)
+    batch = reviews[0][1500:1800] + ['']
+    contributions, scores = model.contributions(batch)
+    np.testing.assert_allclose(np.asarray(contributions.sum(axis=1)).ravel() + model.intercept, scores, atol=1e-9)
+
+    predicted, explained_scores, positive, negative = model.explain(batch, top=3)
+    assert list(predicted) == list(pipeline.predict(batch))
+    np.testing.assert_allclose(explained_scores, pipeline.decision_function(batch), atol=1e-6)
+    assert positive[-1] == negative[-1] == []
+    for row, (towards_second, towards_first) in enumerate(zip(positive, negative)):
+        assert len(towards_second) <= 3 and len(towards_first) <= 3
+        assert all(value > 0 for _, value in towards_second) and all(value < 0 for _, value in towards_first)
+        assert [value for _, value in towards_second] == sorted((value for _, value in towards_second), reverse=True)
+        row_terms = set(re.findall(r'(?u)\b\w\w+\b', batch[row].lower()))
+        assert {term for term, _ in towards_second + towards_first} <= row_terms
+    assert format_terms([('kém', -0.291), ('chậm', -0.74)]) == 'kém (-0.29), chậm (-0.74)'
+
+
+# RBF: điểm trùng với SVC; văn bản một token thì token đó nhận cả điểm; đóng góp cùng dấu
+# với mức điểm giảm khi bỏ token đó khỏi văn bản (phần lớn các token)
+def test_rbf_explain_follows_token_removal(reviews, tmp_path):
+    texts, labels = reviews[0][:1500], reviews[1][:1500]
+    pipeline = Pipeline([('tfidf', TfidfVectorizer(max_features=2000)), ('classifier', SVC())]).fit(texts, labels)
+    model = _compiled(pipeline, tmp_path)
+    batch = [text for text in reviews[0][1500:1700] if len(set(text.split())) > 2]
+    contributions, scores = model.contributions(batch + ['tốt'])
+    np.testing.assert_allclose(scores, pipeline.decision_function(batch + ['tốt']), atol=1e-6)
+    assert contributions[len(batch)].data == pytest.approx([scores[-1]])
+
+    agree = total = 0
+    for row, text in enumerate(batch):
+        contribution = contributions[row]
+        for index, value in zip(contribution.indices, contribution.data):
+            term = model.terms[index]
+            removed = ' '.join(word for word in text.split() if word.lower() != term)
+            change = scores[row] - pipeline.decision_function([removed])[0]
+            agree += np.sign(change) == np.sign(value)
+            total += 1
+    assert agree / total > 0.8
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+import artifacts
+import data_store
+from data_store import CLEAN_RATINGS_FILE, PRODUCTS_FILE, RATINGS_FILE, load_product_data
+
+
+# Bộ dữ liệu nhỏ với đủ các trường hợp: sản phẩm không có đánh giá, đánh giá chưa được
+# làm sạch, đánh giá của mã sản phẩm không có trong San_pham_full.csv
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    products = pd.DataFrame({
+        'ma_san_pham': np.arange(100, 110),
+        'ten_san_pham': [f'Sản phẩm {i}' for i in range(10)],
+        'gia_ban': rng.integers(10_000, 500_000, 10),
+        'phan_loai': rng.choice(['Son', 'Kem Chống Nắng'], 10),
+        'diem_trung_binh': rng.uniform(1, 5, 10).round(1),
+    })
+    rows = 300
+    ratings = pd.DataFrame({
+        'id': np.arange(1, rows + 1),
+        'ma_khach_hang': rng.integers(1, 50, rows),
+        'noi_dung_binh_luan': rng.choice(['hàng tốt', 'không thích', 'giao chậm'], rows),
+        'ngay_binh_luan': '01/12/2024',
+        'so_sao': rng.integers(1, 6, rows),
+        # 109 không có đánh giá, 999 không có trong bảng sản phẩm
+        'ma_san_pham': rng.choice([*range(100, 109), 999], rows),
+    })
+    clean = ratings.sample(frac=0.7, random_state=0)[['id']].assign(
+        noi_dung_binh_luan='hàng tốt', sentiment=lambda df: np.where(df['id'] % 3, 'Positive', 'Negative'))
+    clean = clean[['noi_dung_binh_luan', 'id', 'sentiment']]
+    products.to_csv(tmp_path / PRODUCTS_FILE, index=False)
+    ratings.to_csv(tmp_path / RATINGS_FILE, index=False)
+    clean.to_csv(tmp_path / CLEAN_RATINGS_FILE, index=False)
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(artifacts, 'CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(data_store, '_product_data', None)
+    return tmp_path
+
+
+def _baseline(ma_sp):
+    # Cách trang Product Analysis gốc tính trên các DataFrame đầy đủ
+    products, ratings, clean = (pd.read_csv(name) for name in (PRODUCTS_FILE, RATINGS_FILE, CLEAN_RATINGS_FILE))
+    merged = pd.merge(products, ratings, on='ma_san_pham', how='left')
+    merged_2 = pd.merge(merged.drop(columns=['noi_dung_binh_luan']), clean, on='id', how='left')
+    return (merged[merged['ma_san_pham'] == ma_sp].reset_index(drop=True),
+            merged_2[merged_2['ma_san_pham'] == ma_sp].reset_index(drop=True))
+
+
+def _same_rows(actual, expected):
+    key = ['id'] if expected['id'].notna().any() else list(expected.columns)
+    pdt.assert_frame_equal(actual.sort_values(key).reset_index(drop=True),
+                           expected.sort_values(key).reset_index(drop=True), check_dtype=False)
+
+
+def test_product_slices_match_the_full_merges(data_dir):
+    data = load_product_data()
+    for ma_sp in (100, 105, 109, 999, 12345):
+        product_ratings, product_reviews = _baseline(ma_sp)
+        _same_rows(data.product_ratings(ma_sp), product_ratings)
+        _same_rows(data.product_reviews(ma_sp), product_reviews)
+    assert data.product(105)['ten_san_pham'] == 'Sản phẩm 5'
+    assert data.product(999) is None
+
+
+def test_data_is_reused_and_rebuilt_when_a_csv_changes(data_dir, monkeypatch):
+    builds = []
+    build_product_data = data_store.build_product_data
+    monkeypatch.setattr(data_store, 'build_product_data', lambda *args: builds.append(args) or build_product_data(*args))
+    data = load_product_data()
+    assert load_product_data() is data
+
+    # Process mới đọc lại file cột đã dựng, không đọc CSV
+    monkeypatch.setattr(data_store, '_product_data', None)
+    assert len(load_product_data().ratings(100)) == len(data.ratings(100))
+    assert len(builds) == 1
+
+    ratings = pd.read_csv(RATINGS_FILE)
+    extra = ratings.iloc[:5].assign(id=ratings['id'].max() + np.arange(1, 6), ma_san_pham=109)
+    pd.concat([ratings, extra]).to_csv(RATINGS_FILE, index=False)
+    assert len(load_product_data().ratings(109)) == 5
+    assert len(builds) == 2
@@ -0,0 +1,48 @@
+import pytest
+
+from conftest import require_files
+
+pytest.importorskip('underthesea')
+
+import fast_pos  # noqa: E402
+from fast_pos import DROPPED_TAG, FastTagger, build_tables  # noqa: E402
+from lexicon import LEXICON_FILES, load_lexicon  # noqa: E402
+from preprocessing import _POS_TAGS  # noqa: E402
+
+TEXTS = ['mặt_nạ dưỡng ẩm tốt', 'kem chống_nắng không_bết dính', 'son lên màu_chuẩn đẹp']
+
+
+@pytest.fixture(scope='module')
+def tagger():
+    require_files(*LEXICON_FILES)
+    return FastTagger(*build_tables(TEXTS, load_lexicon()), 'test')
+
+
+def test_compounds_come_from_segmented_text(tagger):
+    assert tagger.segment('mặt nạ chống nắng màu chuẩn'.split()) == ['mặt_nạ', 'chống_nắng', 'màu_chuẩn']
+    assert tagger.segment('mặt xinh'.split()) == ['mặt', 'xinh']
+
+
+def test_corpus_tokens_are_kept_and_stopwords_dropped(tagger):
+    lexicon = load_lexicon()
+    corpus_words = {word for text in TEXTS for word in text.split()}
+    stopword = next(word for word in sorted(lexicon.stopword_set) if word and word not in corpus_words)
+    assert tagger.tags[stopword] == DROPPED_TAG
+    for text in TEXTS:
+        for word in text.split():
+            assert tagger.tags[word].upper() in _POS_TAGS
+
+
+def test_known_sentences_skip_the_crf(tagger):
+    assert tagger.postag_words('mặt nạ dưỡng ẩm tốt') == ['mặt_nạ', 'dưỡng', 'ẩm', 'tốt']
+    assert tagger.fallbacks == 0
+    tagger.postag_words('mặt nạ xyzabc')
+    assert tagger.fallbacks == 1
+
+
+def test_training_texts_only_need_the_shipped_csv():
+    require_files(fast_pos.TRAINING_FILE)
+    assert fast_pos.SOURCE_FILES == (fast_pos.TRAINING_FILE,)
+    texts, labels = fast_pos.training_texts()
+    assert len(texts) == len(labels) > 0
+    assert all(text.strip() for text in texts)
@@ -0,0 +1,69 @@
+import sqlite3
+import time
+
+import pytest
+
+from history import PredictionHistory
+
+NOW = time.time()
+DAY = 86400
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = PredictionHistory(str(tmp_path / 'history.sqlite'))
+    history.record(['Hàng tốt', 'Hàng kém'], ['hàng tốt', 'hàng kém'], ['Positive', 'Negative'], [1.5, -0.5],
+                   'v1', created=NOW - 10 * DAY)
+    history.record(['Hàng tốt', 'Thơm'], ['hàng tốt', 'thơm'], ['Positive', 'Positive'], [2.0, 1.0],
+                   'v2', source='upload', created=NOW)
+    history.record(['Giao chậm'], ['giao chậm'], ['Negative'], None, 'v2', created=NOW)
+    return history
+
+
+def _day(created):
+    return time.strftime('%Y-%m-%d', time.localtime(created))
+
+
+# Bảng daily cộng dồn đúng số dự đoán và điểm trung bình (bỏ qua lô không có điểm)
+def test_trend_reads_the_daily_rollup(history):
+    rows = {(row['day'], row['label']): row for row in history.trend()}
+    assert rows[(_day(NOW), 'Positive')]['predictions'] == 2
+    assert rows[(_day(NOW), 'Positive')]['average_score'] == pytest.approx(1.5)
+    assert rows[(_day(NOW), 'Negative')]['predictions'] == 1
+    assert rows[(_day(NOW), 'Negative')]['average_score'] is None
+    assert {row['day'] for row in history.trend(days=5)} == {_day(NOW)}
+    assert sum(row['predictions'] for row in history.trend(model_version='v1')) == 2
+
+
+def test_compare_models(history):
+    models = {model['model_version']: model for model in history.compare_models()}
+    assert [model['model_version'] for model in history.compare_models()] == ['v2', 'v1']
+    assert models['v2']['predictions'] == 3
+    assert models['v2']['positive_share'] == pytest.approx(2 / 3)
+    assert models['v2']['average_score'] == pytest.approx(1.5)
+    assert models['v1']['negative_share'] == pytest.approx(0.5)
+    assert models['v1']['first_day'] == models['v1']['last_day'] == _day(NOW - 10 * DAY)
+    assert [model['model_version'] for model in history.compare_models(days=5)] == ['v2']
+
+
+def test_lookup_recent_and_prune(history):
+    assert [(row['label'], row['model_version']) for row in history.lookup('Hàng tốt')] == \
+        [('Positive', 'v1'), ('Positive', 'v2')]
+    assert history.lookup('hàng tốt') == []
+    assert [row['processed'] for row in history.recent(label='Negative')] == ['giao chậm', 'hàng kém']
+    assert len(history.recent(limit=2)) == 2
+    assert history.totals() == {'predictions': 5, 'batches': 3}
+
+    # Xóa dự đoán cũ nhưng giữ bảng daily cho xu hướng dài hạn
+    assert history.prune(keep_days=5) == 2
+    assert [row['model_version'] for row in history.lookup('Hàng tốt')] == ['v2']
+    assert history.totals() == {'predictions': 5, 'batches': 2}
+    assert sum(row['predictions'] for row in history.trend(model_version='v1')) == 2
+
+
+# Lỗi giữa chừng: cả lô được rollback, bảng daily không bị cộng dồn
+def test_failed_record_is_rolled_back(history):
+    with pytest.raises(sqlite3.IntegrityError):
+        history.record(['a', 'b'], ['a', None], ['Positive', 'Positive'], None, 'v3')
+    assert history.totals() == {'predictions': 5, 'batches': 3}
+    assert history.trend(model_version='v3') == []
@@ -0,0 +1,72 @@
+import io
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('underthesea')
+
+import artifacts  # noqa: E402
+import incremental_training  # noqa: E402
+import lexicon  # noqa: E402
+import preprocess_cache  # noqa: E402
+from incremental_training import OnlineModel, label_from_stars, load_state, update  # noqa: E402
+from model_registry import ModelRegistry  # noqa: E402
+
+POSITIVE = ['hàng tốt', 'rất thích', 'đóng gói đẹp', 'giao nhanh']
+NEGATIVE = ['hàng kém', 'thất vọng', 'giao chậm', 'không thích']
+
+
+def _reviews(count, offset=0):
+    rows = [(POSITIVE[i // 2 % 4], 5) if i % 2 else (NEGATIVE[i // 2 % 4], 1) for i in range(offset, offset + count)]
+    return pd.DataFrame(rows, columns=['noi_dung_binh_luan', 'so_sao'])
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    registry = ModelRegistry(str(tmp_path / 'models'))
+    monkeypatch.setattr(artifacts, 'CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(incremental_training, 'get_registry', lambda: registry)
+    monkeypatch.setattr(lexicon, 'load_lexicon', lambda: None)
+    monkeypatch.setattr(preprocess_cache, 'cached_preprocess_batch', lambda texts, lexicon, **options: list(texts))
+    return registry
+
+
+def test_label_from_stars():
+    assert label_from_stars([1, 3, 4, 5.0]).tolist() == ['Negative', 'Negative', 'Positive', 'Positive']
+
+
+# Lần chạy sau chỉ học các dòng được ghi thêm vào file, trạng thái nạp lại được từ .cache
+def test_update_learns_only_new_rows(registry, tmp_path):
+    path = tmp_path / 'new_reviews.csv'
+    _reviews(40).to_csv(path, index=False)
+    model = OnlineModel()
+    first = update(model, str(path), chunksize=16, checkpoint_every=1000, log=io.StringIO())
+    assert model.reviews == 40
+    assert registry.current_version() == first
+    assert list(registry.load(first).predict(['hàng tốt', 'hàng kém'])) == ['Positive', 'Negative']
+
+    _reviews(10, offset=40).to_csv(path, mode='a', header=False, index=False)
+    model = load_state()
+    assert model.reviews == 40
+    update(model, str(path), chunksize=16, checkpoint_every=1000, activate=False, log=io.StringIO())
+    assert model.reviews == 50
+    assert model.sources[str(path)] == 50
+    assert registry.current_version() == first
+
+    log = io.StringIO()
+    assert update(load_state(), str(path), log=log) is None
+    assert 'No new reviews' in log.getvalue()
+
+
+def test_checkpoint_every_and_invalid_rows(registry, tmp_path):
+    path = tmp_path / 'new_reviews.csv'
+    reviews = _reviews(30)
+    reviews.loc[3, 'so_sao'] = None
+    reviews.loc[4, 'noi_dung_binh_luan'] = '   '
+    reviews.to_csv(path, index=False)
+    model = OnlineModel()
+    update(model, str(path), chunksize=10, checkpoint_every=10, log=io.StringIO())
+    # Dòng thiếu số sao hoặc nội dung rỗng không được học nhưng vẫn tính là đã đọc
+    assert model.reviews == 28
+    assert model.sources[str(path)] == 30
+    assert len(registry.versions()) >= 2
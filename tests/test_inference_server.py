@@ -0,0 +1,147 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from inference_server import InferenceServer, MicroBatcher, Overloaded
+
+
+def _predictor(calls=None, release=None):
+    def predict(texts):
+        if calls is not None:
+            calls.append(list(texts))
+        if release is not None:
+            release.wait(5)
+        if 'boom' in texts:
+            raise RuntimeError('model broke')
+        return [f'label:{text}' for text in texts]
+    return predict
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def _with_server(server, check):
+    server.batcher.start()
+    try:
+        return await check(server)
+    finally:
+        await server.batcher.stop()
+
+
+async def _http(server, data):
+    tcp = await asyncio.start_server(server.handle_connection, '127.0.0.1', 0)
+    port = tcp.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(data)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+    finally:
+        tcp.close()
+    head, body = response.split(b'\r\n\r\n', 1)
+    return int(head.split(b' ', 2)[1]), json.loads(body)
+
+
+# Các request đến gần nhau được gom thành một lần gọi bộ dự đoán, kết quả trả đúng từng request
+def test_concurrent_requests_share_one_batch():
+    calls = []
+    server = InferenceServer(_predictor(calls), max_wait_ms=200)
+
+    async def check(server):
+        return await asyncio.gather(server.route('POST', '/predict', b'{"text": "a"}'),
+                                    server.route('POST', '/predict_batch', b'{"texts": ["b", "c"]}'))
+
+    assert _run(_with_server(server, check)) == [(200, {'sentiment': 'label:a'}),
+                                                 (200, {'sentiments': ['label:b', 'label:c']})]
+    assert calls == [['a', 'b', 'c']]
+    assert server.batcher.batches == 1
+
+
+def test_full_queue_is_rejected_with_503():
+    release = threading.Event()
+    server = InferenceServer(_predictor(release=release), max_pending=2, max_wait_ms=0)
+
+    async def check(server):
+        first = asyncio.ensure_future(server.route('POST', '/predict_batch', b'{"texts": ["a", "b"]}'))
+        await asyncio.sleep(0.05)
+        rejected = await server.route('POST', '/predict', b'{"text": "c"}')
+        release.set()
+        return rejected, await first
+
+    rejected, first = _run(_with_server(server, check))
+    assert rejected[0] == 503
+    assert first == (200, {'sentiments': ['label:a', 'label:b']})
+    assert server.rejected == 1
+
+
+def test_slow_prediction_times_out_with_504():
+    release = threading.Event()
+    server = InferenceServer(_predictor(release=release), timeout=0.05, max_wait_ms=0)
+
+    async def check(server):
+        status = await server.route('POST', '/predict', b'{"text": "a"}')
+        release.set()
+        return status
+
+    assert _run(_with_server(server, check))[0] == 504
+    assert server.timed_out == 1
+
+
+def test_predictor_error_returns_500():
+    server = InferenceServer(_predictor(), max_wait_ms=0)
+
+    async def check(server):
+        return (await server.route('POST', '/predict', b'{"text": "boom"}'),
+                await server.route('POST', '/predict', b'{"text": "ok"}'))
+
+    failed, ok = _run(_with_server(server, check))
+    assert failed[0] == 500
+    assert ok == (200, {'sentiment': 'label:ok'})
+    assert server.failed == 1
+
+
+@pytest.mark.parametrize('body, error', [
+    (b'not json', 'invalid JSON'),
+    (b'{"text": 1}', '"text" must be a string'),
+])
+def test_invalid_payload_returns_400(body, error):
+    server = InferenceServer(_predictor())
+    assert _run(_with_server(server, lambda server: server.route('POST', '/predict', body))) == (400, {'error': error})
+
+
+@pytest.mark.parametrize('headers', [
+    b'Content-Length: abc\r\n',
+    b'Content-Length: -5\r\n',
+    b'Transfer-Encoding: chunked\r\n',
+])
+def test_unreadable_body_length_returns_400(headers):
+    server = InferenceServer(_predictor())
+    status, response = _run(_with_server(server, lambda server: _http(server, b'POST /predict HTTP/1.1\r\n' + headers + b'\r\n')))
+    assert status == 400
+    assert 'Content-Length' in response['error']
+
+
+def test_http_predict_and_health():
+    server = InferenceServer(_predictor(), max_wait_ms=0)
+    body = '{"text": "hàng tốt"}'.encode('utf8')
+    request = b'POST /predict HTTP/1.1\r\nConnection: close\r\nContent-Length: %d\r\n\r\n' % len(body) + body
+
+    async def check(server):
+        return await _http(server, request), await _http(server, b'GET /health HTTP/1.0\r\n\r\n')
+
+    predicted, (status, health) = _run(_with_server(server, check))
+    assert predicted == (200, {'sentiment': 'label:hàng tốt'})
+    assert status == 200
+    assert health['batches'] == 1 and health['pending'] == 0
+
+
+def test_batcher_rejects_when_pending_exceeds_limit():
+    async def check():
+        batcher = MicroBatcher(_predictor(), max_pending=1)
+        with pytest.raises(Overloaded):
+            await batcher.submit(['a', 'b'])
+    _run(check())
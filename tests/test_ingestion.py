@@ -0,0 +1,81 @@
+import codecs
+import io
+import unicodedata
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('underthesea')
+
+from ingestion import detect_encoding, open_upload  # noqa: E402
+
+REVIEWS = ['Hàng tốt, "rất" thích', 'Giao chậm\nđóng gói kém', 'Bình thường', '', 'Sẽ mua lại']
+
+
+# cp1258 (Windows tiếng Việt) không có đủ ký tự dựng sẵn: dấu thanh là ký tự tổ hợp đứng sau
+def _encode(text, encoding):
+    if encoding != 'cp1258':
+        return text.encode(encoding)
+    tones = '\u0300\u0301\u0303\u0309\u0323'
+    chars = []
+    for char in text:
+        marks = unicodedata.normalize('NFD', char)
+        chars.append(unicodedata.normalize('NFC', ''.join(mark for mark in marks if mark not in tones)))
+        chars.extend(mark for mark in marks if mark in tones)
+    return ''.join(chars).encode('cp1258')
+
+
+def _nfc(texts):
+    return [unicodedata.normalize('NFC', text) for text in texts]
+
+
+def _csv_bytes(encoding):
+    return _encode(pd.DataFrame({'id': range(len(REVIEWS)), 'noi_dung_binh_luan': REVIEWS}).to_csv(index=False), encoding)
+
+
+def _read_all(upload, **options):
+    chunks = list(upload.iter_chunks(**options))
+    return [text for texts, _ in chunks for text in texts], chunks
+
+
+@pytest.mark.parametrize('data, encoding', [
+    (codecs.BOM_UTF8 + 'chào'.encode('utf8'), 'utf-8-sig'),
+    ('chào'.encode('utf-16'), 'utf-16'),
+    ('hàng tốt'.encode('utf8'), 'utf-8'),
+    # Mẫu bị cắt giữa một ký tự nhiều byte vẫn là UTF-8
+    ('hàng tốt'.encode('utf8')[:-1], 'utf-8'),
+    (_encode('hàng tốt', 'cp1258'), 'cp1258'),
+])
+def test_detect_encoding(data, encoding):
+    assert detect_encoding(data) == encoding
+
+
+# Trường có dấu phẩy, nháy kép và xuống dòng được đọc như CSV thật, dòng trống bị bỏ
+@pytest.mark.parametrize('encoding', ['utf-8', 'utf-8-sig', 'cp1258'])
+def test_csv_upload_is_parsed_in_chunks(encoding):
+    upload = open_upload(io.BytesIO(_csv_bytes(encoding)), 'reviews.csv')
+    assert upload.columns == ['id', 'noi_dung_binh_luan']
+    assert upload.default_column == 'noi_dung_binh_luan'
+    texts, chunks = _read_all(upload, chunksize=2, first_chunksize=1)
+    assert _nfc(texts) == [text for text in REVIEWS if text]
+    assert [len(chunk) for chunk, _ in chunks] == [1, 2, 1]
+    assert chunks[-1][1] == 1.0
+
+
+def test_text_upload_reads_one_review_per_line():
+    data = _encode('hàng tốt\r\n\r\nhàng kém\nrất thích', 'cp1258')
+    upload = open_upload(io.BytesIO(data), 'reviews.txt')
+    assert upload.encoding == 'cp1258'
+    assert _nfc(_read_all(upload, chunksize=2, first_chunksize=2)[0]) == ['hàng tốt', 'hàng kém', 'rất thích']
+
+
+def test_parquet_upload_lists_string_columns(tmp_path):
+    path = tmp_path / 'reviews.parquet'
+    pd.DataFrame({'id': range(len(REVIEWS)), 'review': REVIEWS}).to_parquet(path, index=False)
+    with open(path, 'rb') as file:
+        upload = open_upload(io.BytesIO(file.read()), 'reviews.parquet')
+    assert upload.columns == ['review']
+    assert upload.num_rows == len(REVIEWS)
+    texts, chunks = _read_all(upload, chunksize=3, first_chunksize=3)
+    assert texts == [text for text in REVIEWS if text]
+    assert chunks[-1][1] == 1.0
@@ -0,0 +1,115 @@
+import io
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import jobs
+from conftest import require_files
+from jobs import JobLost, JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / 'jobs.sqlite'))
+
+
+def _submit(queue, text=b'good\nbad', name='reviews.txt', **options):
+    return queue.submit(io.BytesIO(text), name, **options)
+
+
+def _write_result(job_id, pid, rows):
+    pd.DataFrame({'Original Text': [f'text {i}' for i in range(rows)],
+                  'Prediction': ['Positive' if i % 3 else 'Negative' for i in range(rows)]}).to_csv(
+        jobs.partial_path(job_id, pid), index=False, encoding='utf-8-sig')
+
+
+def test_each_job_is_claimed_once_in_order(queue):
+    first, second = _submit(queue), _submit(queue)
+    assert queue.claim(1) == first
+    assert queue.claim(2) == second
+    assert queue.claim(3) is None
+    assert queue.get(first)['worker_pid'] == 1
+
+
+def test_stale_job_moves_to_another_worker(queue):
+    job_id = _submit(queue)
+    queue.claim(1)
+    queue._execute('UPDATE jobs SET heartbeat = ? WHERE id = ?', (time.time() - jobs.STALE_SECONDS - 1, job_id))
+    assert queue.claim(2) == job_id
+
+    # Worker cũ không được ghi tiến độ hay kết quả lên job đã chuyển cho worker khác
+    with pytest.raises(JobLost):
+        queue.report(job_id, 1, 10, 0.5)
+    _write_result(job_id, 1, 5)
+    assert not queue.finish(job_id, 1, 'done', replace=(jobs.partial_path(job_id, 1), jobs.result_path(job_id)), rows=5)
+    assert not os.path.exists(jobs.result_path(job_id))
+    assert queue.get(job_id)['status'] == 'running'
+
+    assert queue.report(job_id, 2, 10, 0.5) is False
+    _write_result(job_id, 2, 10)
+    assert queue.finish(job_id, 2, 'done', replace=(jobs.partial_path(job_id, 2), jobs.result_path(job_id)), rows=10)
+    assert queue.get(job_id)['status'] == 'done'
+    assert os.path.exists(jobs.result_path(job_id))
+
+
+def test_cancel_request_is_reported(queue):
+    job_id = _submit(queue)
+    queue.claim(1)
+    queue.cancel(job_id)
+    assert queue.report(job_id, 1, 1, 0.1) is True
+
+
+def test_heartbeat_thread_keeps_a_slow_job_alive(queue, monkeypatch):
+    monkeypatch.setattr(jobs, 'HEARTBEAT_SECONDS', 0.05)
+    job_id = _submit(queue)
+    queue.claim(1)
+    queue._execute('UPDATE jobs SET heartbeat = 0 WHERE id = ?', (job_id,))
+    stop = threading.Event()
+    thread = threading.Thread(target=jobs._keep_alive, args=(queue, job_id, 1, stop))
+    thread.start()
+    time.sleep(0.3)
+    stop.set()
+    thread.join()
+    assert time.time() - queue.get(job_id)['heartbeat'] < 1
+
+
+def test_read_partial_returns_the_last_reported_rows(queue):
+    job_id = _submit(queue)
+    queue.claim(1)
+    _write_result(job_id, 1, 50)
+    assert jobs.read_partial(queue.get(job_id)) is None
+    # Chỉ các dòng đã báo tiến độ, dù file đã có thêm dòng
+    queue.report(job_id, 1, 40, 0.8)
+    partial = jobs.read_partial(queue.get(job_id), limit=10)
+    assert partial['Original Text'].tolist() == [f'text {i}' for i in range(30, 40)]
+
+
+def test_read_result_and_label_counts(queue):
+    job_id = _submit(queue)
+    queue.claim(1)
+    _write_result(job_id, 1, 30)
+    queue.finish(job_id, 1, 'done', replace=(jobs.partial_path(job_id, 1), jobs.result_path(job_id)), rows=30)
+    assert len(jobs.read_result(job_id, limit=5)) == 5
+    # Job xong trước khi có cột label_counts: đếm lại từ file kết quả
+    assert jobs.label_counts(queue.get(job_id)) == {'Positive': 20, 'Negative': 10}
+    queue._execute('UPDATE jobs SET label_counts = ? WHERE id = ?', (json.dumps({'Positive': 1}), job_id))
+    assert jobs.label_counts(queue.get(job_id)) == {'Positive': 1}
+
+
+def test_run_job_scores_the_upload(queue):
+    pytest.importorskip('underthesea')
+    require_files('model_pipeline.pkl')
+    job_id = _submit(queue, 'Sản phẩm tuyệt vời, rất hài lòng\nHàng kém chất lượng, thất vọng\n'.encode('utf8'))
+    queue.claim(os.getpid())
+    jobs.run_job(queue, job_id)
+    job = queue.get(job_id)
+    assert job['status'] == 'done'
+    assert job['rows'] == 2
+    results = jobs.read_result(job_id)
+    assert len(results) == 2
+    assert sum(jobs.label_counts(job).values()) == 2
+    assert not os.path.exists(jobs.partial_path(job_id, os.getpid()))
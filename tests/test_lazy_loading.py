@@ -0,0 +1,77 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+from training_report import load_report, save_report
+
+pytest.importorskip('streamlit')
+
+HEAVY_MODULES = ('pandas', 'sklearn', 'imblearn', 'underthesea', 'matplotlib', 'wordcloud', 'joblib')
+
+# Chạy một trang trong process mới (AppTest) rồi in các module nặng đã được import
+PAGE_SCRIPT = '''
+import json, sys
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file('comment_classification.py', default_timeout=120)
+at.query_params['page'] = sys.argv[1]
+at.run()
+print(json.dumps({
+    'exceptions': [exception.message for exception in at.exception],
+    'markdown': [element.value for element in at.markdown],
+    'modules': [name for name in %r if name in sys.modules],
+}))
+''' % (HEAVY_MODULES,)
+
+
+def _open_page(page, cache_dir):
+    env = dict(os.environ, HASAKI_CACHE_DIR=str(cache_dir), PYTHONPATH=ROOT)
+    output = subprocess.run([sys.executable, '-c', PAGE_SCRIPT, page], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=300, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _report():
+    scores = {'precision': 0.9, 'recall': 0.8, 'f1': 0.85, 'support': 10}
+    return {
+        'created': '2024-12-01 10:00:00', 'reviews': 100, 'train_reviews': 70, 'test_reviews': 30, 'folds': 5,
+        'selected': 'svm', 'timings': {'final_fit': 1.5},
+        'models': {'svm': {
+            'name': 'Support Vector Machine (SVM)', 'cv_accuracy': 0.9, 'cv_accuracy_std': 0.01, 'cv_f1_macro': 0.88,
+            'train_accuracy': 0.95, 'test_accuracy': 0.9,
+            'classes': {'Negative': scores, 'Positive': scores}, 'confusion_matrix': [[8, 2], [1, 19]],
+        }},
+    }
+
+
+def test_training_report_round_trip():
+    report = _report()
+    save_report(report)
+    assert load_report() == report
+
+
+# Các trang không cần dự đoán không import pandas / scikit-learn / underthesea
+@pytest.mark.parametrize('page', ['Business Objective', 'Build Model'])
+def test_light_pages_skip_heavy_imports(page, tmp_path):
+    result = _open_page(page, tmp_path)
+    assert result['exceptions'] == []
+    assert result['modules'] == []
+
+
+def test_build_model_shows_the_latest_training_report(tmp_path, monkeypatch):
+    import artifacts
+
+    monkeypatch.setattr(artifacts, 'CACHE_DIR', str(tmp_path))
+    save_report(_report())
+    result = _open_page('Build Model', tmp_path)
+    assert result['modules'] == []
+    assert any('Chọn Support Vector Machine (SVM)' in text for text in result['markdown'])
+
+
+def test_new_prediction_loads_the_model_on_first_prediction(tmp_path):
+    result = _open_page('New Prediction', tmp_path)
+    assert result['exceptions'] == []
+    assert not {'sklearn', 'underthesea', 'joblib'} & set(result['modules'])
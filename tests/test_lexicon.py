@@ -0,0 +1,65 @@
+import os
+import shutil
+
+import pytest
+
+import artifacts
+import lexicon
+from conftest import ROOT, require_files
+from lexicon import LEXICON_FILES, PhraseTrie, build_lexicon, load_lexicon
+
+
+@pytest.fixture
+def lexicon_dir(tmp_path, monkeypatch):
+    require_files(*LEXICON_FILES)
+    for name in LEXICON_FILES:
+        shutil.copy(os.path.join(ROOT, name), tmp_path / name)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(artifacts, 'CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(lexicon, '_lexicon', None)
+    return tmp_path
+
+
+def _read_lines(name):
+    with open(name, 'r', encoding='utf8') as file:
+        return file.read().split('\n')
+
+
+# Cùng nội dung với các list/dict mà app gốc đọc từ file .txt
+def test_lexicon_matches_the_text_files(lexicon_dir):
+    loaded = load_lexicon()
+    assert loaded.emoji_dict == dict(line.split('\t') for line in _read_lines('emojicon.txt'))
+    assert loaded.teen_dict == dict(line.split('\t') for line in _read_lines('teencode.txt'))
+    assert loaded.wrong_set == set(_read_lines('wrong-word.txt'))
+    assert loaded.stopword_set == set(_read_lines('vietnamese-stopwords.txt'))
+    assert isinstance(loaded.stopword_set, frozenset)
+
+
+def test_cache_is_reused_and_rebuilt_when_a_file_changes(lexicon_dir, monkeypatch):
+    first = load_lexicon()
+    assert os.path.exists(lexicon_dir / 'cache' / 'lexicon.pkl')
+
+    # Lần nạp sau (process mới) đọc từ file cache, không đọc lại các file .txt
+    monkeypatch.setattr(lexicon, '_lexicon', None)
+    monkeypatch.setattr(lexicon, 'build_lexicon', lambda: pytest.fail('lexicon rebuilt from an unchanged cache'))
+    assert load_lexicon().fingerprint == first.fingerprint
+
+    monkeypatch.setattr(lexicon, '_lexicon', None)
+    monkeypatch.setattr(lexicon, 'build_lexicon', build_lexicon)
+    with open('vietnamese-stopwords.txt', 'a', encoding='utf8') as file:
+        file.write('\ntừ_mới')
+    reloaded = load_lexicon()
+    assert reloaded.fingerprint != first.fingerprint
+    assert 'từ_mới' in reloaded.stopword_set
+
+
+def test_phrase_trie_longest_match():
+    trie = PhraseTrie()
+    trie.add(['hàng', 'chính'], 'hàng_chính')
+    trie.add(['hàng', 'chính', 'hãng'], 'hàng_chính_hãng')
+    words = 'mua hàng chính hãng'.split()
+    assert trie.longest_match(words, 1) == (3, 'hàng_chính_hãng')
+    assert trie.longest_match(words, 0) == (0, None)
+    assert trie.longest_match(['hàng', 'chính', 'xịn'], 0) == (2, 'hàng_chính')
+    assert ['hàng', 'chính'] in trie
+    assert ['hàng'] not in trie
@@ -0,0 +1,82 @@
+import argparse
+import time
+
+import pandas as pd
+import pytest
+
+import load_test
+from load_test import ReviewGenerator, parse_mix, percentile, run_level, write_standin_data
+
+
+@pytest.fixture
+def clean_path(tmp_path):
+    path = tmp_path / 'clean.csv'
+    pd.DataFrame({
+        'noi_dung_binh_luan': ['sản_phẩm tốt giao_hàng nhanh', 'rất thích mùi thơm', 'đóng_gói đẹp', '',
+                               'hàng kém chất_lượng', 'giao_hàng chậm', 'kém', 'thất_vọng'],
+        'id': range(8),
+        'sentiment': ['Positive'] * 4 + ['Negative'] * 4,
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def generator(clean_path):
+    return ReviewGenerator(clean_path, seed=1)
+
+
+def test_parse_mix():
+    assert parse_mix('single=0.6,upload=0,product') == {'single': 0.6, 'product': 1.0}
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_mix('single=1,search=1')
+
+
+def test_percentile():
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 50) == 51.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 95) == 0.0
+
+
+def test_generated_reviews_follow_the_sentiment(generator, clean_path):
+    negative_words = {'hàng', 'kém', 'chất', 'lượng', 'giao', 'chậm', 'thất', 'vọng'}
+    for _ in range(50):
+        text, sentiment = generator.review('Negative')
+        assert sentiment == 'Negative'
+        assert '_' not in text
+        assert set(text.lower().rstrip('!.?:( 😍👍ạ').split()) <= negative_words
+    # Cùng seed: cùng chuỗi review
+    assert ReviewGenerator(clean_path, seed=2).reviews(10) == ReviewGenerator(clean_path, seed=2).reviews(10)
+
+
+# Dữ liệu thay thế dùng được cho tầng dữ liệu sản phẩm như dữ liệu thật
+def test_standin_data_has_the_real_columns(generator, tmp_path):
+    names = write_standin_data(str(tmp_path), generator, products=20, max_reviews=10)
+    products = pd.read_csv(tmp_path / 'San_pham_full.csv')
+    ratings = pd.read_csv(tmp_path / 'Danh_gia_full.csv')
+    clean = pd.read_csv(tmp_path / 'data_clean_2.csv')
+    assert len(names) == len(products) == 20
+    assert {'ma_san_pham', 'ten_san_pham', 'phan_loai', 'diem_trung_binh'} <= set(products.columns)
+    assert {'id', 'noi_dung_binh_luan', 'ngay_binh_luan', 'so_sao', 'ma_san_pham'} <= set(ratings.columns)
+    merged = ratings.merge(clean, on='id')
+    assert len(merged) == len(ratings)
+    assert ((merged['so_sao'] >= 4) == (merged['sentiment'] == 'Positive')).all()
+
+
+class FakeActions:
+    def single(self, rng):
+        time.sleep(0.001)
+
+    def product(self, rng):
+        raise RuntimeError('product page failed')
+
+
+def test_run_level_counts_latencies_and_errors(monkeypatch):
+    monkeypatch.setattr(load_test, 'total_rss', lambda: 2 ** 20)
+    result = run_level(FakeActions(), concurrency=2, duration=0.2, mix={'single': 1, 'product': 1})
+    assert result['concurrency'] == 2
+    assert result['single']['count'] > 0 and result['single']['errors'] == 0
+    assert result['product']['count'] == 0 and result['product']['errors'] > 0
+    assert result['actions'] == result['single']['count']
+    assert result['errors'] == result['product']['errors']
+    assert result['peak_rss_mb'] == 1.0
@@ -0,0 +1,64 @@
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(metrics, 'enabled', True)
+    monkeypatch.setattr(metrics, '_collectors', [])
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_disabled_timer_records_nothing(monkeypatch):
+    monkeypatch.setattr(metrics, 'enabled', False)
+    metrics.reset()
+    with metrics.timer('preprocess'):
+        pass
+    metrics.increment('requests')
+    metrics.observe('preprocess', 1.0)
+    data = metrics.snapshot()
+    assert data['timings'] == {} and data['counters'] == {}
+    assert metrics.timer('a') is metrics.timer('b')
+
+
+def test_timings_counters_and_quantiles(enabled):
+    for value in range(1, 101):
+        metrics.observe('model.predict', value / 1000)
+    with metrics.timer('preprocess'):
+        pass
+    metrics.increment('http.predict_error')
+    metrics.increment('http.predict_error', 2)
+
+    data = metrics.snapshot()
+    timing = data['timings']['model.predict']
+    assert timing['count'] == 100
+    assert timing['total_seconds'] == pytest.approx(5.05)
+    assert (timing['p50'], timing['p95'], timing['p99']) == (0.051, 0.095, 0.099)
+    assert data['timings']['preprocess']['count'] == 1
+    assert data['counters'] == {'http.predict_error': 3}
+
+
+# Số mẫu giữ lại có giới hạn, tổng và số lần đo vẫn tính trên mọi lần
+def test_samples_are_bounded(enabled):
+    for _ in range(metrics.SAMPLES_PER_METRIC):
+        metrics.observe('slow', 10.0)
+    for _ in range(metrics.SAMPLES_PER_METRIC):
+        metrics.observe('slow', 0.001)
+    timing = metrics.snapshot()['timings']['slow']
+    assert timing['count'] == 2 * metrics.SAMPLES_PER_METRIC
+    assert timing['p99'] == 0.001
+
+
+def test_render_prometheus(enabled):
+    metrics.register_collector(lambda: {'preprocess_cache.entries': 7})
+    metrics.observe('http.request', 0.25)
+    metrics.increment('model.explain_unavailable')
+    text = metrics.render_prometheus()
+    assert '# TYPE hasaki_http_request_seconds summary' in text
+    assert 'hasaki_http_request_seconds{quantile="0.5"} 0.250000' in text
+    assert 'hasaki_http_request_seconds_count 1' in text
+    assert 'hasaki_model_explain_unavailable_total 1' in text
+    assert 'hasaki_preprocess_cache_entries 7' in text
@@ -0,0 +1,100 @@
+import os
+
+import joblib
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.pipeline import Pipeline
+from sklearn.svm import LinearSVC
+
+from model_registry import CURRENT_FILE, MODEL_FILE, ModelRegistry
+
+TEXTS = ['hàng tốt', 'rất thích', 'đẹp lắm', 'hàng kém', 'thất vọng', 'không thích']
+LABELS = ['Positive'] * 3 + ['Negative'] * 3
+
+
+def _pipeline(classifier=None):
+    classifier = LinearSVC() if classifier is None else classifier
+    return Pipeline([('tfidf', TfidfVectorizer()), ('classifier', classifier)]).fit(TEXTS, LABELS)
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('HASAKI_MODEL_VERSION', raising=False)
+    monkeypatch.delenv('HASAKI_COMPILED_MODEL', raising=False)
+    return ModelRegistry(str(tmp_path / 'models'))
+
+
+def test_publish_and_activate(registry):
+    first = registry.publish(_pipeline(), 'v1')
+    registry.publish(_pipeline(), 'v2', activate=False)
+    assert registry.versions() == ['v1', 'v2']
+    assert registry.current_version() == first
+    registry.activate('v2')
+    assert registry.current_version() == 'v2'
+    with pytest.raises(ValueError):
+        registry.activate('v3')
+
+
+def test_environment_overrides_current(registry, monkeypatch):
+    registry.publish(_pipeline(), 'v1')
+    registry.publish(_pipeline(), 'v2', activate=False)
+    monkeypatch.setenv('HASAKI_MODEL_VERSION', 'v2')
+    assert registry.load().version == 'v2'
+
+
+# Chưa có CURRENT: nhập model_pipeline.pkl thành phiên bản đặt tên theo nội dung;
+# file pickle được thay thì phiên bản mới được nhập và kích hoạt
+def test_model_file_is_imported_by_content(registry, tmp_path):
+    joblib.dump(_pipeline(), MODEL_FILE)
+    version = registry.current_version()
+    assert version.startswith('pipeline-')
+    assert registry.import_file() == version
+
+    joblib.dump(_pipeline(RandomForestClassifier(n_estimators=3, random_state=0)), MODEL_FILE)
+    current = os.path.join(registry.directory, CURRENT_FILE)
+    os.utime(MODEL_FILE, (os.path.getmtime(current) + 10,) * 2)
+    assert registry.current_version() not in (version, None)
+    assert len(registry.versions()) == 2
+
+
+def test_loaded_model_is_shared_and_predicts(registry):
+    pipeline = _pipeline()
+    registry.publish(pipeline, 'v1')
+    model = registry.load()
+    assert registry.load('v1') is model
+    assert list(model.predict(TEXTS)) == list(pipeline.predict(TEXTS))
+    labels, scores = model.predict_with_scores(TEXTS)
+    assert list(labels) == LABELS
+    assert model.info()['artifact_bytes'] == os.path.getsize(registry.path('v1'))
+
+    registry.publish(_pipeline(), 'v2')
+    registry.release_others('v2')
+    assert registry.load('v1') is not model
+
+
+def test_compiled_load_falls_back_for_unsupported_pipelines(registry):
+    registry.publish(_pipeline(RandomForestClassifier(n_estimators=3, random_state=0)), 'forest')
+    model = registry.load(compiled=True)
+    assert isinstance(model.pipeline, Pipeline)
+    assert model.explain(TEXTS) is None
+    assert len(model.predict(TEXTS)) == len(TEXTS)
+
+    registry.publish(_pipeline(), 'linear')
+    compiled = registry.load(compiled=True)
+    assert not isinstance(compiled.pipeline, Pipeline)
+    assert list(compiled.predict(TEXTS)) == LABELS
+
+
+# Mô hình nạp từ joblib vẫn giải thích được: phiên bản được biên dịch khi giải thích lần đầu
+def test_loaded_model_explains_by_compiling_the_version(registry):
+    pipeline = _pipeline()
+    registry.publish(pipeline, 'v1')
+    model = registry.load()
+    assert isinstance(model.pipeline, Pipeline)
+    labels, scores, positive, negative = model.explain(TEXTS, top=2)
+    assert list(labels) == LABELS
+    assert scores == pytest.approx(pipeline.decision_function(TEXTS))
+    assert positive[0][0][0] == 'tốt'
+    assert negative[3][0][0] == 'kém'
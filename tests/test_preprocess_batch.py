@@ -0,0 +1,45 @@
+import pytest
+
+from conftest import require_files
+
+pytest.importorskip('underthesea')
+
+import preprocessing  # noqa: E402
+from lexicon import LEXICON_FILES, load_lexicon  # noqa: E402
+from preprocessing import preprocess, preprocess_batch, shutdown_batch_pool  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def resources():
+    require_files(*LEXICON_FILES, 'comments.txt')
+    lexicon = load_lexicon()
+    yield lexicon.emoji_dict, lexicon.teen_dict, lexicon.wrong_set, lexicon.stopword_set
+    shutdown_batch_pool()
+
+
+@pytest.fixture(scope='module')
+def texts():
+    with open('comments.txt', encoding='utf8') as file:
+        comments = [line.strip() for line in file if line.strip()]
+    # Đủ nhiều để chia cho pool process, có cả dòng trùng và dòng rỗng
+    return (comments * 3)[:preprocessing._MIN_PARALLEL_TEXTS + 30] + ['', 'ok']
+
+
+def test_parallel_batch_keeps_order_and_matches_preprocess(resources, texts):
+    expected = [preprocess(text, *resources, mode='full') for text in texts]
+    assert preprocess_batch(texts, *resources, n_jobs=2, chunksize=7, mode='full') == expected
+
+
+def test_pool_is_reused_between_batches(resources, texts):
+    preprocess_batch(texts, *resources, n_jobs=2, mode='full')
+    executor = preprocessing._executor
+    assert executor is not None
+    preprocess_batch(texts[::-1], *resources, n_jobs=2, mode='full')
+    assert preprocessing._executor is executor
+    shutdown_batch_pool()
+    assert preprocessing._executor is None
+
+
+def test_small_batches_run_in_process(resources):
+    assert preprocess_batch(['hàng tốt'], *resources, n_jobs=2, mode='full') == [preprocess('hàng tốt', *resources, mode='full')]
+    assert preprocessing._executor is None
@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip('underthesea')
+
+import preprocess_cache  # noqa: E402
+from preprocess_cache import PreprocessCache, cached_preprocess_batch  # noqa: E402
+
+
+class FakeLexicon:
+    emoji_dict = teen_dict = {}
+    wrong_set = stopword_set = frozenset()
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    def fake_preprocess_batch(texts, *resources, **options):
+        calls.append(list(texts))
+        return [text.upper() for text in texts]
+
+    monkeypatch.setattr(preprocess_cache, 'preprocess_batch', fake_preprocess_batch)
+    return calls
+
+
+def test_memory_lru_eviction():
+    cache = PreprocessCache('test', memory_entries=2, disk_entries=0)
+    cache.put_many([('a', 'A'), ('b', 'B')])
+    assert cache.get_many(['a']) == {'a': 'A'}
+    cache.put_many([('c', 'C')])
+    # 'b' là bản ghi lâu không dùng nhất
+    assert cache.get_many(['a', 'b', 'c']) == {'a': 'A', 'c': 'C'}
+    assert cache.stats()['memory_entries'] == 2
+
+
+def test_disk_eviction_keeps_recent_entries(tmp_path):
+    cache = PreprocessCache('test', path=str(tmp_path / 'cache.sqlite'), memory_entries=1, disk_entries=10)
+    cache.put_many((f'old{i}', f'OLD{i}') for i in range(10))
+    cache._db.execute('UPDATE entries SET last_used = 0')
+    cache.put_many([('new', 'NEW')])
+    # Vượt giới hạn: giảm về 90%, xóa các bản ghi cũ nhất trước
+    assert cache.stats()['disk_entries'] == 9
+    assert cache.get_many(['new']) == {'new': 'NEW'}
+    assert len(cache.get_many([f'old{i}' for i in range(10)])) == 8
+
+
+def test_disk_entries_survive_restart(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    PreprocessCache('test', path=path).put_many([('a', 'A')])
+    assert PreprocessCache('test', path=path).get_many(['a']) == {'a': 'A'}
+    # Namespace khác (phiên bản preprocess / lexicon khác) không dùng lại kết quả cũ
+    assert PreprocessCache('other', path=path).get_many(['a']) == {}
+
+
+def test_duplicates_are_preprocessed_once(calls, tmp_path):
+    cache = PreprocessCache('test', path=str(tmp_path / 'cache.sqlite'))
+    assert cached_preprocess_batch(['x', 'y', 'x', 'x'], FakeLexicon(), cache=cache) == ['X', 'Y', 'X', 'X']
+    assert calls == [['x', 'y']]
+    assert cached_preprocess_batch(['y', 'z', 'x'], FakeLexicon(), cache=cache) == ['Y', 'Z', 'X']
+    assert calls == [['x', 'y'], ['z']]
@@ -0,0 +1,46 @@
+import json
+import os
+
+import pytest
+
+from conftest import ROOT, require_files
+
+pytest.importorskip('underthesea')
+
+from lexicon import LEXICON_FILES, load_lexicon  # noqa: E402
+from preprocess_cache import PreprocessCache, cached_preprocess_batch  # noqa: E402
+from preprocessing import preprocess, preprocess_batch  # noqa: E402
+
+# Cặp (văn bản gốc, kết quả) sinh bằng preprocess() của phiên bản gốc (danh sách từ điển,
+# mỗi bước nối/tách chuỗi) trên comments.txt và vài trường hợp biên
+with open(os.path.join(ROOT, 'tests', 'data', 'preprocess_expected.json'), encoding='utf8') as file:
+    EXPECTED = json.load(file)
+
+
+@pytest.fixture(scope='module')
+def lexicon():
+    require_files(*LEXICON_FILES)
+    return load_lexicon()
+
+
+def test_preprocess_matches_baseline(lexicon):
+    for text, expected in EXPECTED:
+        actual = preprocess(text, lexicon.emoji_dict, lexicon.teen_dict, lexicon.wrong_set, lexicon.stopword_set, mode='full')
+        assert actual == expected, text
+
+
+def test_preprocess_batch_matches_baseline(lexicon):
+    texts = [text for text, _ in EXPECTED]
+    actual = preprocess_batch(texts, lexicon.emoji_dict, lexicon.teen_dict, lexicon.wrong_set, lexicon.stopword_set,
+                              n_jobs=2, mode='full')
+    assert actual == [expected for _, expected in EXPECTED]
+
+
+def test_cached_preprocess_batch_matches_baseline(lexicon, tmp_path):
+    cache = PreprocessCache('test', path=str(tmp_path / 'cache.sqlite'))
+    texts = [text for text, _ in EXPECTED]
+    expected = [value for _, value in EXPECTED]
+    assert cached_preprocess_batch(texts, lexicon, cache=cache, mode='full') == expected
+    # Lần hai lấy hoàn toàn từ cache
+    assert cached_preprocess_batch(texts, lexicon, cache=cache, mode='full') == expected
+    assert cache.stats()['misses'] == len(set(texts))
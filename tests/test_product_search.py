@@ -0,0 +1,41 @@
+from product_search import ProductSearchIndex, fold
+
+NAMES = [
+    'Kem Chống Nắng La Roche-Posay Anthelios',
+    'Sữa Rửa Mặt Cerave Cho Da Dầu',
+    'Son Kem Lì Black Rouge',
+    'Kem Dưỡng Ẩm Cerave',
+    'Nước Tẩy Trang Bioderma',
+    'Đường Kẻ Mắt',
+]
+
+
+def _names(index, query, k=50):
+    return [NAMES[doc] for doc in index.search(query, k)]
+
+
+def test_fold_removes_vietnamese_accents():
+    assert fold('Kem Chống Nắng') == 'kem chong nang'
+    assert fold('Đường') == 'duong'
+
+
+def test_search_ignores_accents_and_case():
+    index = ProductSearchIndex(NAMES)
+    assert _names(index, 'kem chong nang') == [NAMES[0], NAMES[2], NAMES[3]]
+    assert _names(index, 'KEM CHỐNG NẮNG')[0] == NAMES[0]
+    assert _names(index, 'duong ke')[0] == NAMES[5]
+
+
+# Token cuối đang gõ dở được mở rộng theo tiền tố, token gõ sai được so theo trigram
+def test_prefix_and_typo_matches():
+    index = ProductSearchIndex(NAMES)
+    assert _names(index, 'bioder') == [NAMES[4]]
+    assert _names(index, 'cerav')[:2] == [NAMES[1], NAMES[3]]
+    assert _names(index, 'biodrma') == [NAMES[4]]
+
+
+def test_no_match_and_limit():
+    index = ProductSearchIndex(NAMES + [None])
+    assert index.search('xyz') == []
+    assert index.search('') == []
+    assert len(index.search('kem', k=2)) == 2
@@ -0,0 +1,89 @@
+import io
+
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+pytest.importorskip('underthesea')
+
+import lexicon  # noqa: E402
+import preprocess_cache  # noqa: E402
+import score_reviews  # noqa: E402
+from score_reviews import score_file  # noqa: E402
+
+
+class FakeModel:
+    version = 'test'
+
+    def __init__(self, fail_after=None):
+        self.calls = 0
+        self.fail_after = fail_after
+
+    def predict(self, texts):
+        self.calls += 1
+        if self.fail_after is not None and self.calls > self.fail_after:
+            raise KeyboardInterrupt
+        return ['Negative' if 'kém' in text else 'Positive' for text in texts]
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(score_reviews, 'get_model', lambda: model)
+    monkeypatch.setattr(lexicon, 'load_lexicon', lambda: None)
+    monkeypatch.setattr(preprocess_cache, 'cached_preprocess_batch', lambda texts, lexicon, **options: list(texts))
+    return model
+
+
+@pytest.fixture
+def reviews(tmp_path):
+    path = tmp_path / 'reviews.csv'
+    pd.DataFrame({
+        'id': range(23),
+        'noi_dung_binh_luan': ['hàng kém' if i % 4 == 0 else f'hàng tốt {i}' for i in range(23)],
+        'so_sao': [1 + i % 5 for i in range(23)],
+    }).to_csv(path, index=False)
+    return path
+
+
+def test_csv_is_scored_in_chunks(model, reviews, tmp_path):
+    output = tmp_path / 'scored.csv'
+    result = score_file(str(reviews), str(output), keep_columns=['id'], chunksize=5, log=io.StringIO())
+    assert result['rows'] == 23 and result['chunks'] == 5 and result['done']
+    scored = pd.read_csv(output)
+    assert scored.columns.tolist() == ['row', 'id', 'noi_dung_binh_luan', 'prediction', 'model_version']
+    assert scored['row'].tolist() == list(range(23))
+    assert (scored['prediction'] == 'Negative').sum() == 6
+
+
+# Dừng giữa chừng rồi chạy lại: tiếp tục sau khối cuối đã checkpoint, kết quả như chạy một lần
+def test_interrupted_run_resumes_from_the_checkpoint(model, reviews, tmp_path):
+    expected = tmp_path / 'expected.csv'
+    score_file(str(reviews), str(expected), keep_columns=['id'], chunksize=5, log=io.StringIO())
+
+    output = tmp_path / 'scored.csv'
+    model.calls, model.fail_after = 0, 2
+    with pytest.raises(KeyboardInterrupt):
+        score_file(str(reviews), str(output), keep_columns=['id'], chunksize=5, log=io.StringIO())
+    assert len(pd.read_csv(output)) == 10
+
+    model.calls, model.fail_after = 0, None
+    log = io.StringIO()
+    score_file(str(reviews), str(output), keep_columns=['id'], chunksize=5, log=log)
+    assert 'Resuming after 10 rows' in log.getvalue()
+    assert model.calls == 3
+    pdt.assert_frame_equal(pd.read_csv(output), pd.read_csv(expected))
+
+    # Đã xong thì không chấm lại
+    score_file(str(reviews), str(output), keep_columns=['id'], chunksize=5, log=io.StringIO())
+    assert model.calls == 3
+
+
+def test_text_input_and_parquet_output(model, tmp_path):
+    source = tmp_path / 'reviews.txt'
+    source.write_text('hàng tốt\nhàng kém\r\nrất thích\n', encoding='utf8')
+    output = tmp_path / 'scored.parquet'
+    score_file(str(source), str(output), chunksize=2, log=io.StringIO())
+    scored = pd.read_parquet(output)
+    assert scored['noi_dung_binh_luan'].tolist() == ['hàng tốt', 'hàng kém', 'rất thích']
+    assert scored['prediction'].tolist() == ['Positive', 'Negative', 'Positive']
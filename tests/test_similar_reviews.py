@@ -0,0 +1,78 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+import artifacts
+import similar_reviews
+from conftest import ROOT, require_files
+from data_store import CLEAN_RATINGS_FILE, PRODUCTS_FILE, RATINGS_FILE
+from similar_reviews import TOKEN_PATTERN, load_index
+
+ROWS = 4000
+
+
+@pytest.fixture
+def index_dir(tmp_path, monkeypatch):
+    require_files(CLEAN_RATINGS_FILE)
+    pd.read_csv(f'{ROOT}/{CLEAN_RATINGS_FILE}', nrows=ROWS).to_csv(tmp_path / CLEAN_RATINGS_FILE, index=False)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(artifacts, 'CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(similar_reviews, '_index', None)
+    return tmp_path
+
+
+# Điểm trả về đúng bằng cosine TF-IDF vét cạn trên các văn bản có chung token hiếm với truy vấn
+def test_scores_match_brute_force_cosine(index_dir):
+    index = load_index(log=io.StringIO())
+    clean = pd.read_csv(CLEAN_RATINGS_FILE, dtype={'noi_dung_binh_luan': str}, keep_default_na=False)
+    assert sorted(index.texts) == sorted({text for text in clean['noi_dung_binh_luan'] if text.strip()})
+    vectorizer = TfidfVectorizer(token_pattern=TOKEN_PATTERN, sublinear_tf=True)
+    matrix = vectorizer.fit_transform(index.texts).tocsc()
+    rare = np.diff(matrix.indptr) <= index._max_postings
+    matrix = matrix.tocsr()
+
+    rng = np.random.default_rng(0)
+    for document in rng.choice(len(index.texts), 50, replace=False):
+        query = matrix[document]
+        if not rare[query.indices].any():
+            continue
+        scores = (matrix @ query.T).toarray().ravel()
+        sharing = matrix[:, query.indices[rare[query.indices]]].sum(axis=1).A.ravel() > 0
+        expected = np.sort(scores[sharing])[::-1][:10]
+        results = index.similar_to_text(index.texts[document], k=10)
+        np.testing.assert_allclose([result['score'] for result in results], expected[expected > 0], atol=1e-5)
+
+
+def test_similar_to_review_skips_the_review_itself(index_dir):
+    clean = pd.read_csv(CLEAN_RATINGS_FILE)
+    duplicated = clean[clean.duplicated('noi_dung_binh_luan', keep=False) & clean['noi_dung_binh_luan'].notna()]
+    review_id = int(duplicated['id'].iloc[0])
+    copies = int((clean['noi_dung_binh_luan'] == duplicated['noi_dung_binh_luan'].iloc[0]).sum())
+
+    index = load_index(log=io.StringIO())
+    results = index.similar_to_review(review_id, k=5)
+    assert results[0]['score'] == pytest.approx(1.0)
+    assert results[0]['review_id'] != review_id
+    assert results[0]['matching_reviews'] == copies - 1
+    assert all(result['review_id'] != review_id for result in results)
+    assert index.similar_to_review(-1) is None
+
+
+# Chỉ có data_clean_2.csv: vẫn dựng được; thêm file đánh giá/sản phẩm thì dựng lại và nối thông tin
+def test_index_is_rebuilt_with_ratings_and_products(index_dir):
+    index = load_index(log=io.StringIO())
+    result = index.similar_to_text('hàng tốt', k=1)[0]
+    assert result['ma_san_pham'] == -1 and result['ten_san_pham'] == ''
+
+    clean = pd.read_csv(CLEAN_RATINGS_FILE)
+    pd.DataFrame({'id': clean['id'], 'noi_dung_binh_luan': 'Gốc ' + clean['id'].astype(str), 'so_sao': 5,
+                  'ma_san_pham': 7}).to_csv(RATINGS_FILE, index=False)
+    pd.DataFrame({'ma_san_pham': [7], 'ten_san_pham': ['Kem Chống Nắng']}).to_csv(PRODUCTS_FILE, index=False)
+    rebuilt = load_index(log=io.StringIO())
+    assert rebuilt is not index
+    result = rebuilt.similar_to_text('hàng tốt', k=1)[0]
+    assert (result['ma_san_pham'], result['ten_san_pham'], result['so_sao']) == (7, 'Kem Chống Nắng', 5)
+    assert result['noi_dung_binh_luan'] == f'Gốc {result["review_id"]}'
@@ -0,0 +1,60 @@
+import pytest
+
+from conftest import require_files
+
+pytest.importorskip('underthesea')
+
+from underthesea import pos_tag, sent_tokenize, word_tokenize  # noqa: E402
+
+from lexicon import LEXICON_FILES, load_lexicon  # noqa: E402
+from preprocessing import (Normalizer, preprocess, preprocess_tokens, process_text, remove_stopword,  # noqa: E402
+                           split_sentences, tag_words)
+
+
+@pytest.fixture(scope='module')
+def lexicon():
+    require_files(*LEXICON_FILES)
+    return load_lexicon()
+
+
+@pytest.fixture(scope='module')
+def comments():
+    require_files('comments.txt')
+    with open('comments.txt', encoding='utf8') as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+@pytest.fixture(scope='module')
+def normalizer(lexicon):
+    return Normalizer(lexicon.emoji_dict, lexicon.teen_dict, lexicon.wrong_set, lexicon.stopword_set, mode='full')
+
+
+def test_text_tokens_match_process_text(lexicon, normalizer, comments):
+    for text in comments + ['', 'ko thik lắm... 😍😍 hàng ok!!', 'Giao hàng nhanh. Đóng gói cẩn thận.']:
+        text = text.lower()
+        assert normalizer.process_text(text) == process_text(text, lexicon.emoji_dict, lexicon.teen_dict, lexicon.wrong_set)
+
+
+def test_stopword_tokens_match_remove_stopword(lexicon, normalizer, comments):
+    for text in comments:
+        assert normalizer.remove_stopword(text.lower()) == remove_stopword(text.lower(), lexicon.stopword_set)
+
+
+def test_split_sentences_matches_sent_tokenize():
+    words = 'giao hàng nhanh. đóng gói cẩn thận. sẽ ủng hộ shop tiếp'.split()
+    assert [' '.join(sentence) for sentence in split_sentences(words)] == sent_tokenize(' '.join(words))
+    assert split_sentences([]) == []
+
+
+# tag_words dựng đặc trưng CRF trong một lượt: phải cho cùng nhãn như pos_tag của underthesea
+def test_tag_words_matches_pos_tag(comments):
+    for text in comments[:20] + ['sản phẩm không tốt']:
+        tokens = word_tokenize(text.lower())
+        assert tag_words(tokens) == pos_tag(' '.join(tokens))
+    assert tag_words([]) == []
+
+
+def test_preprocess_tokens_joined_equals_preprocess(lexicon, comments):
+    resources = (lexicon.emoji_dict, lexicon.teen_dict, lexicon.wrong_set, lexicon.stopword_set)
+    for text in comments[:20]:
+        assert ' '.join(preprocess_tokens(text, *resources, mode='full')) == preprocess(text, *resources, mode='full')
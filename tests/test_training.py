@@ -0,0 +1,71 @@
+import io
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+pytest.importorskip('imblearn')
+
+import artifacts  # noqa: E402
+import training  # noqa: E402
+from estimators import DecodedLabelClassifier  # noqa: E402
+from training import load_feature_store, train  # noqa: E402
+from training_report import load_report  # noqa: E402
+
+WORDS = {
+    'Positive': ['tốt', 'thích', 'đẹp', 'nhanh', 'thơm', 'mềm'],
+    'Negative': ['kém', 'chậm', 'hỏng', 'dở', 'rát', 'khô'],
+}
+
+
+@pytest.fixture
+def corpus_dir(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    labels = rng.choice(['Positive', 'Positive', 'Negative'], 240)
+    texts = [' '.join(rng.choice(WORDS[label], 3)) + ' sản_phẩm' for label in labels]
+    texts[:3] = ['', '  ', texts[3]]
+    pd.DataFrame({'noi_dung_binh_luan': texts, 'id': range(len(texts)), 'sentiment': labels}).to_csv(
+        tmp_path / training.TRAINING_FILE, index=False)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(artifacts, 'CACHE_DIR', str(tmp_path / 'cache'))
+    return tmp_path
+
+
+def test_feature_store_is_cached(corpus_dir, monkeypatch):
+    store = load_feature_store('clean', log=io.StringIO())
+    # Văn bản rỗng bị bỏ
+    assert len(store['texts']) == 238
+    assert store['counts'].shape[0] == 238
+    monkeypatch.setattr(training, 'build_corpus', lambda *args: pytest.fail('corpus rebuilt from an unchanged cache'))
+    assert load_feature_store('clean', log=io.StringIO())['texts'] == store['texts']
+
+
+def test_train_selects_a_model_and_writes_the_pipeline(corpus_dir):
+    output = str(corpus_dir / 'model.pkl')
+    report = train('clean', models=['nb', 'logreg'], n_jobs=1, output=output, log=io.StringIO())
+    assert set(report['models']) == {'nb', 'logreg'}
+    assert report['selected'] == max(report['models'], key=lambda name: report['models'][name]['cv_f1_macro'])
+    assert report['train_reviews'] + report['test_reviews'] == 238
+    assert report['models']['logreg']['params'] == {'C': 100, 'penalty': 'l2', 'solver': 'saga'}
+    assert load_report()['selected'] == report['selected']
+
+    pipeline = joblib.load(output)
+    assert list(pipeline.predict(['tốt thích đẹp', 'kém chậm hỏng'])) == ['Positive', 'Negative']
+
+    # Cùng dữ liệu, cùng random_state: cùng kết quả cross-validation
+    again = train('clean', models=['nb', 'logreg'], n_jobs=1, output='', log=io.StringIO())
+    assert again['models']['nb']['cv_f1_macro'] == report['models']['nb']['cv_f1_macro']
+    assert again['models']['logreg']['confusion_matrix'] == report['models']['logreg']['confusion_matrix']
+
+
+# Bộ phân loại chỉ nhận nhãn số vẫn học và trả về nhãn gốc
+def test_decoded_label_classifier_returns_original_labels():
+    X = np.array([[0.0], [0.1], [0.9], [1.0]])
+    y = np.array(['Negative', 'Negative', 'Positive', 'Positive'], dtype=object)
+    model = DecodedLabelClassifier(LogisticRegression()).fit(X, y)
+    assert list(model.classes_) == ['Negative', 'Positive']
+    assert list(model.predict(X)) == list(y)
+    assert model.predict_proba(X).shape == (4, 2)
+    assert training._shown_params(model) == training._shown_params(LogisticRegression())
@@ -0,0 +1,80 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('wordcloud')
+
+import artifacts  # noqa: E402
+import data_store  # noqa: E402
+import wordcloud_store  # noqa: E402
+from data_store import CLEAN_RATINGS_FILE, PRODUCTS_FILE, RATINGS_FILE  # noqa: E402
+from wordcloud_store import _wordcloud, load_store, wordcloud_png  # noqa: E402
+
+WORDS = ['dưỡng_ẩm', 'thơm', 'mềm_mịn', 'khô', 'kích_ứng', 'giao_hàng', 'đóng_gói', 'chính_hãng', 'rẻ', 'đắt']
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    rows = 400
+    ratings = pd.DataFrame({
+        'id': np.arange(rows),
+        'ma_khach_hang': rng.integers(1, 50, rows),
+        'noi_dung_binh_luan': 'raw',
+        'ngay_binh_luan': '01/12/2024',
+        'so_sao': rng.integers(1, 6, rows),
+        'ma_san_pham': rng.choice([1, 2, 3], rows),
+    })
+    clean = pd.DataFrame({
+        'noi_dung_binh_luan': [' '.join(rng.choice(WORDS, rng.integers(1, 8))) for _ in range(rows)],
+        'id': ratings['id'],
+        'sentiment': np.where(ratings['so_sao'] >= 4, 'Positive', 'Negative'),
+    })
+    # Sản phẩm 3 chỉ có bình luận tiêu cực
+    clean.loc[ratings['ma_san_pham'] == 3, 'sentiment'] = 'Negative'
+    pd.DataFrame({'ma_san_pham': [1, 2, 3, 4], 'ten_san_pham': ['A', 'B', 'C', 'D']}).to_csv(tmp_path / PRODUCTS_FILE, index=False)
+    ratings.to_csv(tmp_path / RATINGS_FILE, index=False)
+    clean.to_csv(tmp_path / CLEAN_RATINGS_FILE, index=False)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(artifacts, 'CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(data_store, '_product_data', None)
+    monkeypatch.setattr(wordcloud_store, '_store', None)
+    return ratings.drop(columns='noi_dung_binh_luan').merge(clean, on='id')
+
+
+# Ảnh vẽ từ bảng tần suất dựng sẵn giống hệt ảnh generate() trên toàn bộ bình luận như trang gốc
+def test_png_matches_generate_on_the_comments(data_dir):
+    from PIL import Image
+
+    store = load_store(log=io.StringIO())
+    for ma_sp, sentiment in ((1, 'Positive'), (2, 'Negative')):
+        comments = data_dir.loc[(data_dir['ma_san_pham'] == ma_sp) & (data_dir['sentiment'] == sentiment), 'noi_dung_binh_luan']
+        assert store.comments(ma_sp, sentiment) == len(comments)
+        expected = np.asarray(_wordcloud(sentiment).generate(' '.join(comments)).to_image())
+        actual = np.asarray(Image.open(io.BytesIO(wordcloud_png(ma_sp, sentiment, store))))
+        np.testing.assert_array_equal(actual, expected)
+
+
+def test_missing_sentiment_and_png_cache(data_dir, monkeypatch):
+    store = load_store(log=io.StringIO())
+    assert store.frequencies(3, 'Positive') == {}
+    assert wordcloud_png(3, 'Positive', store) is None
+    assert wordcloud_png(4, 'Negative', store) is None
+
+    image = wordcloud_png(3, 'Negative', store)
+    # Lần sau đọc lại file PNG, không vẽ lại
+    monkeypatch.setattr(wordcloud_store, '_wordcloud', lambda sentiment: pytest.fail('word cloud rendered twice'))
+    assert wordcloud_png(3, 'Negative', store) == image
+
+
+def test_store_is_rebuilt_when_the_data_changes(data_dir):
+    store = load_store(log=io.StringIO())
+    assert load_store(log=io.StringIO()) is store
+    clean = pd.read_csv(CLEAN_RATINGS_FILE)
+    clean['sentiment'] = 'Positive'
+    clean.to_csv(CLEAN_RATINGS_FILE, index=False)
+    rebuilt = load_store(log=io.StringIO())
+    assert rebuilt.version != store.version
+    assert rebuilt.comments(1, 'Negative') == 0
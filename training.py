@@ -0,0 +1,254 @@
+import argparse
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from imblearn.over_sampling import SMOTE
+from imblearn.pipeline import Pipeline
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, confusion_matrix, f1_score, precision_recall_fscore_support
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.svm import SVC
+
+from artifacts import cache_path, file_signature, load_artifact, save_artifact
+from estimators import DecodedLabelClassifier
+from model_registry import MODEL_FILE
+from training_report import save_report
+
+try:
+    from xgboost import XGBClassifier
+except ImportError:
+    XGBClassifier = None
+
+RATINGS_FILE = 'Danh_gia_full.csv'
+TRAINING_FILE = 'data_clean_2.csv'
+TEXT_COLUMN = 'noi_dung_binh_luan'
+CLASSES = ['Negative', 'Positive']
+RANDOM_STATE = 42
+TEST_SIZE = 0.3
+FOLDS = 5
+
+# Tăng khi đổi cấu trúc dữ liệu lưu trong file cache corpus/feature
+CORPUS_FORMAT = 1
+
+
+MODEL_NAMES = {
+    'nb': 'Multinomial Naive Bayes',
+    'logreg': 'Logistic Regression',
+    'rf': 'Random Forest',
+    'xgboost': 'XGBoost',
+    'svm': 'Support Vector Machine (SVM)',
+}
+
+
+# Các mô hình ứng viên và tham số như trên trang Build Model (XGBoost chỉ khi đã cài;
+# XGBoost chỉ nhận nhãn số nên được bọc để pipeline lưu ra vẫn trả về nhãn gốc)
+def candidate_models():
+    models = {
+        'nb': MultinomialNB(force_alpha=True),
+        'logreg': LogisticRegression(C=100, penalty='l2', solver='saga', max_iter=1000),
+        'rf': RandomForestClassifier(n_estimators=200, random_state=RANDOM_STATE),
+        'svm': SVC(C=1, class_weight=None, gamma='scale', kernel='rbf'),
+    }
+    if XGBClassifier is not None:
+        models['xgboost'] = DecodedLabelClassifier(XGBClassifier(
+            subsample=0.9, scale_pos_weight=5, n_estimators=300, max_depth=9, learning_rate=0.2, colsample_bytree=0.8))
+    return models
+
+
+def _timed(timings, name, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    timings[name] = time.perf_counter() - start
+    return result
+
+
+# Corpus đã tiền xử lý: 'raw' chạy preprocess (song song, có cache) trên
+# Danh_gia_full.csv với nhãn từ so_sao; 'clean' dùng thẳng data_clean_2.csv.
+# Bỏ văn bản rỗng.
+def build_corpus(source, n_jobs=None):
+    if source == 'clean':
+        df = pd.read_csv(TRAINING_FILE, usecols=[TEXT_COLUMN, 'sentiment'], dtype={TEXT_COLUMN: str}, keep_default_na=False)
+        texts, labels = df[TEXT_COLUMN].tolist(), df['sentiment'].tolist()
+    else:
+        from lexicon import load_lexicon
+        from preprocess_cache import cached_preprocess_batch
+
+        df = pd.read_csv(RATINGS_FILE, usecols=[TEXT_COLUMN, 'so_sao'], dtype={TEXT_COLUMN: str}, keep_default_na=False)
+        df = df[df['so_sao'].notna()]
+        texts = cached_preprocess_batch(df[TEXT_COLUMN].tolist(), load_lexicon(), n_jobs=n_jobs)
+        labels = np.where(df['so_sao'].astype(float) >= 4, 'Positive', 'Negative').tolist()
+    corpus = pd.DataFrame({'text': texts, 'label': labels})
+    corpus = corpus[corpus['text'].str.strip() != '']
+    return corpus['text'].tolist(), np.array(corpus['label'].tolist(), dtype=object)
+
+
+def _corpus_signature(source):
+    from lexicon import load_lexicon
+    from preprocessing import DEFAULT_MODE, PREPROCESS_VERSION
+
+    if source == 'clean':
+        return (CORPUS_FORMAT, source, file_signature([TRAINING_FILE]))
+    return (CORPUS_FORMAT, source, file_signature([RATINGS_FILE]), PREPROCESS_VERSION, DEFAULT_MODE, load_lexicon().fingerprint)
+
+
+# Kho token/feature: văn bản đã tiền xử lý, nhãn và ma trận đếm từ (CSR) dựng một lần,
+# dùng lại cho mọi lần huấn luyện đến khi dữ liệu nguồn hoặc preprocess thay đổi
+def load_feature_store(source='raw', n_jobs=None, log=sys.stderr):
+    path = cache_path(f'training_{source}.pkl')
+    signature = _corpus_signature(source)
+    store = load_artifact(path, signature)
+    if store is None:
+        print(f'Building the {source} training corpus...', file=log, flush=True)
+        timings = {}
+        texts, labels = _timed(timings, 'preprocess', build_corpus, source, n_jobs)
+        vectorizer = CountVectorizer()
+        counts = _timed(timings, 'features', vectorizer.fit_transform, texts)
+        store = {'texts': texts, 'labels': labels, 'counts': counts.tocsr(),
+                 'vocabulary': vectorizer.vocabulary_, 'timings': timings}
+        save_artifact(path, signature, store)
+    return store
+
+
+def model_pipeline(model):
+    # TF-IDF và SMOTE nằm trong pipeline nên chỉ học trên phần train của mỗi fold
+    return Pipeline([('tfidf', TfidfTransformer()), ('smote', SMOTE(random_state=RANDOM_STATE)), ('model', clone(model))])
+
+
+def _fit_fold(name, model, counts, labels, train_index, test_index):
+    pipeline = model_pipeline(model)
+    pipeline.fit(counts[train_index], labels[train_index])
+    predicted = pipeline.predict(counts[test_index])
+    return name, accuracy_score(labels[test_index], predicted), f1_score(labels[test_index], predicted, average='macro')
+
+
+def _evaluate(name, model, counts, labels, train_index, test_index):
+    pipeline = model_pipeline(model)
+    pipeline.fit(counts[train_index], labels[train_index])
+    train_predicted = pipeline.predict(counts[train_index])
+    test_predicted = pipeline.predict(counts[test_index])
+    precision, recall, f1, support = precision_recall_fscore_support(labels[test_index], test_predicted, labels=CLASSES)
+    return name, {
+        'params': {key: value for key, value in _unwrapped(model).get_params().items() if key in _shown_params(model)},
+        'train_accuracy': accuracy_score(labels[train_index], train_predicted),
+        'test_accuracy': accuracy_score(labels[test_index], test_predicted),
+        'classes': {
+            label: {'precision': precision[i], 'recall': recall[i], 'f1': f1[i], 'support': int(support[i])}
+            for i, label in enumerate(CLASSES)
+        },
+        'confusion_matrix': confusion_matrix(labels[test_index], test_predicted, labels=CLASSES).tolist(),
+    }
+
+
+def _unwrapped(model):
+    return model.estimator if isinstance(model, DecodedLabelClassifier) else model
+
+
+def _shown_params(model):
+    return {
+        MultinomialNB: ('force_alpha',),
+        LogisticRegression: ('C', 'penalty', 'solver'),
+        RandomForestClassifier: ('n_estimators',),
+        SVC: ('C', 'class_weight', 'gamma', 'kernel'),
+    }.get(type(_unwrapped(model)), ('subsample', 'scale_pos_weight', 'n_estimators', 'max_depth', 'learning_rate', 'colsample_bytree'))
+
+
+# Chia train/test (70/30, phân tầng), cross-validation 5 fold trên phần train cho mọi
+# mô hình; các cặp (mô hình, fold) chạy song song trên các core. Mô hình tốt nhất theo
+# macro-F1 trung bình (hoặc mô hình được chọn) được huấn luyện lại trên toàn bộ corpus
+# thành pipeline TF-IDF -> SMOTE -> mô hình nhận thẳng văn bản đã tiền xử lý.
+def train(source='raw', models=None, select=None, n_jobs=-1, output=MODEL_FILE, log=sys.stderr):
+    timings = {}
+    store = _timed(timings, 'load_features', load_feature_store, source, None if n_jobs == -1 else n_jobs, log)
+    timings.update({f'build_{name}': seconds for name, seconds in store['timings'].items()})
+    counts, labels = store['counts'], store['labels']
+    candidates = candidate_models()
+    if models:
+        candidates = {name: model for name, model in candidates.items() if name in models or name == select}
+
+    indices = np.arange(len(labels))
+    train_index, test_index = train_test_split(indices, test_size=TEST_SIZE, stratify=labels, random_state=RANDOM_STATE)
+    folds = list(StratifiedKFold(FOLDS, shuffle=True, random_state=RANDOM_STATE).split(train_index, labels[train_index]))
+
+    print(f'Cross-validating {len(candidates)} models x {FOLDS} folds on {len(train_index):,} reviews...', file=log, flush=True)
+    fold_results = _timed(timings, 'cross_validation', joblib.Parallel(n_jobs=n_jobs), (
+        joblib.delayed(_fit_fold)(name, model, counts, labels, train_index[fold_train], train_index[fold_test])
+        for name, model in candidates.items() for fold_train, fold_test in folds))
+    evaluations = dict(_timed(timings, 'evaluation', joblib.Parallel(n_jobs=n_jobs), (
+        joblib.delayed(_evaluate)(name, model, counts, labels, train_index, test_index)
+        for name, model in candidates.items())))
+
+    results = {}
+    for name in candidates:
+        scores = [(accuracy, f1) for fold_name, accuracy, f1 in fold_results if fold_name == name]
+        results[name] = {
+            'name': MODEL_NAMES[name],
+            'cv_accuracy': float(np.mean([accuracy for accuracy, _ in scores])),
+            'cv_accuracy_std': float(np.std([accuracy for accuracy, _ in scores])),
+            'cv_f1_macro': float(np.mean([f1 for _, f1 in scores])),
+            **evaluations[name],
+        }
+    selected = select or max(results, key=lambda name: results[name]['cv_f1_macro'])
+
+    print(f'Training {MODEL_NAMES[selected]} on the full corpus...', file=log, flush=True)
+    final = Pipeline([
+        ('tfidf', TfidfVectorizer()),
+        ('smote', SMOTE(random_state=RANDOM_STATE)),
+        ('svc' if isinstance(candidates[selected], SVC) else 'model', clone(candidates[selected])),
+    ])
+    _timed(timings, 'final_fit', final.fit, store['texts'], labels)
+    if output:
+        tmp_path = f'{output}.{os.getpid()}.tmp'
+        joblib.dump(final, tmp_path)
+        os.replace(tmp_path, output)
+
+    report = {
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'source': source,
+        'reviews': len(labels),
+        'train_reviews': len(train_index),
+        'test_reviews': len(test_index),
+        'folds': FOLDS,
+        'selected': selected,
+        'output': output,
+        'models': results,
+        'timings': timings,
+    }
+    save_report(report)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cross-validate the candidate models and write a new model_pipeline.pkl')
+    parser.add_argument('--source', choices=['raw', 'clean'], default='raw',
+                        help='raw: preprocess Danh_gia_full.csv (labels from so_sao); clean: use data_clean_2.csv as is')
+    parser.add_argument('--models', default=None, help=f'comma-separated subset of: {", ".join(MODEL_NAMES)}')
+    parser.add_argument('--select', default=None, choices=list(MODEL_NAMES),
+                        help='model to write (default: best cross-validated macro-F1)')
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    parser.add_argument('--output', default=MODEL_FILE, help='where to write the trained pipeline ("" to skip)')
+    args = parser.parse_args()
+
+    report = train(
+        args.source,
+        models=args.models.split(',') if args.models else None,
+        select=args.select,
+        n_jobs=args.n_jobs,
+        output=args.output,
+    )
+    for name, result in report['models'].items():
+        print(f'{result["name"]:<30} cv acc {result["cv_accuracy"]:.4f}  cv F1 {result["cv_f1_macro"]:.4f}  '
+              f'train {result["train_accuracy"]:.4f}  test {result["test_accuracy"]:.4f}')
+    print(f'Selected: {MODEL_NAMES[report["selected"]]} -> {report["output"] or "(not written)"}')
+    print('Timings: ' + ', '.join(f'{name} {seconds:.1f}s' for name, seconds in report['timings'].items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+import json
+import os
+
+from artifacts import cache_path
+
+
+# Báo cáo của training.py nằm trong module riêng, không kéo theo scikit-learn/imblearn,
+# để trang Build Model đọc được mà không phải nạp các thư viện huấn luyện
+def report_path():
+    return cache_path('training_report.json')
+
+
+def save_report(report):
+    tmp_path = f'{report_path()}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf8') as file:
+        json.dump(report, file, indent=2, ensure_ascii=False, default=str)
+    os.replace(tmp_path, report_path())
+
+
+# Báo cáo của lần huấn luyện gần nhất (None nếu chưa chạy training.py)
+def load_report():
+    try:
+        with open(report_path(), encoding='utf8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,165 @@
+import argparse
+import hashlib
+import io
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+from wordcloud import WordCloud
+
+import metrics
+from artifacts import cache_path, file_signature, load_artifact, save_artifact
+from data_store import DATA_FILES, load_product_data
+
+SENTIMENT_COLORS = {'Positive': '#2ecc71', 'Negative': '#e74c3c'}
+MAX_WORDS = 100
+
+# Tăng khi đổi cách đếm từ hoặc tham số vẽ wordcloud (ảnh PNG cũ sẽ không dùng lại)
+WORDCLOUD_FORMAT = 1
+
+
+def _wordcloud(sentiment):
+    return WordCloud(
+        width=800,
+        height=400,
+        background_color='white',
+        max_words=MAX_WORDS,
+        color_func=lambda *args, **kwargs: SENTIMENT_COLORS[sentiment],
+        random_state=42,
+    )
+
+
+# Bảng tần suất từ của mọi (sản phẩm, cảm xúc), lưu gọn dạng CSR:
+# terms (từ điển chung), term_ids/counts nối liền, offsets[(ma_sp, sentiment)] = (start, stop, số bình luận).
+# Đếm bằng WordCloud.process_text (như generate()) trên bình luận đã làm sạch của
+# data_clean_2.csv và chỉ giữ MAX_WORDS từ đầu, đúng phần generate_from_frequencies dùng.
+class TermFrequencyStore:
+    def __init__(self, terms, term_ids, counts, offsets, version):
+        self.terms = terms
+        self.term_ids = term_ids
+        self.counts = counts
+        self.offsets = offsets
+        self.version = version
+
+    def frequencies(self, ma_sp, sentiment):
+        start, stop, _ = self.offsets.get((ma_sp, sentiment), (0, 0, 0))
+        return {self.terms[term_id]: int(count) for term_id, count in zip(self.term_ids[start:stop], self.counts[start:stop])}
+
+    def comments(self, ma_sp, sentiment):
+        return self.offsets.get((ma_sp, sentiment), (0, 0, 0))[2]
+
+
+def build_store(log=None):
+    product_data = load_product_data()
+    counter = _wordcloud('Positive')
+    terms, term_index = [], {}
+    term_ids, counts, offsets = [], [], {}
+    codes = product_data.products['ma_san_pham'].tolist()
+    for n, ma_sp in enumerate(codes, 1):
+        reviews = product_data.product_reviews(ma_sp)
+        for sentiment in SENTIMENT_COLORS:
+            comments = reviews.loc[reviews['sentiment'] == sentiment, 'noi_dung_binh_luan'].dropna()
+            if len(comments) == 0:
+                continue
+            words = counter.process_text(' '.join(comments))
+            # Cùng thứ tự sắp xếp (ổn định) với generate_from_frequencies
+            top = sorted(words.items(), key=lambda item: item[1], reverse=True)[:MAX_WORDS]
+            start = len(term_ids)
+            for word, count in top:
+                if word not in term_index:
+                    term_index[word] = len(terms)
+                    terms.append(word)
+                term_ids.append(term_index[word])
+                counts.append(count)
+            offsets[(ma_sp, sentiment)] = (start, len(term_ids), len(comments))
+        if log and n % 200 == 0:
+            print(f'{n:,}/{len(codes):,} products', file=log, flush=True)
+    return terms, np.array(term_ids, dtype=np.int32), np.array(counts, dtype=np.int32), offsets
+
+
+def _signature():
+    return (WORDCLOUD_FORMAT, MAX_WORDS, file_signature(DATA_FILES))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+# Dùng chung cho mọi phiên; tự dựng lại khi một file CSV thay đổi
+def load_store(log=sys.stderr):
+    global _store
+    signature = _signature()
+    version = hashlib.sha1(repr(signature).encode('utf8')).hexdigest()[:12]
+    with _store_lock:
+        if _store is None or _store.version != version:
+            path = cache_path('wordcloud_terms.pkl')
+            tables = load_artifact(path, signature)
+            if tables is None:
+                print('Building word cloud term frequencies...', file=log, flush=True)
+                tables = build_store(log)
+                save_artifact(path, signature, tables)
+            _store = TermFrequencyStore(*tables, version)
+        return _store
+
+
+# Ảnh PNG của một wordcloud, lưu trong .cache/wordclouds/<phiên bản dữ liệu>/;
+# trả về None khi sản phẩm không có bình luận cho cảm xúc này
+def wordcloud_png(ma_sp, sentiment, store=None):
+    store = store or load_store()
+    directory = cache_path(os.path.join('wordclouds', store.version))
+    path = os.path.join(directory, f'{ma_sp}_{sentiment}.png')
+    try:
+        with open(path, 'rb') as file:
+            metrics.increment('wordcloud.png_hit')
+            return file.read()
+    except FileNotFoundError:
+        pass
+    frequencies = store.frequencies(ma_sp, sentiment)
+    if not frequencies:
+        return None
+    metrics.increment('wordcloud.png_miss')
+    with metrics.timer('wordcloud.render'):
+        image = _wordcloud(sentiment).generate_from_frequencies(frequencies).to_image()
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG')
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(buffer.getvalue())
+    os.replace(tmp_path, path)
+    return buffer.getvalue()
+
+
+# Vẽ sẵn ảnh cho các sản phẩm nhiều bình luận nhất
+def warm(top=None, log=sys.stderr):
+    store = load_store(log)
+    totals = {}
+    for (ma_sp, _), (_, _, comments) in store.offsets.items():
+        totals[ma_sp] = totals.get(ma_sp, 0) + comments
+    codes = sorted(totals, key=totals.get, reverse=True)[:top]
+    start = time.perf_counter()
+    for ma_sp in codes:
+        for sentiment in SENTIMENT_COLORS:
+            wordcloud_png(ma_sp, sentiment, store)
+    print(f'Rendered word clouds for {len(codes):,} products in {time.perf_counter() - start:.1f}s', file=log)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute per-product word cloud term frequencies and images')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('build', help='(re)build the term-frequency store in the cache directory')
+    render = commands.add_parser('warm', help='pre-render the PNGs of the products with the most comments')
+    render.add_argument('--top', type=int, default=None, help='number of products (default: all)')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        store = load_store()
+        print(f'{len(store.offsets):,} word clouds, {len(store.terms):,} distinct terms ({store.version})', file=sys.stderr)
+    else:
+        warm(args.top)
+
+
+if __name__ == '__main__':
+    main()